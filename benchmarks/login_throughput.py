@@ -0,0 +1,167 @@
+"""
+Compare the login throughput of the synchronous and asynchronous
+authentication paths of ``django-latch``.
+
+The Latch service is simulated with a fixed latency, so the benchmark
+measures how many logins can be in flight at the same time: the synchronous
+path is bounded by the number of worker threads, while the asynchronous one
+only waits on the event loop.
+
+Asynchronous authentication backends require Django 5.2 or newer. Run it from
+the root of the repository::
+
+    python benchmarks/login_throughput.py --logins 500 --latency 0.05
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+PASSWORD = "superpassword"
+
+
+def setup_django(db_name):
+    """
+    Configure a minimal project with a file-based SQLite database, so it is
+    shared by every thread.
+    """
+
+    settings.configure(
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "django_latch",
+        ],
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": db_name}
+        },
+        AUTHENTICATION_BACKENDS=["django_latch.backends.LatchDefaultModelBackend"],
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+        LATCH_APP_ID="a" * 20,
+        LATCH_SECRET_KEY="b" * 64,
+    )
+    django.setup()
+
+
+def create_users(count):
+    """
+    Create ``count`` users with a paired latch and return their usernames.
+    """
+
+    from django.contrib.auth import get_user_model  # pylint: disable=import-outside-toplevel
+    from django.core.management import call_command  # pylint: disable=import-outside-toplevel
+
+    from django_latch.models import LatchUserConfig  # pylint: disable=import-outside-toplevel
+
+    call_command("migrate", verbosity=0)
+    UserModel = get_user_model()  # pylint: disable=invalid-name
+    usernames = []
+    for i in range(count):
+        user = UserModel.objects.create_user(username=f"user{i}", password=PASSWORD)
+        LatchUserConfig.objects.create(user=user, account_id=f"{i:064d}")
+        usernames.append(user.username)
+    return usernames
+
+
+def run_sync(usernames, latency, workers):
+    """
+    Authenticate every user from a pool of ``workers`` threads, returning
+    the elapsed seconds.
+    """
+
+    from django.contrib.auth import authenticate  # pylint: disable=import-outside-toplevel
+    from latch_sdk.models import Status  # pylint: disable=import-outside-toplevel
+
+    def account_status(*args, **kwargs):  # pylint: disable=unused-argument
+        time.sleep(latency)
+        return Status.build_from_dict({"operation_id": 1, "status": "on"})
+
+    with patch("latch_sdk.syncio.LatchSDK.account_status", new=account_status):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            users = list(
+                executor.map(
+                    lambda username: authenticate(
+                        None, username=username, password=PASSWORD
+                    ),
+                    usernames,
+                )
+            )
+        elapsed = time.perf_counter() - start
+    assert all(users), "Some synchronous logins failed"
+    return elapsed
+
+
+def run_async(usernames, latency):
+    """
+    Authenticate every user concurrently in an event loop, returning the
+    elapsed seconds.
+    """
+
+    from django.contrib.auth import aauthenticate  # pylint: disable=import-outside-toplevel
+    from latch_sdk.models import Status  # pylint: disable=import-outside-toplevel
+
+    async def account_status(*args, **kwargs):  # pylint: disable=unused-argument
+        await asyncio.sleep(latency)
+        return Status.build_from_dict({"operation_id": 1, "status": "on"})
+
+    async def login_all():
+        return await asyncio.gather(
+            *(aauthenticate(None, username=u, password=PASSWORD) for u in usernames)
+        )
+
+    with patch("latch_sdk.asyncio.LatchSDK.account_status", new=account_status):
+        start = time.perf_counter()
+        users = asyncio.run(login_all())
+        elapsed = time.perf_counter() - start
+    assert all(users), "Some asynchronous logins failed"
+    return elapsed
+
+
+def main():
+    """
+    Parse the arguments, run both benchmarks and print the results.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per Latch call."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(32, (os.cpu_count() or 1) + 4),
+        help="Threads of the synchronous run. Defaults to the size of the "
+        "default thread executor.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        setup_django(os.path.join(tmp_dir, "db.sqlite3"))
+        usernames = create_users(args.logins)
+
+        for name, elapsed in (
+            ("sync", run_sync(usernames, args.latency, args.workers)),
+            ("async", run_async(usernames, args.latency)),
+        ):
+            print(
+                f"{name:>5}: {args.logins} logins in {elapsed:.2f}s "
+                f"({args.logins / elapsed:.1f} logins/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure the memory taken by the in-process filter of the paired users of
+``django-latch``, compared with a set of their ids.
+
+The user ids go from 1 to ``--users``, and a random ``--paired`` ratio of
+them have the Latch service configured. The benchmark reports the memory
+taken by a :class:`set`, a :class:`~django_latch.membership.Bitmap` and a
+:class:`~django_latch.membership.BloomFilter` holding the paired ids, along
+with the time of a lookup and the ratio of unpaired users reported as
+paired.
+
+Run it from the root of the repository::
+
+    python benchmarks/paired_filter_memory.py --users 10000000 --paired 0.05
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from django_latch.membership import (  # noqa: E402 pylint: disable=wrong-import-position
+    Bitmap,
+    BloomFilter,
+)
+
+
+def build(factory, paired_ids):
+    """
+    Build a structure with ``factory`` holding ``paired_ids``, returning it
+    and the bytes it allocated.
+    """
+
+    tracemalloc.start()
+    structure = factory()
+    for user_id in paired_ids:
+        # Copy the id, as every row loaded from the database is a new object.
+        structure.add(int(str(user_id)))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return structure, size
+
+
+def measure_lookups(structure, user_ids, paired):
+    """
+    Look up every id of ``user_ids`` in ``structure``, returning the
+    nanoseconds per lookup and the ratio of unpaired ids reported as paired.
+    """
+
+    start = time.perf_counter()
+    false_positives = sum(
+        1 for user_id in user_ids if user_id in structure and user_id not in paired
+    )
+    elapsed = time.perf_counter() - start
+    unpaired = sum(1 for user_id in user_ids if user_id not in paired)
+    return 1e9 * elapsed / len(user_ids), false_positives / max(unpaired, 1)
+
+
+def main():
+    """
+    Parse the arguments, run the benchmark and print the results.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--users", type=int, default=10_000_000)
+    parser.add_argument(
+        "--paired", type=float, default=0.05, help="Ratio of paired users."
+    )
+    parser.add_argument("--lookups", type=int, default=200_000, help="Users looked up.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    paired_ids = rng.sample(range(1, args.users + 1), int(args.users * args.paired))
+    paired = set(paired_ids)
+    user_ids = [rng.randint(1, args.users) for _ in range(args.lookups)]
+    print(f"{args.users} users, {len(paired_ids)} paired")
+
+    for name, factory in (
+        ("set", set),
+        ("bitmap", lambda: Bitmap(args.users)),
+        ("bloom", lambda: BloomFilter(len(paired_ids))),
+    ):
+        structure, size = build(factory, paired_ids)
+        per_lookup, false_positive_rate = measure_lookups(structure, user_ids, paired)
+        print(
+            f"{name:>8}: {size / 2**20:8.2f} MiB, {per_lookup:6.0f} ns per lookup, "
+            f"{100 * false_positive_rate:.2f}% false positives"
+        )
+        del structure
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Measure how many upstream status requests the single-flight coalescing of
+``django-latch`` saves under a Zipf-distributed load.
+
+Every lookup asks for the status of an account drawn from a Zipf
+distribution, so a few accounts (shared service accounts, clients retrying,
+SSO fan-out) receive most of the lookups. The Latch service is simulated
+with a fixed latency, and the number of upstream requests is counted with
+and without coalescing, both with threads and with asyncio.
+
+Run it from the root of the repository::
+
+    python benchmarks/singleflight_zipf.py --lookups 5000 --accounts 1000
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from django_latch.singleflight import (  # noqa: E402 pylint: disable=wrong-import-position
+    AsyncSingleFlight,
+    SingleFlight,
+)
+
+
+def zipf_accounts(lookups, accounts, exponent, seed):
+    """
+    Return ``lookups`` account ids drawn from a Zipf distribution over
+    ``accounts`` accounts.
+    """
+
+    rng = random.Random(seed)
+    weights = [1 / (rank**exponent) for rank in range(1, accounts + 1)]
+    return rng.choices(range(accounts), weights=weights, k=lookups)
+
+
+class Upstream:
+    """
+    Simulated Latch service that counts the requests it receives.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def account_status(self, account_id):  # pylint: disable=unused-argument
+        """
+        Answer a status request after the latency.
+        """
+
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        return True
+
+    async def aaccount_status(self, account_id):  # pylint: disable=unused-argument
+        """
+        Asynchronous version of :meth:`account_status`.
+        """
+
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return True
+
+
+def run_threads(account_ids, latency, workers, coalesce):
+    """
+    Look up every account from a pool of threads, returning the number of
+    upstream requests and the elapsed seconds.
+    """
+
+    upstream = Upstream(latency)
+    flight = SingleFlight()
+
+    def lookup(account_id):
+        if coalesce:
+            return flight.do(account_id, lambda: upstream.account_status(account_id))
+        return upstream.account_status(account_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lookup, account_ids))
+    return upstream.requests, time.perf_counter() - start
+
+
+def run_asyncio(account_ids, latency, concurrency, coalesce):
+    """
+    Look up every account from ``concurrency`` coroutines, returning the
+    number of upstream requests and the elapsed seconds.
+    """
+
+    upstream = Upstream(latency)
+    flight = AsyncSingleFlight()
+    queue = iter(account_ids)
+
+    async def worker():
+        for account_id in queue:
+            if coalesce:
+                await flight.do(
+                    account_id, lambda a=account_id: upstream.aaccount_status(a)
+                )
+            else:
+                await upstream.aaccount_status(account_id)
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return upstream.requests, time.perf_counter() - start
+
+
+def main():
+    """
+    Parse the arguments, run the benchmarks and print the results.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent.")
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Seconds per Latch call."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="Threads or coroutines."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    account_ids = zipf_accounts(args.lookups, args.accounts, args.exponent, args.seed)
+    print(
+        f"{args.lookups} lookups over {args.accounts} accounts "
+        f"(Zipf s={args.exponent}), {args.concurrency} concurrent callers"
+    )
+    for mode, runner in (("threads", run_threads), ("asyncio", run_asyncio)):
+        plain, plain_elapsed = runner(
+            account_ids, args.latency, args.concurrency, coalesce=False
+        )
+        coalesced, coalesced_elapsed = runner(
+            account_ids, args.latency, args.concurrency, coalesce=True
+        )
+        print(
+            f"{mode:>8}: {plain} upstream requests in {plain_elapsed:.2f}s without "
+            f"coalescing, {coalesced} in {coalesced_elapsed:.2f}s with it "
+            f"({100 * (1 - coalesced / plain):.1f}% fewer)"
+        )
+
+
+if __name__ == "__main__":
+    main()
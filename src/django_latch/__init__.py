@@ -8,24 +8,45 @@ from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.utils.module_loading import import_string
 
+from latch_sdk.asyncio import LatchSDK as AsyncLatchSDK
 from latch_sdk.syncio import LatchSDK
 
+from .client import AsyncLatchClientRegistry, LatchClientRegistry
+from .metrics import InstrumentedLatchSDK
+
 HTTP_BACKENDS = {
-    "http": "latch_sdk.syncio.pure.Latch",
-    "httpx": "latch_sdk.syncio.httpx.Latch",
-    "requests": "latch_sdk.syncio.requests.Latch",
+    "http": "django_latch.transports.PooledLatch",
+    "httpx": "django_latch.transports_httpx.HttpxLatch",
+    "requests": "django_latch.transports_requests.RequestsLatch",
 }
 
+ASYNC_HTTP_BACKENDS = {
+    "aiohttp": "latch_sdk.asyncio.aiohttp.Latch",
+    "httpx": "latch_sdk.asyncio.httpx.Latch",
+}
 
-def get_latch_api():
+#: HTTP backends whose client can be shared between threads. The rest
+#: get a client per thread.
+THREAD_SAFE_HTTP_BACKENDS = frozenset({"http", "httpx"})
+
+
+def _get_http_backend():
     """
-    Return the Latch SDK for accessing Latch's API.
+    Return the value of the :data:`LATCH_HTTP_BACKEND` setting.
+    """
+
+    return getattr(settings, "LATCH_HTTP_BACKEND", "http")
+
+
+def create_latch_api():
+    """
+    Build a new Latch SDK for accessing Latch's API.
 
     If the setting :data:`LATCH_HTTP_BACKEND` is not set, the default
     would be the 'http' one, which does not require a third-party package.
     """
 
-    http_backend = getattr(settings, "LATCH_HTTP_BACKEND", "http")  # pylint: disable=invalid-name
+    http_backend = _get_http_backend()
 
     try:
         core_class = import_string(HTTP_BACKENDS[http_backend])
@@ -35,3 +56,70 @@ def get_latch_api():
             "valid values are 'http', 'requests' or 'httpx'."
         ) from exc
     return LatchSDK(core_class(settings.LATCH_APP_ID, settings.LATCH_SECRET_KEY))
+
+
+latch_api_registry = LatchClientRegistry(
+    lambda: InstrumentedLatchSDK(create_latch_api()),
+    lambda: _get_http_backend() in THREAD_SAFE_HTTP_BACKENDS,
+)
+
+
+def get_latch_api():
+    """
+    Return the Latch SDK for accessing Latch's API.
+
+    The SDK is built by :func:`create_latch_api` the first time it is
+    needed and reused afterwards, once per process or once per thread if
+    the HTTP backend cannot be shared between threads (see
+    :data:`THREAD_SAFE_HTTP_BACKENDS`). It is rebuilt when
+    :data:`LATCH_APP_ID`, :data:`LATCH_SECRET_KEY` or
+    :data:`LATCH_HTTP_BACKEND` change, or after calling
+    ``latch_api_registry.reset()``.
+
+    The calls to the SDK are recorded in
+    :data:`django_latch.metrics.metrics`.
+    """
+
+    return latch_api_registry.get()
+
+
+def create_async_latch_api():
+    """
+    Build a new asynchronous Latch SDK for accessing Latch's API.
+
+    If the setting :data:`LATCH_ASYNC_HTTP_BACKEND` is not set, the default
+    would be the 'aiohttp' one.
+    """
+
+    http_backend = getattr(settings, "LATCH_ASYNC_HTTP_BACKEND", "aiohttp")
+
+    try:
+        core_class = import_string(ASYNC_HTTP_BACKENDS[http_backend])
+    except KeyError as exc:
+        raise ImproperlyConfigured(
+            f"The LATCH_ASYNC_HTTP_BACKEND setting cannot be {http_backend}, the "
+            "only valid values are 'aiohttp' or 'httpx'."
+        ) from exc
+    return AsyncLatchSDK(core_class(settings.LATCH_APP_ID, settings.LATCH_SECRET_KEY))
+
+
+async_latch_api_registry = AsyncLatchClientRegistry(
+    lambda: InstrumentedLatchSDK(create_async_latch_api())
+)
+
+
+async def aget_latch_api():
+    """
+    Return the asynchronous Latch SDK for accessing Latch's API.
+
+    The SDK is built by :func:`create_async_latch_api` the first time it is
+    needed in the running event loop and reused afterwards in that loop, so
+    every loop has a single HTTP session. Await
+    ``async_latch_api_registry.aclose()`` when the application shuts down to
+    close the session of the running loop.
+
+    The calls to the SDK are recorded in
+    :data:`django_latch.metrics.metrics`.
+    """
+
+    return async_latch_api_registry.get()
@@ -8,7 +8,7 @@ from django.apps import AppConfig
 from django.core import checks
 from django.utils.translation import gettext_lazy as _
 
-from .checks import check_dependencies, check_settings
+from .checks import check_dependencies, check_settings, check_url_policies
 
 
 class DjangoLatch2Config(AppConfig):
@@ -21,6 +21,8 @@ class DjangoLatch2Config(AppConfig):
     verbose_name = _("Latch for Django")
 
     def ready(self):
-        """Run the checks."""
+        """Run the checks and connect the signal receivers."""
         checks.register(check_dependencies)
         checks.register(check_settings)
+        checks.register(check_url_policies)
+        from . import sessions  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
@@ -5,42 +5,187 @@ a user's latch.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import contextvars
+import time
+from collections import namedtuple
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
 from django.core.exceptions import PermissionDenied
-from django.utils.crypto import get_random_string
-
-from latch_sdk.exceptions import LatchError
 
-from . import get_latch_api
+from .context import amemoize, memoize, recall, remember
+from .models import aget_latch_config, aload_account_id, get_latch_config
+from .signals import asend, has_receivers, latch_checked, latch_denied, send
+from .status import alookup_account_status, lookup_account_status
+from .timing import arun_decoy, run_decoy
 
 UserModel = get_user_model()
 
+# Set while an asynchronous authentication is in progress, so the synchronous
+# check in LatchModelBackendMixin.user_can_authenticate is left to
+# LatchModelBackendMixin.aauthenticate.
+_checking_latch_async = contextvars.ContextVar(
+    "django_latch_checking_latch_async", default=False
+)
+
+
+def _get_account_id(user):
+    """
+    Return the Latch account id of ``user``, or ``None`` if it's not paired.
+    """
+
+    config = get_latch_config(user)
+    return None if config is None else config.account_id
+
+
+async def _aget_account_id(user):
+    """
+    Asynchronous version of :func:`_get_account_id`.
+    """
+
+    config = await aget_latch_config(user)
+    if config is None:
+        return None
+    await aload_account_id(config)
+    return config.account_id
+
+
+LatchCheck = namedtuple("LatchCheck", ["can_pass", "duration", "from_cache"])
+LatchCheck.__doc__ = """
+Result of :func:`check_latch`: whether the latch is open, the seconds the
+check took and whether the state was taken from the current request scope
+or the status cache instead of the Latch service.
+"""
+
+
+def _lookup_latch(user):
+    """
+    Return a tuple ``(can_pass, from_cache)`` with the ``user``'s latch
+    state and whether it was taken from a cache.
+    """
+
+    account_id = _get_account_id(user)
+    if account_id is None:
+        # In order to prevent an attacker knowing a user has configured
+        # the Latch service, the check of an unpaired user must take
+        # about the same time as the check of a paired one.
+        memoize(("decoy", user.pk), lambda: run_decoy(user.pk))
+        return True, False
+    can_pass = recall(("status", account_id))
+    if can_pass is not None:
+        return can_pass, True
+    can_pass, from_cache = lookup_account_status(account_id)
+    remember(("status", account_id), can_pass)
+    return can_pass, from_cache
+
+
+async def _alookup_latch(user):
+    """
+    Asynchronous version of :func:`_lookup_latch`.
+    """
+
+    account_id = await _aget_account_id(user)
+    if account_id is None:
+        # See _lookup_latch
+        await amemoize(("decoy", user.pk), lambda: arun_decoy(user.pk))
+        return True, False
+    can_pass = recall(("status", account_id))
+    if can_pass is not None:
+        return can_pass, True
+    can_pass, from_cache = await alookup_account_status(account_id)
+    remember(("status", account_id), can_pass)
+    return can_pass, from_cache
+
+
+def check_latch(user):
+    """
+    Check the ``user``'s latch state, returning a :class:`LatchCheck`.
+
+    The state may be taken from the status cache, see
+    :data:`LATCH_STATUS_CACHE`. Inside a request handled by
+    :class:`~django_latch.middleware.LatchRequestScopeMiddleware`, the
+    latch configuration and the state are fetched at most once.
+
+    For unpaired users, the decoy set in :data:`LATCH_DECOY` makes the
+    check take about the same time as for paired ones.
+
+    The :data:`~django_latch.signals.latch_checked` signal is sent
+    afterwards.
+    """
+
+    start = time.perf_counter()
+    can_pass, from_cache = _lookup_latch(user)
+    check = LatchCheck(can_pass, time.perf_counter() - start, from_cache)
+    if has_receivers(latch_checked):
+        send(latch_checked, user, **check._asdict())
+    return check
+
+
+async def acheck_latch(user):
+    """
+    Asynchronous version of :func:`check_latch`.
+
+    Both the ``user``'s latch configuration and the latch state are
+    fetched without blocking the event loop.
+    """
+
+    start = time.perf_counter()
+    can_pass, from_cache = await _alookup_latch(user)
+    check = LatchCheck(can_pass, time.perf_counter() - start, from_cache)
+    if has_receivers(latch_checked):
+        await asend(latch_checked, user, **check._asdict())
+    return check
+
 
 def can_pass_latch(user):
     """
     Check the ``user``'s latch state. Return ``True`` if the latch is open,
     ``False`` if it's closed.
+
+    See :func:`check_latch`.
     """
 
-    can_pass = True
-    latch_api = get_latch_api()
-    try:
-        l_config = user.latch_config
-    except UserModel.latch_config.RelatedObjectDoesNotExist:
-        # In order to prevent an attacker knowing a user has configured
-        # the Latch service, we need to make a mock call to the API
-        # so the latency difference between a user with a configured latch
-        #  and a user without is not significant enough.
-        try:
-            latch_api.account_status(get_random_string(64))
-        except LatchError:
-            pass
-    else:
-        status = latch_api.account_status(l_config.account_id)
-        can_pass = status.status
+    return check_latch(user).can_pass
 
-    return can_pass
+
+async def acan_pass_latch(user):
+    """
+    Asynchronous version of :func:`can_pass_latch`.
+    """
+
+    return (await acheck_latch(user)).can_pass
+
+
+def send_latch_denied(user, check, request=None):
+    """
+    Send the :data:`~django_latch.signals.latch_denied` signal for
+    ``user``, whose access in ``request`` was denied after the
+    :class:`LatchCheck` ``check``.
+    """
+
+    if has_receivers(latch_denied):
+        send(
+            latch_denied,
+            user,
+            request=request,
+            duration=check.duration,
+            from_cache=check.from_cache,
+        )
+
+
+async def asend_latch_denied(user, check, request=None):
+    """
+    Asynchronous version of :func:`send_latch_denied`.
+    """
+
+    if has_receivers(latch_denied):
+        await asend(
+            latch_denied,
+            user,
+            request=request,
+            duration=check.duration,
+            from_cache=check.from_cache,
+        )
 
 
 class LatchModelBackendMixin:
@@ -53,7 +198,13 @@ class LatchModelBackendMixin:
 
     .. automethod:: user_can_authenticate
 
+    .. automethod:: aauthenticate
+
+    .. automethod:: get_user_queryset
+
     .. automethod:: get_user
+
+    .. automethod:: aget_user
     """
 
     # pylint: disable=too-few-public-methods
@@ -75,15 +226,59 @@ class LatchModelBackendMixin:
         blocking the check on the rest of the authentication backends
         (which is the objective of Latch: completely block the access, though
         in future releases this can be extended and generalized).
+
+        Before raising it, the :data:`~django_latch.signals.latch_denied`
+        signal is sent.
         """
 
-        if not can_pass_latch(user):
-            raise PermissionDenied()
+        if not _checking_latch_async.get():
+            check = check_latch(user)
+            if not check.can_pass:
+                send_latch_denied(user, check)
+                raise PermissionDenied()
         return super().user_can_authenticate(user)
 
+    async def aauthenticate(self, request, **kwargs):
+        """
+        Asynchronous version of ``authenticate``, available since Django 5.2.
+
+        The latch isn't checked by :meth:`user_can_authenticate`, where it
+        would block the event loop, but by :func:`acan_pass_latch` once the
+        parent backend has authenticated the user. As in the synchronous
+        version, if the user's latch is on, then a
+        :exc:`~django.core.exceptions.PermissionDenied` is raised after
+        sending the :data:`~django_latch.signals.latch_denied` signal.
+        """
+
+        token = _checking_latch_async.set(True)
+        try:
+            user = await super().aauthenticate(request, **kwargs)
+        finally:
+            _checking_latch_async.reset(token)
+
+        if user is not None:
+            check = await acheck_latch(user)
+            if not check.can_pass:
+                await asend_latch_denied(user, check, request)
+                raise PermissionDenied()
+        return user
+
+    def get_user_queryset(self):
+        """
+        Return the queryset from which :meth:`get_user` and :meth:`aget_user`
+        fetch the user of every authenticated request.
+
+        The latch configuration is fetched in the same query, so checking
+        the pairing of the user afterwards doesn't query the database again.
+        Override it to select or prefetch other relations as well.
+        """
+
+        return UserModel._default_manager.select_related("latch_config")  # pylint: disable=protected-access
+
     def get_user(self, user_id):
         """
-        Returns the user object related to ``user_id``.
+        Returns the user object related to ``user_id``, fetched from
+        :meth:`get_user_queryset`.
 
         We need to override this method because we are raising
         the :exc:`~django.core.exceptions.PermissionDenied` exception in the
@@ -105,7 +300,19 @@ class LatchModelBackendMixin:
         """
 
         try:
-            user = UserModel._default_manager.get(pk=user_id)  # pylint: disable=protected-access
+            user = self.get_user_queryset().get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if super().user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        """
+        Asynchronous version of :meth:`get_user`, which also skips
+        the latch check.
+        """
+
+        try:
+            user = await self.get_user_queryset().aget(pk=user_id)
         except UserModel.DoesNotExist:
             return None
         return user if super().user_can_authenticate(user) else None
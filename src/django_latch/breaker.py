@@ -0,0 +1,344 @@
+"""
+Circuit breaker that stops calling the Latch service while it is failing.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import collections
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .exceptions import CircuitOpenError
+from .transports import CONNECTION_ERRORS
+
+#: State of a circuit breaker letting every call through.
+CLOSED = "closed"
+
+#: State of a circuit breaker rejecting every call.
+OPEN = "open"
+
+#: State of a circuit breaker letting a single call through to probe the
+#: Latch service.
+HALF_OPEN = "half-open"
+
+#: Default number of latest calls whose outcome is considered.
+DEFAULT_WINDOW = 20
+
+#: Default number of calls in the window needed to open the circuit.
+DEFAULT_MIN_CALLS = 10
+
+#: Default ratio of failed calls in the window that opens the circuit.
+DEFAULT_ERROR_RATE = 0.5
+
+#: Default seconds the circuit stays open before probing the Latch service.
+DEFAULT_OPEN_SECONDS = 30
+
+#: Settings whose change makes the circuit breaker obsolete.
+BREAKER_SETTINGS = frozenset(
+    {
+        "LATCH_CIRCUIT_BREAKER",
+        "LATCH_CIRCUIT_BREAKER_WINDOW",
+        "LATCH_CIRCUIT_BREAKER_MIN_CALLS",
+        "LATCH_CIRCUIT_BREAKER_ERROR_RATE",
+        "LATCH_CIRCUIT_BREAKER_SLOW_CALL",
+        "LATCH_CIRCUIT_BREAKER_OPEN_SECONDS",
+        "LATCH_CIRCUIT_BREAKER_CACHE",
+    }
+)
+
+
+class CircuitBreaker:  # pylint: disable=too-many-instance-attributes
+    """
+    Track the outcome of the latest calls to the Latch service and reject
+    new ones, raising :exc:`~django_latch.exceptions.CircuitOpenError`,
+    while it is failing.
+
+    The circuit starts closed. It opens when at least ``min_calls`` of the
+    latest ``window`` calls have been made and the ratio of failed ones
+    reaches ``error_rate``. Calls that fail to connect or to get an answer
+    are failures, and so are those taking ``slow_call`` seconds or more.
+    After ``open_seconds``, the circuit becomes half-open and lets a single
+    call through: the circuit closes if it succeeds and opens again if it
+    fails.
+
+    The state is shared by every thread of the process. If ``cache_alias``
+    is given, the opening is also published in that cache, so the rest of
+    processes stop calling the Latch service as well.
+
+    :param int window: Number of latest calls whose outcome is considered.
+    :param int min_calls: Number of calls in the window needed to open the
+        circuit.
+    :param float error_rate: Ratio of failed calls that opens the circuit.
+    :param float slow_call: Seconds after which a successful call counts as
+        a failure, or ``None`` to ignore the latency.
+    :param float open_seconds: Seconds the circuit stays open.
+    :param str cache_alias: Alias of the cache in the :setting:`CACHES`
+        setting used to share the opening between processes, or ``None``.
+    """
+
+    cache_key = "django_latch:circuit_breaker:open_until"
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        window=DEFAULT_WINDOW,
+        min_calls=DEFAULT_MIN_CALLS,
+        error_rate=DEFAULT_ERROR_RATE,
+        slow_call=None,
+        open_seconds=DEFAULT_OPEN_SECONDS,
+        cache_alias=None,
+    ):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.cache = None if cache_alias is None else caches[cache_alias]
+        self._lock = threading.Lock()
+        self._failures = collections.deque(maxlen=window)
+        self._state = CLOSED
+        self._open_until = 0
+        self._probing = False
+
+    @property
+    def state(self):
+        """
+        The current state, :data:`CLOSED`, :data:`OPEN` or :data:`HALF_OPEN`.
+        """
+
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def _open(self, seconds):
+        """
+        Open the circuit for ``seconds``. Must be called with the lock held.
+        """
+
+        self._state = OPEN
+        self._open_until = time.monotonic() + seconds
+        self._probing = False
+        self._failures.clear()
+
+    def _get_shared_open_seconds(self):
+        """
+        Return the seconds left of an opening published by another process,
+        or ``None`` if there isn't any.
+        """
+
+        if self.cache is None:
+            return None
+        open_until = self.cache.get(self.cache_key)
+        if open_until is None or open_until <= time.time():
+            return None
+        return open_until - time.time()
+
+    def before_call(self):
+        """
+        Raise :exc:`~django_latch.exceptions.CircuitOpenError` if a call to
+        the Latch service must not be made now.
+        """
+
+        if self.state == CLOSED:
+            seconds = self._get_shared_open_seconds()
+            if seconds is not None:
+                with self._lock:
+                    self._open(seconds)
+
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() < self._open_until:
+                    raise CircuitOpenError(
+                        "The Latch service is failing, so it is not called.",
+                        "circuit_open",
+                    )
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(
+                        "The Latch service is being probed, so it is not called.",
+                        "circuit_half_open",
+                    )
+                self._probing = True
+
+    def record_success(self, seconds):
+        """
+        Record a call that got an answer after ``seconds``.
+        """
+
+        if self.slow_call is not None and seconds >= self.slow_call:
+            self.record_failure()
+            return
+
+        with self._lock:
+            closing = self._state == HALF_OPEN
+            if closing:
+                self._state = CLOSED
+                self._probing = False
+                self._failures.clear()
+            else:
+                self._failures.append(False)
+        if closing and self.cache is not None:
+            self.cache.delete(self.cache_key)
+
+    def record_failure(self):
+        """
+        Record a call that failed, opening the circuit if needed.
+        """
+
+        with self._lock:
+            if self._state == HALF_OPEN:
+                opening = True
+            else:
+                self._failures.append(True)
+                opening = (
+                    len(self._failures) >= self.min_calls
+                    and sum(self._failures) / len(self._failures) >= self.error_rate
+                )
+            if opening:
+                self._open(self.open_seconds)
+        if opening and self.cache is not None:
+            self.cache.set(
+                self.cache_key, time.time() + self.open_seconds, self.open_seconds
+            )
+
+    def call(self, func):
+        """
+        Return the result of ``func()``, which calls the Latch service,
+        recording its outcome.
+        """
+
+        self.before_call()
+        start = time.perf_counter()
+        try:
+            result = func()
+        except CONNECTION_ERRORS:
+            self.record_failure()
+            raise
+        except BaseException:
+            self._release_probe()
+            raise
+        self.record_success(time.perf_counter() - start)
+        return result
+
+    async def acall(self, afunc):
+        """
+        Asynchronous version of :meth:`call`, where ``afunc`` is a coroutine
+        function.
+        """
+
+        self.before_call()
+        start = time.perf_counter()
+        try:
+            result = await afunc()
+        except CONNECTION_ERRORS:
+            self.record_failure()
+            raise
+        except BaseException:
+            self._release_probe()
+            raise
+        self.record_success(time.perf_counter() - start)
+        return result
+
+    def reset(self):
+        """
+        Close the circuit and forget the outcome of the previous calls.
+        """
+
+        with self._lock:
+            self._state = CLOSED
+            self._probing = False
+            self._failures.clear()
+        if self.cache is not None:
+            self.cache.delete(self.cache_key)
+
+    def _release_probe(self):
+        """
+        Let another call probe the Latch service, as the current probe
+        ended without telling whether it is working.
+        """
+
+        with self._lock:
+            self._probing = False
+
+
+_breaker = None  # pylint: disable=invalid-name
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker():
+    """
+    Return the :class:`CircuitBreaker` of the process, configured by the
+    :data:`LATCH_CIRCUIT_BREAKER` settings, or ``None`` if it is disabled.
+
+    The lock is only taken to create it, so the calls to the Latch service
+    don't contend on it.
+    """
+
+    global _breaker  # pylint: disable=global-statement
+
+    if not getattr(settings, "LATCH_CIRCUIT_BREAKER", False):
+        return None
+    breaker = _breaker
+    if breaker is not None:
+        return breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                window=getattr(
+                    settings, "LATCH_CIRCUIT_BREAKER_WINDOW", DEFAULT_WINDOW
+                ),
+                min_calls=getattr(
+                    settings, "LATCH_CIRCUIT_BREAKER_MIN_CALLS", DEFAULT_MIN_CALLS
+                ),
+                error_rate=getattr(
+                    settings, "LATCH_CIRCUIT_BREAKER_ERROR_RATE", DEFAULT_ERROR_RATE
+                ),
+                slow_call=getattr(settings, "LATCH_CIRCUIT_BREAKER_SLOW_CALL", None),
+                open_seconds=getattr(
+                    settings, "LATCH_CIRCUIT_BREAKER_OPEN_SECONDS", DEFAULT_OPEN_SECONDS
+                ),
+                cache_alias=getattr(settings, "LATCH_CIRCUIT_BREAKER_CACHE", None),
+            )
+        return _breaker
+
+
+def guard(func):
+    """
+    Return the result of ``func()``, which calls the Latch service, through
+    the circuit breaker if it is enabled.
+    """
+
+    breaker = get_circuit_breaker()
+    if breaker is None:
+        return func()
+    return breaker.call(func)
+
+
+async def aguard(afunc):
+    """
+    Asynchronous version of :func:`guard`.
+    """
+
+    breaker = get_circuit_breaker()
+    if breaker is None:
+        return await afunc()
+    return await breaker.acall(afunc)
+
+
+@receiver(setting_changed)
+def reset_circuit_breaker(*, setting, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard the circuit breaker when one of its settings changes.
+    """
+
+    global _breaker  # pylint: disable=global-statement
+
+    if setting in BREAKER_SETTINGS:
+        with _breaker_lock:
+            _breaker = None
@@ -0,0 +1,59 @@
+"""
+Budgets that limit the extra requests sent to the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import threading
+
+
+class TokenBucket:
+    """
+    Token bucket that limits the ratio of extra requests, such as hedges or
+    retries, to the number of calls.
+
+    Every call adds ``ratio`` tokens, up to ``max_tokens``, and every extra
+    request spends one, so in the long run there are at most ``ratio``
+    extra requests per call, with bursts of at most ``max_tokens``.
+
+    The bucket starts full, so a process that was just started can make
+    extra requests before it has served enough calls to earn them.
+
+    :param int max_tokens: Maximum number of tokens kept.
+    :param initial: Tokens available at the start, ``max_tokens`` if
+        ``None``.
+    :type initial: int or None
+    """
+
+    def __init__(self, max_tokens=10, initial=None):
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens if initial is None else initial
+        self._lock = threading.Lock()
+
+    def deposit(self, ratio):
+        """
+        Add the ``ratio`` tokens earned by a call.
+        """
+
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + ratio)
+
+    def can_withdraw(self):
+        """
+        Return whether there is a token to spend, without spending it.
+        """
+
+        with self._lock:
+            return self._tokens >= 1
+
+    def withdraw(self):
+        """
+        Spend a token for an extra request, returning ``False`` if there
+        isn't any.
+        """
+
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
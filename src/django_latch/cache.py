@@ -0,0 +1,199 @@
+"""
+Cache of the latch status of the accounts, on top of Django's cache framework.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import collections
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+#: Default seconds an open latch status is cached.
+DEFAULT_OPEN_TTL = 5
+
+#: Default seconds a closed latch status is cached.
+DEFAULT_CLOSED_TTL = 1
+
+CachedStatus = collections.namedtuple("CachedStatus", ["can_pass", "fetched_at"])
+CachedStatus.__doc__ = """
+A latch status stored in the cache, along with the timestamp of when it was
+fetched from the Latch service.
+"""
+
+
+class StatusCache:
+    """
+    Store whether the latch of a Latch account is open, keyed by its
+    account id.
+
+    Open and closed statuses have their own time to live, so a closed
+    latch can be kept for less time than an open one. A time to live of
+    ``0`` disables the caching of that status.
+
+    Once its time to live has passed, a status is stale. Stale statuses are
+    kept for ``stale_while_revalidate`` more seconds, during which they can
+    be returned while a fresh one is fetched, and for ``stale_if_error``
+    more seconds, during which they can be returned if the Latch service
+    fails.
+
+    :param str alias: Alias of the cache in the :setting:`CACHES` setting.
+    :param float open_ttl: Seconds an open status is fresh.
+    :param float closed_ttl: Seconds a closed status is fresh.
+    :param float stale_while_revalidate: Seconds a stale status may be
+        returned while it is refreshed.
+    :param float stale_if_error: Seconds a stale status may be returned
+        if it cannot be refreshed.
+    """
+
+    key_prefix = "django_latch:status:"
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, alias, open_ttl, closed_ttl, stale_while_revalidate=0, stale_if_error=0
+    ):
+        self.cache = caches[alias]
+        self.open_ttl = open_ttl
+        self.closed_ttl = closed_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+
+    def make_key(self, account_id):
+        """
+        Return the cache key of ``account_id``.
+        """
+
+        return f"{self.key_prefix}{account_id}"
+
+    def get_ttl(self, can_pass):
+        """
+        Return the time to live of a status.
+        """
+
+        return self.open_ttl if can_pass else self.closed_ttl
+
+    def get_age(self, entry):
+        """
+        Return the seconds since ``entry`` was fetched.
+        """
+
+        return time.time() - entry.fetched_at
+
+    def is_fresh(self, entry):
+        """
+        Return whether ``entry`` is within its time to live.
+        """
+
+        return self.get_age(entry) < self.get_ttl(entry.can_pass)
+
+    def can_revalidate(self, entry):
+        """
+        Return whether ``entry`` may be returned while it is refreshed.
+        """
+
+        return self.get_age(entry) < (
+            self.get_ttl(entry.can_pass) + self.stale_while_revalidate
+        )
+
+    def can_serve_on_error(self, entry):
+        """
+        Return whether ``entry`` may be returned if it cannot be refreshed.
+        """
+
+        return self.get_age(entry) < self.get_ttl(entry.can_pass) + self.stale_if_error
+
+    def _build_entry(self, can_pass):
+        """
+        Return the entry to store and its timeout in the cache, or ``None``
+        if the status must not be cached.
+        """
+
+        ttl = self.get_ttl(can_pass)
+        if not ttl:
+            return None
+        timeout = ttl + max(self.stale_while_revalidate, self.stale_if_error)
+        return CachedStatus(can_pass, time.time()), timeout
+
+    def get(self, account_id):
+        """
+        Return the :class:`CachedStatus` of ``account_id``, which may be
+        stale, or ``None`` if it isn't cached.
+        """
+
+        entry = self.cache.get(self.make_key(account_id))
+        return None if entry is None else CachedStatus(*entry)
+
+    def get_many(self, account_ids):
+        """
+        Return a dictionary with the :class:`CachedStatus` of the cached
+        accounts of ``account_ids``, in a single lookup.
+        """
+
+        keys = {self.make_key(account_id): account_id for account_id in account_ids}
+        return {
+            keys[key]: CachedStatus(*entry)
+            for key, entry in self.cache.get_many(keys).items()
+        }
+
+    def set(self, account_id, can_pass):
+        """
+        Cache the status of ``account_id``.
+        """
+
+        built = self._build_entry(can_pass)
+        if built is not None:
+            self.cache.set(self.make_key(account_id), tuple(built[0]), built[1])
+
+    def delete(self, account_id):
+        """
+        Remove the cached status of ``account_id``.
+        """
+
+        self.cache.delete(self.make_key(account_id))
+
+    async def aget(self, account_id):
+        """
+        Asynchronous version of :meth:`get`.
+        """
+
+        entry = await self.cache.aget(self.make_key(account_id))
+        return None if entry is None else CachedStatus(*entry)
+
+    async def aget_many(self, account_ids):
+        """
+        Asynchronous version of :meth:`get_many`.
+        """
+
+        keys = {self.make_key(account_id): account_id for account_id in account_ids}
+        return {
+            keys[key]: CachedStatus(*entry)
+            for key, entry in (await self.cache.aget_many(keys)).items()
+        }
+
+    async def aset(self, account_id, can_pass):
+        """
+        Asynchronous version of :meth:`set`.
+        """
+
+        built = self._build_entry(can_pass)
+        if built is not None:
+            await self.cache.aset(self.make_key(account_id), tuple(built[0]), built[1])
+
+
+def get_status_cache():
+    """
+    Return the :class:`StatusCache` configured by the
+    :data:`LATCH_STATUS_CACHE` setting, or ``None`` if the status
+    is not cached.
+    """
+
+    alias = getattr(settings, "LATCH_STATUS_CACHE", None)
+    if alias is None:
+        return None
+    return StatusCache(
+        alias,
+        getattr(settings, "LATCH_STATUS_CACHE_OPEN_TTL", DEFAULT_OPEN_TTL),
+        getattr(settings, "LATCH_STATUS_CACHE_CLOSED_TTL", DEFAULT_CLOSED_TTL),
+        getattr(settings, "LATCH_STATUS_CACHE_STALE_WHILE_REVALIDATE", 0),
+        getattr(settings, "LATCH_STATUS_CACHE_STALE_IF_ERROR", 0),
+    )
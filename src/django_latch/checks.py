@@ -9,6 +9,9 @@ from django.core import checks
 from django.utils.module_loading import import_string
 from django.conf import settings
 
+from .policies import validate_url_policies
+from .status import FAILURE_POLICIES
+
 
 def _issubclass(cls, classinfo):
     """
@@ -97,7 +100,8 @@ def check_dependencies(app_configs, **kwargs):  # pylint: disable=unused-argumen
 
 def check_settings(app_configs, **kwargs):  # pylint: disable=unused-argument
     """
-    Check that the Latch's application id and secret key settings are set.
+    Check that the Latch's application id and secret key settings are set,
+    and that the optional settings have valid values.
     """
 
     errors = []
@@ -118,4 +122,27 @@ def check_settings(app_configs, **kwargs):  # pylint: disable=unused-argument
                     id=f"django_latch.E{error_code}",
                 )
             )
+
+    failure_policy = getattr(settings, "LATCH_FAILURE_POLICY", "raise")
+    if failure_policy not in FAILURE_POLICIES:
+        errors.append(
+            checks.Error(
+                f"'LATCH_FAILURE_POLICY' cannot be {failure_policy!r}, the only "
+                "valid values are 'raise', 'allow', 'deny' or 'last-known'.",
+                id="django_latch.E107",
+            )
+        )
     return errors
+
+
+def check_url_policies(app_configs, **kwargs):  # pylint: disable=unused-argument
+    """
+    Check that the :data:`LATCH_URL_POLICIES` setting can be compiled.
+    """
+
+    return [
+        checks.Error(message, id=f"django_latch.E{error_code}")
+        for message, error_code in validate_url_policies(
+            getattr(settings, "LATCH_URL_POLICIES", ())
+        )
+    ]
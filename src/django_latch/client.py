@@ -0,0 +1,180 @@
+"""
+Registry of reusable Latch SDK clients.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import inspect
+import threading
+import weakref
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+#: Settings whose change makes every registered client obsolete.
+CLIENT_SETTINGS = frozenset(
+    {
+        "LATCH_APP_ID",
+        "LATCH_SECRET_KEY",
+        "LATCH_HTTP_BACKEND",
+        "LATCH_HTTP_POOL_SIZE",
+        "LATCH_HTTP_POOL_IDLE_TIMEOUT",
+        "LATCH_ASYNC_HTTP_BACKEND",
+    }
+)
+
+_registries = weakref.WeakSet()
+
+
+class LatchClientRegistry:
+    """
+    Build a Latch SDK client on first use and reuse it afterwards.
+
+    A single client is shared by the whole process when ``thread_safe()``
+    returns ``True`` at build time. Otherwise, every thread gets its own
+    client, so HTTP sessions that are not safe to share are never used
+    concurrently.
+
+    Every registry is rebuilt when one of :data:`CLIENT_SETTINGS` changes
+    (see :func:`reset_clients`), and it can be rebuilt explicitly with
+    :meth:`reset`.
+
+    :param callable factory: Callable without arguments that builds a new
+        client.
+    :param callable thread_safe: Callable without arguments that tells
+        if the client built by ``factory`` can be shared between threads.
+    """
+
+    def __init__(self, factory, thread_safe):
+        self._factory = factory
+        self._thread_safe = thread_safe
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shared = None
+        self._generation = 0
+        _registries.add(self)
+
+    def get(self):
+        """
+        Return the client for the current process or thread, building it
+        if it doesn't exist yet.
+        """
+
+        client = self._shared
+        if client is not None:
+            return client
+
+        local = self._local
+        if getattr(local, "generation", None) == self._generation:
+            return local.client
+
+        with self._lock:
+            if self._shared is not None:
+                return self._shared
+            client = self._factory()
+            generation = self._generation
+            if self._thread_safe():
+                self._shared = client
+                return client
+
+        local.client = client
+        local.generation = generation
+        return client
+
+    def reset(self):
+        """
+        Drop the built clients, so the next call to :meth:`get` builds a new one.
+
+        Clients owned by other threads are discarded the next time those
+        threads ask for them.
+        """
+
+        with self._lock:
+            self._shared = None
+            self._generation += 1
+
+
+async def aclose_client(client):
+    """
+    Close the HTTP session held by the core of an asynchronous ``client``,
+    if the core has a way of closing it.
+    """
+
+    close = getattr(client.core, "aclose", None) or getattr(client.core, "close", None)
+    if close is not None:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+
+
+class AsyncLatchClientRegistry:
+    """
+    Build an asynchronous Latch SDK client on first use in an event loop and
+    reuse it afterwards in the same loop.
+
+    HTTP sessions of the asynchronous backends are bound to the event loop
+    that created them, so there is a client per loop. The client of a loop
+    is closed by :meth:`aclose`, which is meant to be awaited when the
+    application shuts down, or by :meth:`reset`. Clients of loops that are
+    garbage collected are discarded.
+
+    :param callable factory: Callable without arguments that builds a new
+        client. It is called from the event loop that will use the client.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._clients = weakref.WeakKeyDictionary()
+        _registries.add(self)
+
+    def get(self):
+        """
+        Return the client for the running event loop, building it if it
+        doesn't exist yet.
+        """
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(loop)
+                if client is None:
+                    client = self._clients[loop] = self._factory()
+        return client
+
+    async def aclose(self):
+        """
+        Close and drop the client of the running event loop.
+        """
+
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await aclose_client(client)
+
+    def reset(self):
+        """
+        Drop the clients of every event loop, closing them in their own loop
+        if it is still running.
+        """
+
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+
+        for loop, client in clients:
+            if loop.is_running() and not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(aclose_client(client), loop)
+
+
+@receiver(setting_changed)
+def reset_clients(*, setting, **kwargs):  # pylint: disable=unused-argument
+    """
+    Reset every registry when a setting used to build the clients changes.
+    """
+
+    if setting in CLIENT_SETTINGS:
+        for registry in list(_registries):
+            registry.reset()
@@ -0,0 +1,129 @@
+"""
+Values scoped to the request being processed.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import contextlib
+import contextvars
+import time
+
+_request_memo = contextvars.ContextVar("django_latch_request_memo", default=None)
+_deadline = contextvars.ContextVar("django_latch_deadline", default=None)
+
+
+@contextlib.contextmanager
+def request_scope():
+    """
+    Context manager that memoizes the Latch lookups done inside it.
+
+    It is used by :class:`~django_latch.middleware.LatchRequestScopeMiddleware`
+    to cover a whole request, but it can also wrap any other unit of work,
+    such as a task of a task queue.
+    """
+
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def memoize(key, func):
+    """
+    Return the value of ``func()``, calling it only once for every ``key``
+    inside the current :func:`request_scope`. Outside a scope, ``func`` is
+    always called.
+    """
+
+    memo = _request_memo.get()
+    if memo is None:
+        return func()
+    try:
+        return memo[key]
+    except KeyError:
+        value = memo[key] = func()
+        return value
+
+
+async def amemoize(key, afunc):
+    """
+    Asynchronous version of :func:`memoize`, where ``afunc`` is a coroutine
+    function.
+    """
+
+    memo = _request_memo.get()
+    if memo is None:
+        return await afunc()
+    try:
+        return memo[key]
+    except KeyError:
+        value = memo[key] = await afunc()
+        return value
+
+
+def recall(key, default=None):
+    """
+    Return the memoized value of ``key`` in the current
+    :func:`request_scope`, or ``default`` if there isn't any.
+    """
+
+    memo = _request_memo.get()
+    if memo is None:
+        return default
+    return memo.get(key, default)
+
+
+def remember(key, value):
+    """
+    Set ``value`` as the memoized value of ``key`` in the current
+    :func:`request_scope`, if there is one.
+    """
+
+    memo = _request_memo.get()
+    if memo is not None:
+        memo[key] = value
+
+
+def forget(key):
+    """
+    Remove the memoized value of ``key`` from the current :func:`request_scope`.
+    """
+
+    memo = _request_memo.get()
+    if memo is not None:
+        memo.pop(key, None)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Context manager that gives the Latch calls done inside it at most
+    ``seconds`` in total. An outer deadline that expires earlier is kept.
+
+    It is used by :class:`~django_latch.middleware.LatchDeadlineMiddleware`
+    to bound the Latch calls of a request by :data:`LATCH_REQUEST_DEADLINE`.
+    """
+
+    expires_at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        expires_at = min(expires_at, outer)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_time():
+    """
+    Return the seconds left until the current :func:`deadline` expires,
+    which are negative if it has already expired, or ``None`` if there
+    isn't any deadline.
+    """
+
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
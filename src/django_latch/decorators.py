@@ -4,10 +4,19 @@ Function decorators that check the status of a user according to the configurati
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+from functools import wraps
+
+import django
+from asgiref.sync import iscoroutinefunction
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
 
-from .models import is_paired
+from .models import ais_paired, is_paired
+from .operations import acan_pass_operations, can_pass_operations
+from .sessions import aget_session_latch_config, get_session_latch_config
+
+# user_passes_test supports asynchronous views and tests since Django 5.1.
+ASYNC_USER_PASSES_TEST = django.VERSION >= (5, 1)
 
 
 def first_authenticated_then_other(condition_func, user):
@@ -28,6 +37,70 @@ def first_authenticated_then_other(condition_func, user):
     return False
 
 
+async def afirst_authenticated_then_other(acondition_func, user):
+    """
+    Asynchronous version of :func:`first_authenticated_then_other`, where
+    ``acondition_func`` is a coroutine function.
+    """
+    if user.is_authenticated:
+        if await acondition_func(user):
+            return True
+        raise PermissionDenied
+    return False
+
+
+def _pairing_test_decorator(condition_func, acondition_func):
+    """
+    Return a decorator that checks ``condition_func`` on synchronous views
+    and awaits ``acondition_func`` on asynchronous ones, so the latter
+    don't run the pairing query in a thread.
+
+    The latch configuration of the user is loaded beforehand through
+    :func:`~django_latch.sessions.get_session_latch_config`, so it can be
+    taken from the session.
+    """
+
+    def decorator(view_func):
+        """
+        Return ``view_func`` wrapped to check the condition on its user.
+        """
+
+        if ASYNC_USER_PASSES_TEST and iscoroutinefunction(view_func):
+
+            async def test_func(user):
+                """Await the asynchronous condition on ``user``."""
+                return await afirst_authenticated_then_other(acondition_func, user)
+
+            checked_view = user_passes_test(test_func)(view_func)
+
+            @wraps(view_func)
+            async def _view_wrapper(request, *args, **kwargs):
+                """Load the pairing of the user and call the checked view."""
+                user = await request.auser()
+                if user.is_authenticated:
+                    await aget_session_latch_config(request, user)
+                return await checked_view(request, *args, **kwargs)
+
+        else:
+
+            def test_func(user):
+                """Check the synchronous condition on ``user``."""
+                return first_authenticated_then_other(condition_func, user)
+
+            checked_view = user_passes_test(test_func)(view_func)
+
+            @wraps(view_func)
+            def _view_wrapper(request, *args, **kwargs):
+                """Load the pairing of the user and call the checked view."""
+                if request.user.is_authenticated:
+                    get_session_latch_config(request, request.user)
+                return checked_view(request, *args, **kwargs)
+
+        return _view_wrapper
+
+    return decorator
+
+
 def paired_user_required(function=None):
     """
     Decorator for views that checks that the authenticated user is paired with
@@ -47,11 +120,12 @@ def paired_user_required(function=None):
     This decorator implies that a user must be logged in, so using
     :func:`~django.contrib.auth.decorators.login_required` is not necessary
     when :func:`~django_latch.decorators.paired_user_required` is present.
+
+    Since Django 5.1, when the decorated view is asynchronous the pairing is
+    checked without blocking the event loop.
     """
 
-    actual_decorator = user_passes_test(
-        lambda u: first_authenticated_then_other(is_paired, u)
-    )
+    actual_decorator = _pairing_test_decorator(is_paired, ais_paired)
     if function:
         return actual_decorator(function)
     return actual_decorator  # pragma: no cover
@@ -76,6 +150,9 @@ def unpaired_user_required(function=None):
     This decorator implies that a user must be logged in, so using
     :func:`~django.contrib.auth.decorators.login_required` is not necessary
     when :func:`~django_latch.decorators.unpaired_user_required` is present.
+
+    Since Django 5.1, when the decorated view is asynchronous the pairing is
+    checked without blocking the event loop.
     """
 
     def not_paired(user):
@@ -84,9 +161,51 @@ def unpaired_user_required(function=None):
         """
         return not is_paired(user)
 
-    actual_decorator = user_passes_test(
-        lambda u: first_authenticated_then_other(not_paired, u)
-    )
+    async def anot_paired(user):
+        """
+        Asynchronous version of ``not_paired``.
+        """
+        return not await ais_paired(user)
+
+    actual_decorator = _pairing_test_decorator(not_paired, anot_paired)
     if function:
         return actual_decorator(function)
     return actual_decorator  # pragma: no cover
+
+
+def latch_operation_required(*operation_ids):
+    """
+    Decorator for views that checks that the latches of the operations
+    ``operation_ids`` of the authenticated user are open::
+
+        @latch_operation_required("transfer", "withdraw")
+        def transfer(request):
+            ...
+
+    It has the same the behaviour as
+    :class:`~django_latch.mixins.LatchOperationRequiredMixin`, which is the
+    following:
+
+    * If the user isn't logged in, it redirects to :setting:`settings.LOGIN_URL <LOGIN_URL>`
+      passing the current absolute path in the query string.
+    * If the user is paired and the latch of any of the operations, or of an
+      operation or account containing it, is closed, then the decorator will
+      raise :exc:`~django.core.exceptions.PermissionDenied`, prompting
+      `the 403 (HTTP Forbidden) view
+      <https://docs.djangoproject.com/en/5.2/ref/views/#http-forbidden-view>`_
+      instead of redirecting to the login page.
+    * Unpaired users have no latches, so they are let through.
+
+    The statuses of the operations are looked up together, see
+    :func:`~django_latch.operations.get_operation_statuses`.
+    """
+
+    def can_pass(user):
+        """Return whether ``user`` can pass the operations."""
+        return can_pass_operations(user, operation_ids)
+
+    async def acan_pass(user):
+        """Asynchronous version of ``can_pass()``."""
+        return await acan_pass_operations(user, operation_ids)
+
+    return _pairing_test_decorator(can_pass, acan_pass)
@@ -4,13 +4,15 @@ Exception classes used in Latch operations.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+from http.client import HTTPException
+
 
 class BaseLatchError(Exception):
     """
     Base class for errors during latch operation.
 
     This exception will not be raised anywhere, it just serves
-    as a base for the other two exception types.
+    as a base for the other exception types.
 
     :param str message: A human-readable error message.
     :param str code: A unique identifier used to distinguish different
@@ -35,3 +37,21 @@ class UnpairingLatchError(BaseLatchError):
     """
     Exception class to indicate errors during latch's unpairing.
     """
+
+
+class CircuitOpenError(BaseLatchError):
+    """
+    Exception class to indicate that the Latch service was not called
+    because the circuit breaker is open.
+    """
+
+
+class InvalidResponseError(BaseLatchError, HTTPException):
+    """
+    Exception class to indicate that the Latch service answered with a
+    server error or a body that isn't JSON, as a proxy in front of it may
+    do. The code is the HTTP status.
+
+    It is a subclass of :exc:`http.client.HTTPException`, so it's handled
+    as a failure to reach the Latch service.
+    """
@@ -4,14 +4,19 @@ Form for latch pairing.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import asyncio
+import time
+
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
-from latch_sdk.exceptions import TokenNotFound, ApplicationAlreadyPaired
+from latch_sdk.exceptions import TokenNotFound, ApplicationAlreadyPaired, LatchError
 
-from .models import LatchUserConfig
-from . import get_latch_api
+from .models import LatchUserConfig, set_latch_config
+from .signals import asend, has_receivers, latch_paired, send
+from .transports import CONNECTION_ERRORS, get_timeouts
+from . import aget_latch_api, get_latch_api
 
 # pylint: disable=raise-missing-from
 
@@ -22,17 +27,26 @@ class PairLatchForm(forms.Form):
 
     .. automethod:: clean_token
 
+    .. automethod:: ais_valid
+
     .. automethod:: pair_account
+
+    .. automethod:: apair_account
     """
 
     NOT_FOUND_TOKEN_MESSAGE = _("The token you provided hasn't been found.")
     ALREADY_PAIRED_MESSAGE = _("Your account is already paired.")
+    UNAVAILABLE_MESSAGE = _(
+        "The Latch service is not available at the moment. Try again later."
+    )
 
     token = forms.CharField(max_length=100)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.account_id = None
+        self.pair_duration = None
+        self._pair_later = False
 
     def clean_token(self):
         """
@@ -47,12 +61,19 @@ class PairLatchForm(forms.Form):
         If the user has already pair its account, then a
         :exc:`django.core.exceptions.ValidationError` is raised with
         the code ``'already_paired'``.
+        If the Latch service fails, can't be reached or doesn't answer in
+        time, then a :exc:`django.core.exceptions.ValidationError` is raised
+        with the code ``'unavailable'``.
         """
 
         token = self.cleaned_data["token"]
+        if self._pair_later:
+            return token
+        start = time.perf_counter()
         try:
             latch_api = get_latch_api()
             self.account_id = latch_api.account_pair(token)
+            self.pair_duration = time.perf_counter() - start
             return token
         except TokenNotFound:
             raise ValidationError(self.NOT_FOUND_TOKEN_MESSAGE, code="not_found")
@@ -63,6 +84,51 @@ class PairLatchForm(forms.Form):
         except ApplicationAlreadyPaired:
             raise ValidationError(self.ALREADY_PAIRED_MESSAGE, code="already_paired")
 
+        except (LatchError, *CONNECTION_ERRORS):
+            raise ValidationError(self.UNAVAILABLE_MESSAGE, code="unavailable")
+
+    async def ais_valid(self):
+        """
+        Asynchronous version of :meth:`~django.forms.Form.is_valid`.
+
+        The token is validated with the asynchronous Latch client, raising
+        the same validation errors as :meth:`clean_token`. The request is
+        cancelled after the total of the
+        :func:`~django_latch.transports.get_timeouts`, failing with the
+        ``'unavailable'`` code.
+        """
+
+        self._pair_later = True
+        try:
+            if not self.is_valid():
+                return False
+        finally:
+            self._pair_later = False
+
+        start = time.perf_counter()
+        try:
+            timeouts = get_timeouts()
+            latch_api = await aget_latch_api()
+            self.account_id = await asyncio.wait_for(
+                latch_api.account_pair(self.cleaned_data["token"]), timeouts.total
+            )
+            self.pair_duration = time.perf_counter() - start
+        except TokenNotFound:
+            self.add_error(
+                "token", ValidationError(self.NOT_FOUND_TOKEN_MESSAGE, code="not_found")
+            )
+        except ApplicationAlreadyPaired:
+            self.add_error(
+                "token",
+                ValidationError(self.ALREADY_PAIRED_MESSAGE, code="already_paired"),
+            )
+        except (LatchError, *CONNECTION_ERRORS):
+            self.add_error(
+                "token",
+                ValidationError(self.UNAVAILABLE_MESSAGE, code="unavailable"),
+            )
+        return not self.errors
+
     def pair_account(self, user):
         """
         Pair the user account with a Latch account id.
@@ -70,7 +136,38 @@ class PairLatchForm(forms.Form):
         As the account id has been already obtained by checking
         the validity of the token, this method only creates the instance
         for storing the account id.
+
+        Then the :data:`~django_latch.signals.latch_paired` signal is sent,
+        with the time taken by the Latch service to pair the account.
         """
 
         config = LatchUserConfig.objects.create(user=user, account_id=self.account_id)
+        set_latch_config(user, config)
+        if has_receivers(latch_paired):
+            send(
+                latch_paired,
+                user,
+                config=config,
+                duration=self.pair_duration,
+                from_cache=False,
+            )
+        return config
+
+    async def apair_account(self, user):
+        """
+        Asynchronous version of :meth:`pair_account`.
+        """
+
+        config = await LatchUserConfig.objects.acreate(
+            user=user, account_id=self.account_id
+        )
+        set_latch_config(user, config)
+        if has_receivers(latch_paired):
+            await asend(
+                latch_paired,
+                user,
+                config=config,
+                duration=self.pair_duration,
+                from_cache=False,
+            )
         return config
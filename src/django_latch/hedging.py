@@ -0,0 +1,235 @@
+"""
+Hedged requests to the Latch service, which cut the tail latency caused by
+occasional slow connections.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .budget import TokenBucket
+from .timing import LatencyHistogram
+
+#: Default percentile of the latencies after which a request is hedged.
+DEFAULT_HEDGE_PERCENTILE = 95
+
+#: Default ratio of requests that may be hedged.
+DEFAULT_HEDGE_BUDGET = 0.05
+
+#: Threads sending hedged requests. When all of them are busy, requests
+#: are sent without hedging.
+HEDGE_WORKERS = 16
+
+
+class Hedger:
+    """
+    Send a second request when the first one is slower than usual, and
+    return the first answer.
+
+    The second request is sent once the first one has taken longer than
+    the :data:`LATCH_HEDGE_PERCENTILE` of the latencies of the latest
+    requests, as long as the :class:`~django_latch.budget.TokenBucket` of
+    the hedges allows it. As every request takes its own connection from
+    the pool, the second one doesn't wait behind a slow connection.
+
+    The latencies are those of the single requests made through the
+    hedger, kept in :attr:`latencies`. Until ``min_samples`` of them have
+    been recorded, or while the budget is exhausted, requests are not
+    hedged and are made in the caller.
+
+    Synchronous requests that may be hedged run in a small pool of threads
+    created on first use, so they can be raced; asynchronous ones are tasks
+    in the running event loop.
+
+    :param int max_workers: Threads sending the synchronous requests.
+    :param int min_samples: Latencies needed to start hedging.
+    """
+
+    def __init__(self, max_workers=HEDGE_WORKERS, min_samples=20):
+        self.max_workers = max_workers
+        self.min_samples = min_samples
+        self.budget = TokenBucket()
+        self.latencies = LatencyHistogram()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._busy = 0
+
+    def get_delay(self):
+        """
+        Return the seconds to wait for the first request before hedging it,
+        or ``None`` if it must not be hedged.
+        """
+
+        if len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(
+            getattr(settings, "LATCH_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)
+        )
+
+    def _start_request(self):
+        """
+        Count a new request in the budget and return the hedging delay, or
+        ``None`` if it can't be hedged.
+        """
+
+        self.budget.deposit(
+            getattr(settings, "LATCH_HEDGE_BUDGET", DEFAULT_HEDGE_BUDGET)
+        )
+        if not self.budget.can_withdraw():
+            return None
+        return self.get_delay()
+
+    def _timed(self, func):
+        """
+        Return a function that calls ``func()``, recording its latency in
+        :attr:`latencies` if it succeeds.
+        """
+
+        def timed():
+            """
+            Call ``func()``, recording its latency.
+            """
+
+            start = time.perf_counter()
+            result = func()
+            self.latencies.record(time.perf_counter() - start)
+            return result
+
+        return timed
+
+    def _atimed(self, afunc):
+        """
+        Asynchronous version of :meth:`_timed`.
+        """
+
+        async def atimed():
+            """
+            Await ``afunc()``, recording its latency.
+            """
+
+            start = time.perf_counter()
+            result = await afunc()
+            self.latencies.record(time.perf_counter() - start)
+            return result
+
+        return atimed
+
+    def _release(self, future):  # pylint: disable=unused-argument
+        """
+        Free the thread of ``future``, which has finished.
+        """
+
+        with self._lock:
+            self._busy -= 1
+
+    def _submit(self, func):
+        """
+        Run ``func`` in a thread with the context of the caller, returning
+        its :class:`~concurrent.futures.Future`, or ``None`` if every
+        thread is busy.
+        """
+
+        with self._lock:
+            if self._busy >= self.max_workers:
+                return None
+            self._busy += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="django_latch_hedge",
+                )
+        future = self._executor.submit(contextvars.copy_context().run, func)
+        future.add_done_callback(self._release)
+        return future
+
+    def call(self, func):
+        """
+        Return the result of ``func()``, which sends a request to the Latch
+        service, hedging it if it is slow.
+
+        If both requests fail, the exception of the last one is raised.
+        """
+
+        func = self._timed(func)
+        delay = self._start_request()
+        if delay is None:
+            return func()
+        primary = self._submit(func)
+        if primary is None:
+            return func()
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.budget.withdraw():
+            return primary.result()
+        second = self._submit(func)
+        if second is None:
+            return primary.result()
+
+        pending = {primary, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            if not pending:
+                return done.pop().result()
+
+    async def acall(self, afunc):
+        """
+        Asynchronous version of :meth:`call`, where ``afunc`` is a coroutine
+        function. The request that loses the race is cancelled.
+        """
+
+        afunc = self._atimed(afunc)
+        delay = self._start_request()
+        if delay is None:
+            return await afunc()
+
+        loop = asyncio.get_running_loop()
+        pending = {loop.create_task(afunc())}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done and self.budget.withdraw():
+                pending.add(loop.create_task(afunc()))
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    return done.pop().result()
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+hedger = Hedger()
+
+
+def hedge(func):
+    """
+    Return the result of ``func()`` through the :class:`Hedger` if the
+    :data:`LATCH_HEDGE` setting is enabled.
+    """
+
+    if not getattr(settings, "LATCH_HEDGE", False):
+        return func()
+    return hedger.call(func)
+
+
+async def ahedge(afunc):
+    """
+    Asynchronous version of :func:`hedge`.
+    """
+
+    if not getattr(settings, "LATCH_HEDGE", False):
+        return await afunc()
+    return await hedger.acall(afunc)
@@ -0,0 +1,511 @@
+"""
+In-process filter of the users who have configured the Latch service, which
+tells that a user isn't paired without querying the database.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import contextlib
+import hashlib
+import math
+import secrets
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .context import amemoize, memoize
+
+#: Largest user id stored in a :class:`Bitmap`, which takes 16 MiB. Users
+#: with larger or non-integer ids are stored in a :class:`BloomFilter`.
+BITMAP_MAX_ID = 2**27
+
+#: Ratio of unpaired users that a :class:`BloomFilter` reports as paired.
+DEFAULT_ERROR_RATE = 0.01
+
+#: Default number of changes that are applied to the filter instead of
+#: building it again.
+DEFAULT_MAX_CHANGES = 100
+
+#: Seconds the changes of the pairings are kept in the cache.
+CHANGES_TIMEOUT = 3600
+
+#: Settings whose change makes the filter obsolete.
+FILTER_SETTINGS = frozenset({"LATCH_PAIRED_USER_FILTER"})
+
+_random = secrets.SystemRandom()
+
+
+@contextlib.contextmanager
+def _try_lock(lock):
+    """
+    Acquire ``lock`` without blocking, yielding whether it was acquired, and
+    release it on exit if so.
+    """
+
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+class Bitmap:
+    """
+    Set of non-negative integers stored as a bit each, so ``n`` integers up
+    to ``max_value`` take ``max_value / 8`` bytes. It grows as larger
+    integers are added, up to :data:`BITMAP_MAX_ID`.
+
+    Negative integers can't be stored, so they are always reported as
+    members.
+
+    :param int max_value: Largest integer expected.
+    """
+
+    def __init__(self, max_value=0):
+        self._bits = bytearray((max_value >> 3) + 1)
+
+    def add(self, value):
+        """
+        Add ``value`` to the set, raising :exc:`ValueError` if it's larger
+        than :data:`BITMAP_MAX_ID`.
+        """
+
+        if value < 0:
+            return
+        if value > BITMAP_MAX_ID:
+            raise ValueError(f"{value} is larger than BITMAP_MAX_ID.")
+        index = value >> 3
+        if index >= len(self._bits):
+            self._bits.extend(bytes(index + 1 - len(self._bits)))
+        self._bits[index] |= 1 << (value & 7)
+
+    def discard(self, value):
+        """
+        Remove ``value`` from the set if it is a member.
+        """
+
+        index = value >> 3
+        if 0 <= index < len(self._bits):
+            self._bits[index] &= ~(1 << (value & 7)) & 0xFF
+
+    def __contains__(self, value):
+        """
+        Return whether ``value`` is in the set. Negative values are always
+        reported as members.
+        """
+
+        if value < 0:
+            return True
+        index = value >> 3
+        return index < len(self._bits) and bool(self._bits[index] & (1 << (value & 7)))
+
+    @property
+    def nbytes(self):
+        """
+        Bytes taken by the bits.
+        """
+
+        return len(self._bits)
+
+
+class BloomFilter:
+    """
+    Probabilistic set of values of any type, identified by their string
+    representation, that never reports a member as missing, but reports
+    about ``error_rate`` of the rest of values as members.
+
+    Values can't be removed from it, so :meth:`discard` does nothing and
+    the removed values keep being reported as members.
+
+    :param int capacity: Number of values expected. Adding more increases
+        the error rate.
+    :param float error_rate: Ratio of values reported as members without
+        being added, with ``capacity`` values added.
+    """
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(math.ceil(self.size / 8))
+
+    def _get_indexes(self, value):
+        """
+        Return the indexes of the bits of ``value``, by double hashing.
+        """
+
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        """
+        Add ``value`` to the set.
+        """
+
+        for index in self._get_indexes(value):
+            self._bits[index >> 3] |= 1 << (index & 7)
+
+    def discard(self, value):  # pylint: disable=unused-argument
+        """
+        Do nothing, as values can't be removed.
+        """
+
+    def __contains__(self, value):
+        """
+        Return ``False`` if ``value`` isn't in the set, or ``True`` if it
+        may be.
+        """
+
+        return all(
+            self._bits[index >> 3] & (1 << (index & 7))
+            for index in self._get_indexes(value)
+        )
+
+    @property
+    def nbytes(self):
+        """
+        Bytes taken by the bits.
+        """
+
+        return len(self._bits)
+
+
+class PairedUserFilter:
+    """
+    Keep in memory which users have a
+    :class:`~django_latch.models.LatchUserConfig`, so the lookups of the
+    latch configuration of the rest can be skipped.
+
+    The filter is built from the database on first use. Users with integer
+    ids up to :data:`BITMAP_MAX_ID` are stored in a :class:`Bitmap`, which is
+    exact, and the rest in a :class:`BloomFilter`, which reports some
+    unpaired users as paired. So :meth:`might_be_paired` may report an
+    unpaired user as paired, whose configuration is then looked up, but
+    never the contrary.
+
+    The configurations saved or deleted are recorded in the cache when
+    their transaction is committed, numbered by a generation counter. The
+    filter of every process compares the generation it was built for with
+    the one in the cache, once per
+    :func:`~django_latch.context.request_scope`, and applies the changes
+    recorded since, or builds the filter again if there are more than
+    ``max_changes`` or they are no longer in the cache. Changes made without
+    signals, such as ``bulk_create()`` or raw SQL, must be followed by a
+    call to :meth:`invalidate`. A user id that doesn't fit in the
+    :class:`Bitmap` makes the filter be built again, as a
+    :class:`BloomFilter`.
+
+    :param str cache_alias: Alias of the cache in the :setting:`CACHES`
+        setting used to share the changes between processes.
+    :param int max_changes: Number of changes applied instead of building
+        the filter again.
+    """
+
+    generation_key = "django_latch:paired_users:generation"
+    change_key_prefix = "django_latch:paired_users:change:"
+
+    def __init__(self, cache_alias, max_changes=DEFAULT_MAX_CHANGES):
+        self.cache = caches[cache_alias]
+        self.max_changes = max_changes
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._members = None
+        self._generation = None
+
+    @staticmethod
+    def _get_model():
+        """
+        Return the model of the latch configurations.
+        """
+
+        return apps.get_model("django_latch", "LatchUserConfig")
+
+    def _make_members(self, count, max_id):
+        """
+        Return an empty set for ``count`` user ids up to ``max_id``.
+        """
+
+        target_field = self._get_model()._meta.get_field("user").target_field  # pylint: disable=protected-access
+        if isinstance(target_field, models.IntegerField) and (
+            (max_id or 0) <= BITMAP_MAX_ID
+        ):
+            return Bitmap(max_id or 0)
+        return BloomFilter(max(2 * count, 1024))
+
+    def _load_members(self):
+        """
+        Return a new set of the ids of the paired users, loaded from the
+        database.
+        """
+
+        queryset = self._get_model()._default_manager.all()  # pylint: disable=protected-access
+        stats = queryset.aggregate(count=models.Count("pk"), max_id=models.Max("user"))
+        members = self._make_members(stats["count"], stats["max_id"])
+        for user_id in queryset.values_list("user", flat=True).iterator(
+            chunk_size=10000
+        ):
+            members.add(user_id)
+        return members
+
+    async def _aload_members(self):
+        """
+        Asynchronous version of :meth:`_load_members`.
+        """
+
+        queryset = self._get_model()._default_manager.all()  # pylint: disable=protected-access
+        stats = await queryset.aaggregate(
+            count=models.Count("pk"), max_id=models.Max("user")
+        )
+        members = self._make_members(stats["count"], stats["max_id"])
+        async for user_id in queryset.values_list("user", flat=True).aiterator(
+            chunk_size=10000
+        ):
+            members.add(user_id)
+        return members
+
+    def _get_change_keys(self, generation):
+        """
+        Return a tuple with the generation the filter was built for and the
+        cache keys of the changes from it to ``generation``, which are
+        ``None`` if the filter must be built again.
+        """
+
+        with self._lock:
+            built = self._generation
+        if built is None or not 0 < generation - built <= self.max_changes:
+            return built, None
+        return built, [
+            f"{self.change_key_prefix}{number}"
+            for number in range(built + 1, generation + 1)
+        ]
+
+    def _apply_changes(self, built, generation, keys, changes):
+        """
+        Apply ``changes``, the values of ``keys`` in the cache, to the
+        filter built for the generation ``built``, returning ``False`` if
+        they are incomplete and the filter must be built again.
+        """
+
+        if keys is None or len(changes) != len(keys):
+            return False
+        with self._lock:
+            if self._generation != built:
+                return self._generation == generation
+            try:
+                for key in keys:
+                    added, user_id = changes[key]
+                    if added:
+                        self._members.add(user_id)
+                    else:
+                        self._members.discard(user_id)
+            except ValueError:
+                # The user id doesn't fit in the bitmap.
+                self._generation = None
+                return False
+            self._generation = generation
+        return True
+
+    def _contains(self, user_id):
+        """
+        Check if ``user_id`` is in the filter.
+        """
+
+        with self._lock:
+            return user_id in self._members
+
+    def get_generation(self):
+        """
+        Return the generation of the pairings in the cache, setting a random
+        one if there isn't any, so a generation lost by the cache never
+        matches the previous ones.
+        """
+
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, _random.getrandbits(62), None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    async def aget_generation(self):
+        """
+        Asynchronous version of :meth:`get_generation`.
+        """
+
+        generation = await self.cache.aget(self.generation_key)
+        if generation is None:
+            await self.cache.aadd(self.generation_key, _random.getrandbits(62), None)
+            generation = await self.cache.aget(self.generation_key)
+        return generation
+
+    def might_be_paired(self, user_id):
+        """
+        Return ``False`` if the user ``user_id`` is not paired, or ``True``
+        if it may be.
+
+        While the filter is being built by another thread, ``True`` is
+        returned without waiting for it.
+        """
+
+        generation = memoize(("paired_users",), self.get_generation)
+        built, keys = self._get_change_keys(generation)
+        if built != generation:
+            changes = {} if keys is None else self.cache.get_many(keys)
+            if not self._apply_changes(built, generation, keys, changes):
+                with _try_lock(self._build_lock) as acquired:
+                    if not acquired:
+                        return True
+                    members = self._load_members()
+                    with self._lock:
+                        self._members, self._generation = members, generation
+        return self._contains(user_id)
+
+    async def amight_be_paired(self, user_id):
+        """
+        Asynchronous version of :meth:`might_be_paired`.
+        """
+
+        generation = await amemoize(("paired_users",), self.aget_generation)
+        built, keys = self._get_change_keys(generation)
+        if built != generation:
+            changes = {} if keys is None else await self.cache.aget_many(keys)
+            if not self._apply_changes(built, generation, keys, changes):
+                with _try_lock(self._build_lock) as acquired:
+                    if not acquired:
+                        return True
+                    members = await self._aload_members()
+                    with self._lock:
+                        self._members, self._generation = members, generation
+        return self._contains(user_id)
+
+    def add(self, user_id):
+        """
+        Add ``user_id`` to the filter of this process, if it's built, or
+        make it be built again if ``user_id`` doesn't fit in it.
+        """
+
+        with self._lock:
+            if self._members is not None:
+                try:
+                    self._members.add(user_id)
+                except ValueError:
+                    self._generation = None
+
+    def record_change(self, user_id, added):
+        """
+        Record in the cache that the user ``user_id`` was paired, if
+        ``added``, or unpaired, so the filters of every process apply it.
+        """
+
+        try:
+            generation = self.cache.incr(self.generation_key)
+        except ValueError:
+            self.get_generation()
+            generation = self.cache.incr(self.generation_key)
+        self.cache.set(
+            f"{self.change_key_prefix}{generation}", (added, user_id), CHANGES_TIMEOUT
+        )
+
+    def invalidate(self):
+        """
+        Make the filters of every process be built again.
+        """
+
+        self.cache.delete(self.generation_key)
+
+
+_filter = None  # pylint: disable=invalid-name
+_filter_lock = threading.Lock()
+
+
+def get_paired_user_filter():
+    """
+    Return the :class:`PairedUserFilter` of the process, or ``None`` if the
+    :data:`LATCH_PAIRED_USER_FILTER` setting is not set.
+    """
+
+    global _filter  # pylint: disable=global-statement
+
+    alias = getattr(settings, "LATCH_PAIRED_USER_FILTER", None)
+    if alias is None:
+        return None
+    with _filter_lock:
+        if _filter is None:
+            _filter = PairedUserFilter(alias)
+        return _filter
+
+
+def might_be_paired(user):
+    """
+    Return ``False`` if ``user`` is known not to be paired, or ``True`` if
+    it may be, or if the :class:`PairedUserFilter` is disabled.
+    """
+
+    paired_user_filter = get_paired_user_filter()
+    return paired_user_filter is None or paired_user_filter.might_be_paired(user.pk)
+
+
+async def amight_be_paired(user):
+    """
+    Asynchronous version of :func:`might_be_paired`.
+    """
+
+    paired_user_filter = get_paired_user_filter()
+    return paired_user_filter is None or await paired_user_filter.amight_be_paired(
+        user.pk
+    )
+
+
+@receiver(post_save, sender="django_latch.LatchUserConfig")
+def record_pairing(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Add the user of a saved latch configuration to the filter of this
+    process at once, and record the change for the rest when it's
+    committed.
+    """
+
+    paired_user_filter = get_paired_user_filter()
+    if paired_user_filter is not None:
+        paired_user_filter.add(instance.user_id)
+        transaction.on_commit(
+            lambda: paired_user_filter.record_change(instance.user_id, True),
+            using=kwargs.get("using"),
+        )
+
+
+@receiver(post_delete, sender="django_latch.LatchUserConfig")
+def record_unpairing(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Record that the user of a deleted latch configuration is no longer
+    paired when it's committed.
+    """
+
+    paired_user_filter = get_paired_user_filter()
+    if paired_user_filter is not None:
+        transaction.on_commit(
+            lambda: paired_user_filter.record_change(instance.user_id, False),
+            using=kwargs.get("using"),
+        )
+
+
+@receiver(setting_changed)
+def reset_paired_user_filter(*, setting, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard the filter when its setting changes.
+    """
+
+    global _filter  # pylint: disable=global-statement
+
+    if setting in FILTER_SETTINGS:
+        with _filter_lock:
+            _filter = None
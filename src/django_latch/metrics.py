@@ -0,0 +1,349 @@
+"""
+Metrics of the requests made to the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import bisect
+import collections
+import inspect
+import threading
+import time
+
+from latch_sdk.exceptions import LatchError
+
+#: Upper bounds, in seconds, of the buckets of the latency histograms.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+#: Content type of the metrics exported by :meth:`Metrics.export`.
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Cumulative histogram of latencies, as exported by Prometheus.
+
+    :param tuple buckets: Increasing upper bounds of the buckets, in seconds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self):
+        """
+        Number of latencies observed.
+        """
+
+        return sum(self.counts)
+
+    def observe(self, seconds):
+        """
+        Add a latency.
+        """
+
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        """
+        Return a list of ``(upper_bound, count)``, where ``count`` is the
+        number of latencies less than or equal to ``upper_bound``, ending
+        with ``float("inf")``.
+        """
+
+        total = 0
+        result = []
+        for upper_bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((upper_bound, total))
+        return result
+
+
+def _get_error_code(exc):
+    """
+    Return the label of the error ``exc``: its code if it is a
+    :class:`~latch_sdk.exceptions.LatchError`, otherwise the name of its
+    class.
+    """
+
+    if isinstance(exc, LatchError) and exc.code is not None:
+        return str(exc.code)
+    return type(exc).__name__
+
+
+def _format_labels(**labels):
+    """
+    Return ``labels`` in the Prometheus text format.
+    """
+
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"),
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def _format_value(value):
+    """
+    Return ``value`` in the Prometheus text format.
+    """
+
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Metrics of the requests to the Latch service made by the process:
+
+    * A latency histogram per method of the Latch SDK client, such as
+      ``account_status``, ``account_pair`` or ``account_unpair``.
+    * The errors per method and :class:`~latch_sdk.exceptions.LatchError`
+      code, or name of the exception for the rest of errors.
+    * The decoys run for the unpaired users, see :data:`LATCH_DECOY`.
+    * The hits and misses of the cached statuses, see
+      :data:`LATCH_STATUS_CACHE`.
+
+    The metrics can be read in-process with :meth:`snapshot` and exported
+    in the Prometheus text format with :meth:`export`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard every metric recorded.
+        """
+
+        with self._lock:
+            self._latencies = collections.defaultdict(Histogram)
+            self._errors = collections.Counter()
+            self._decoys = 0
+            self._cache = collections.Counter()
+
+    def observe_latency(self, method, seconds):
+        """
+        Record that a call to ``method`` of the Latch SDK client took
+        ``seconds``.
+        """
+
+        with self._lock:
+            self._latencies[method].observe(seconds)
+
+    def count_error(self, method, exc):
+        """
+        Record that a call to ``method`` of the Latch SDK client failed with
+        ``exc``.
+        """
+
+        code = _get_error_code(exc)
+        with self._lock:
+            self._errors[method, code] += 1
+
+    def count_decoy(self):
+        """
+        Record that a decoy was run for an unpaired user.
+        """
+
+        with self._lock:
+            self._decoys += 1
+
+    def count_cache(self, cache, hit):
+        """
+        Record a lookup in ``cache``, which was a hit if ``hit`` is ``True``.
+        """
+
+        with self._lock:
+            self._cache[cache, hit] += 1
+
+    def snapshot(self):
+        """
+        Return a dictionary with the current metrics::
+
+            {
+                "latency": {
+                    "account_status": {
+                        "count": 2,
+                        "sum": 0.31,
+                        "buckets": [(0.005, 0), ..., (float("inf"), 2)],
+                    },
+                },
+                "errors": {("account_status", "500"): 1},
+                "decoys": 3,
+                "cache": {
+                    "account_status": {"hits": 8, "misses": 2, "hit_ratio": 0.8},
+                },
+            }
+        """
+
+        with self._lock:
+            caches = {cache for cache, _ in self._cache}
+            return {
+                "latency": {
+                    method: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": histogram.cumulative(),
+                    }
+                    for method, histogram in self._latencies.items()
+                },
+                "errors": dict(self._errors),
+                "decoys": self._decoys,
+                "cache": {
+                    cache: {
+                        "hits": self._cache[cache, True],
+                        "misses": self._cache[cache, False],
+                        "hit_ratio": self._cache[cache, True]
+                        / (self._cache[cache, True] + self._cache[cache, False]),
+                    }
+                    for cache in caches
+                },
+            }
+
+    def export(self):
+        """
+        Return the current metrics in the Prometheus text format.
+        """
+
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP django_latch_request_duration_seconds Latency of the "
+            "requests to the Latch service.",
+            "# TYPE django_latch_request_duration_seconds histogram",
+        ]
+        for method, histogram in sorted(snapshot["latency"].items()):
+            for upper_bound, count in histogram["buckets"]:
+                labels = _format_labels(
+                    method=method, le=_format_value(float(upper_bound))
+                )
+                lines.append(
+                    f"django_latch_request_duration_seconds_bucket{labels} {count}"
+                )
+            labels = _format_labels(method=method)
+            lines.append(
+                f"django_latch_request_duration_seconds_sum{labels} "
+                f"{_format_value(histogram['sum'])}"
+            )
+            lines.append(
+                f"django_latch_request_duration_seconds_count{labels} {histogram['count']}"
+            )
+
+        lines += [
+            "# HELP django_latch_errors_total Failed requests to the Latch service.",
+            "# TYPE django_latch_errors_total counter",
+        ]
+        for (method, code), count in sorted(snapshot["errors"].items()):
+            labels = _format_labels(method=method, code=code)
+            lines.append(f"django_latch_errors_total{labels} {count}")
+
+        lines += [
+            "# HELP django_latch_decoys_total Decoys run for unpaired users.",
+            "# TYPE django_latch_decoys_total counter",
+            f"django_latch_decoys_total {snapshot['decoys']}",
+            "# HELP django_latch_cache_lookups_total Lookups of cached statuses.",
+            "# TYPE django_latch_cache_lookups_total counter",
+        ]
+        for cache, lookups in sorted(snapshot["cache"].items()):
+            for result, key in (("hit", "hits"), ("miss", "misses")):
+                labels = _format_labels(cache=cache, result=result)
+                lines.append(f"django_latch_cache_lookups_total{labels} {lookups[key]}")
+        return "\n".join(lines) + "\n"
+
+
+#: Metrics of the process.
+metrics = Metrics()
+
+
+class InstrumentedLatchSDK:
+    """
+    Wrapper of a Latch SDK client, synchronous or asynchronous, that records
+    the latency and the errors of the calls to its methods in
+    :data:`metrics`. The latency of the failed calls is recorded too.
+
+    The rest of the attributes of the client, such as ``core``, are
+    accessed as usual, and the calls made through :attr:`client` aren't
+    recorded.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    def client(self):
+        """
+        Wrapped client.
+        """
+
+        return self._client
+
+    def __getattr__(self, name):
+        """
+        Return the attribute ``name`` of the wrapped client, with its public
+        methods wrapped to record their calls.
+        """
+
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+
+            async def amethod(*args, **kwargs):
+                """
+                Await the coroutine method of the client, recording the call.
+                """
+
+                start = time.perf_counter()
+                return await self._await(name, start, attr(*args, **kwargs))
+
+            return amethod
+
+        def method(*args, **kwargs):
+            """
+            Call the method of the client, recording the call. If it returns
+            an awaitable, the call is recorded once it's awaited.
+            """
+
+            start = time.perf_counter()
+            result = None
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as exc:
+                metrics.count_error(name, exc)
+                raise
+            finally:
+                if not inspect.isawaitable(result):
+                    metrics.observe_latency(name, time.perf_counter() - start)
+            if inspect.isawaitable(result):
+                return self._await(name, start, result)
+            return result
+
+        return method
+
+    @staticmethod
+    async def _await(name, start, awaitable):
+        """
+        Await the ``awaitable`` returned by a call to the method ``name``
+        started at ``start``.
+        """
+
+        try:
+            return await awaitable
+        except Exception as exc:
+            metrics.count_error(name, exc)
+            raise
+        finally:
+            metrics.observe_latency(name, time.perf_counter() - start)
@@ -0,0 +1,358 @@
+"""
+Middlewares of django-latch.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import contextlib
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import logout
+from django.core.exceptions import PermissionDenied
+
+from .backends import acheck_latch, asend_latch_denied, check_latch, send_latch_denied
+from .context import deadline, request_scope
+from .models import aget_latch_config, get_latch_config
+from .operations import acan_pass_operations, can_pass_operations
+from .policies import CACHED, EXEMPT, OPERATION, get_url_policies
+from .transports import UNAVAILABLE_ERRORS
+
+logger = logging.getLogger("django_latch.middleware")
+
+# Session key with the time of the last check of the latch.
+CHECKED_AT_SESSION_KEY = "_latch_checked_at"
+
+DEFAULT_ENFORCEMENT_INTERVAL = 60
+
+
+class LatchRequestScopeMiddleware:
+    """
+    Memoize the Latch lookups for the duration of every request.
+
+    With this middleware, the latch configuration of a user and the latch
+    status of an account are fetched at most once per request, even if
+    :func:`~django_latch.backends.can_pass_latch` is called several times,
+    for instance by several authentication backends that inherit from
+    :class:`~django_latch.backends.LatchModelBackendMixin` or by a login
+    followed by a reauthentication.
+
+    It works both in synchronous and asynchronous mode and should be placed
+    before :class:`~django.contrib.auth.middleware.AuthenticationMiddleware`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Handle ``request`` inside a :func:`~django_latch.context.request_scope`.
+        """
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        """
+        Asynchronous version of ``__call__``.
+        """
+
+        with request_scope():
+            return await self.get_response(request)
+
+
+class LatchDeadlineMiddleware:
+    """
+    Give the Latch calls of every request only the time left of the
+    :data:`LATCH_REQUEST_DEADLINE` seconds since the request started.
+
+    The timeouts of every request to the Latch service are shortened to
+    the time left, and if no time is left the request is not sent, failing
+    as if it had timed out. Without the setting, this middleware does
+    nothing.
+
+    It works both in synchronous and asynchronous mode and should be placed
+    first in the :setting:`MIDDLEWARE` setting, so the time spent in the
+    rest of middlewares is counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def get_deadline(self):
+        """
+        Return the context manager that bounds the Latch calls of a
+        request.
+        """
+
+        seconds = getattr(settings, "LATCH_REQUEST_DEADLINE", None)
+        if seconds is None:
+            return contextlib.nullcontext()
+        return deadline(seconds)
+
+    def __call__(self, request):
+        """
+        Handle ``request`` within the deadline of :meth:`get_deadline`.
+        """
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.get_deadline():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        """
+        Asynchronous version of ``__call__``.
+        """
+
+        with self.get_deadline():
+            return await self.get_response(request)
+
+
+class LatchEnforcementMiddleware:
+    """
+    Log out the authenticated users whose latch has been closed since they
+    logged in.
+
+    The latch is only checked at login by
+    :class:`~django_latch.backends.LatchModelBackendMixin`, so closing it
+    doesn't end the sessions already open. This middleware checks it again
+    through :func:`~django_latch.backends.can_pass_latch` before calling a
+    view, according to the policy of its URL in :data:`LATCH_URL_POLICIES`:
+
+    * ``'cached'``, the default, checks it once every
+      :data:`LATCH_ENFORCEMENT_INTERVAL` seconds per session, storing the
+      time of the last check in the session. Together with
+      :data:`LATCH_STATUS_CACHE`, a user makes at most a request to the
+      Latch service per interval, whatever the number of requests and
+      sessions.
+    * ``'always'`` checks it on every request.
+    * ``'operation'`` checks the latches of the operations of the policy
+      on every request, see :func:`~django_latch.operations.can_pass_operations`,
+      raising :exc:`~django.core.exceptions.PermissionDenied` if any of
+      them is closed instead of logging the user out.
+    * ``'exempt'`` doesn't check it.
+
+    If the latch is closed, the :data:`~django_latch.signals.latch_denied`
+    signal is sent, the user is logged out and the request goes on as an
+    anonymous one.
+
+    Unpaired users have no latch, so they aren't checked and no decoy is
+    run for them: they already know whether their account is paired.
+
+    If the Latch service is unavailable and :data:`LATCH_FAILURE_POLICY`
+    doesn't give a status, the error is logged to the
+    ``django_latch.middleware`` logger and the user keeps the session,
+    which isn't checked again until the next interval. The views of the
+    ``'operation'`` policy are forbidden instead.
+
+    It works both in synchronous and asynchronous mode and should be placed
+    after :class:`~django.contrib.auth.middleware.AuthenticationMiddleware`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Django awaits process_view() when it's a coroutine function.
+        self.process_view = (
+            self.acheck_view if iscoroutinefunction(self) else self.check_view
+        )
+        # Compile the policies at startup, so a wrong setting fails early.
+        get_url_policies()
+
+    def is_due(self, checked_at, now):
+        """
+        Return ``True`` if the latch checked at the ``checked_at`` timestamp
+        must be checked again at ``now``.
+        """
+
+        interval = getattr(
+            settings, "LATCH_ENFORCEMENT_INTERVAL", DEFAULT_ENFORCEMENT_INTERVAL
+        )
+        return checked_at is None or not 0 <= now - checked_at < interval
+
+    def get_policy(self, request):
+        """
+        Return the :class:`~django_latch.policies.URLPolicy` of ``request``.
+        """
+
+        resolver_match = getattr(request, "resolver_match", None)
+        return get_url_policies().get_policy(
+            request.path_info,
+            None if resolver_match is None else resolver_match.view_name,
+        )
+
+    @staticmethod
+    def log_unavailable(user):
+        """
+        Log that the latch of ``user`` couldn't be checked because the
+        Latch service is unavailable.
+        """
+
+        logger.warning(
+            "The latch of the user %s couldn't be checked, the Latch service "
+            "is unavailable.",
+            user.pk,
+            exc_info=True,
+        )
+
+    def check_operations(self, user, operation_ids):
+        """
+        Raise :exc:`~django.core.exceptions.PermissionDenied` unless the
+        latches of the operations ``operation_ids`` of ``user`` are open.
+        """
+
+        try:
+            can_pass = can_pass_operations(user, operation_ids)
+        except UNAVAILABLE_ERRORS:
+            self.log_unavailable(user)
+            can_pass = False
+        if not can_pass:
+            raise PermissionDenied
+
+    async def acheck_operations(self, user, operation_ids):
+        """
+        Asynchronous version of :meth:`check_operations`.
+        """
+
+        try:
+            can_pass = await acan_pass_operations(user, operation_ids)
+        except UNAVAILABLE_ERRORS:
+            self.log_unavailable(user)
+            can_pass = False
+        if not can_pass:
+            raise PermissionDenied
+
+    def check_user(self, request, user, now):
+        """
+        Check the latch of ``user``, the user of ``request``, at the ``now``
+        timestamp, logging it out if it's closed.
+        """
+
+        if get_latch_config(user) is None:
+            request.session[CHECKED_AT_SESSION_KEY] = now
+            return
+        try:
+            check = check_latch(user)
+        except UNAVAILABLE_ERRORS:
+            self.log_unavailable(user)
+            request.session[CHECKED_AT_SESSION_KEY] = now
+            return
+        if check.can_pass:
+            request.session[CHECKED_AT_SESSION_KEY] = now
+        else:
+            send_latch_denied(user, check, request)
+            logout(request)
+
+    async def acheck_user(self, request, user, now):
+        """
+        Asynchronous version of :meth:`check_user`.
+        """
+
+        if await aget_latch_config(user) is None:
+            await sync_to_async(request.session.__setitem__)(
+                CHECKED_AT_SESSION_KEY, now
+            )
+            return
+        try:
+            check = await acheck_latch(user)
+        except UNAVAILABLE_ERRORS:
+            self.log_unavailable(user)
+            await sync_to_async(request.session.__setitem__)(
+                CHECKED_AT_SESSION_KEY, now
+            )
+            return
+        if check.can_pass:
+            await sync_to_async(request.session.__setitem__)(
+                CHECKED_AT_SESSION_KEY, now
+            )
+        else:
+            await asend_latch_denied(user, check, request)
+            await sync_to_async(logout)(request)
+            anonymous_user = request.user
+
+            async def auser():
+                """
+                Return the anonymous user, as the user resolved above is
+                cached by ``request.auser()``.
+                """
+
+                return anonymous_user
+
+            request.auser = auser
+
+    def check_view(self, request, view_func, view_args, view_kwargs):  # pylint: disable=unused-argument
+        """
+        Check the latch of the user of ``request`` according to the policy
+        of the view, logging the user out if it's closed.
+
+        It's the ``process_view()`` of the middleware in synchronous mode.
+        """
+
+        policy = self.get_policy(request)
+        if policy.policy == EXEMPT or not request.user.is_authenticated:
+            return None
+        now = time.time()
+        if policy.policy == OPERATION:
+            self.check_operations(request.user, policy.operations)
+        elif policy.policy != CACHED or self.is_due(
+            request.session.get(CHECKED_AT_SESSION_KEY), now
+        ):
+            self.check_user(request, request.user, now)
+        return None
+
+    async def acheck_view(self, request, view_func, view_args, view_kwargs):  # pylint: disable=unused-argument
+        """
+        Asynchronous version of :meth:`check_view`.
+
+        It's the ``process_view()`` of the middleware in asynchronous mode.
+        """
+
+        policy = self.get_policy(request)
+        if policy.policy == EXEMPT:
+            return None
+        user = await request.auser()
+        if not user.is_authenticated:
+            return None
+        now = time.time()
+        if policy.policy == OPERATION:
+            await self.acheck_operations(user, policy.operations)
+        elif policy.policy != CACHED or self.is_due(
+            await sync_to_async(request.session.get)(CHECKED_AT_SESSION_KEY), now
+        ):
+            await self.acheck_user(request, user, now)
+        return None
+
+    def __call__(self, request):
+        """
+        Handle ``request``, whose latch is checked by ``process_view()``.
+        """
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        """
+        Asynchronous version of ``__call__``.
+        """
+
+        return await self.get_response(request)
@@ -8,7 +8,22 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.debug import sensitive_post_parameters
 from django.contrib.auth.mixins import AccessMixin
 
-from .models import is_paired
+from .operations import acan_pass_operations, can_pass_operations
+from .sessions import aget_session_latch_config, get_session_latch_config
+
+
+async def _aget_request_user(request):
+    """
+    Return the user of ``request`` without blocking the event loop.
+
+    The resolved user replaces ``request.user``, so the rest of the view,
+    including :meth:`~django.contrib.auth.mixins.AccessMixin.handle_no_permission`,
+    can read it without querying the database synchronously.
+    """
+
+    user = await request.auser()
+    request.user = user
+    return user
 
 
 class UnpairedUserRequiredMixin(AccessMixin):
@@ -29,6 +44,9 @@ class UnpairedUserRequiredMixin(AccessMixin):
     This mixin implies that the user must be logged in, so using
     :class:`~django.contrib.auth.mixins.LoginRequiredMixin` is not necessary when a
     view inherit from :class:`~django_latch.mixins.UnpairedUserRequiredMixin`.
+
+    If every HTTP method handler of the view is asynchronous, the pairing is
+    checked without blocking the event loop.
     """
 
     @method_decorator(sensitive_post_parameters())
@@ -38,10 +56,29 @@ class UnpairedUserRequiredMixin(AccessMixin):
         forbidding the access if so.
         """
 
-        if not request.user.is_authenticated or is_paired(self.request.user):
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        if (
+            not request.user.is_authenticated
+            or get_session_latch_config(request, request.user) is not None
+        ):
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
 
+    async def _adispatch(self, request, *args, **kwargs):
+        """
+        Asynchronous version of :meth:`dispatch`, used when the view is
+        asynchronous.
+        """
+
+        user = await _aget_request_user(request)
+        if (
+            not user.is_authenticated
+            or await aget_session_latch_config(request, user) is not None
+        ):
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
 
 class PairedUserRequiredMixin(AccessMixin):
     """
@@ -62,6 +99,9 @@ class PairedUserRequiredMixin(AccessMixin):
     This mixin implies that the user must be logged in, so using
     :class:`~django.contrib.auth.mixins.LoginRequiredMixin` is not necessary
     when a view inherit from :class:`~django_latch.mixins.PairedUserRequiredMixin`.
+
+    If every HTTP method handler of the view is asynchronous, the pairing is
+    checked without blocking the event loop.
     """
 
     @method_decorator(sensitive_post_parameters())
@@ -71,6 +111,95 @@ class PairedUserRequiredMixin(AccessMixin):
         forbidding the access if so.
         """
 
-        if not request.user.is_authenticated or not is_paired(self.request.user):
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        if (
+            not request.user.is_authenticated
+            or get_session_latch_config(request, request.user) is None
+        ):
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        """
+        Asynchronous version of :meth:`dispatch`, used when the view is
+        asynchronous.
+        """
+
+        user = await _aget_request_user(request)
+        if (
+            not user.is_authenticated
+            or await aget_session_latch_config(request, user) is None
+        ):
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class LatchOperationRequiredMixin(AccessMixin):
+    """
+    Verify that the latches of the operations :attr:`latch_operations` of
+    the current user are open.
+
+    It has the same the behaviour as
+    :func:`~django_latch.decorators.latch_operation_required`, which is the
+    following:
+
+    * If the user isn't logged in, it redirects to :setting:`settings.LOGIN_URL <LOGIN_URL>`
+      passing the current absolute path in the query string.
+    * If the user is paired and the latch of any of the operations, or of an
+      operation or account containing it, is closed, then the mixin will
+      raise :exc:`~django.core.exceptions.PermissionDenied`, prompting
+      `the 403 (HTTP Forbidden) view
+      <https://docs.djangoproject.com/en/5.2/ref/views/#http-forbidden-view>`_
+      instead of redirecting to the login page.
+    * Unpaired users have no latches, so they are let through.
+
+    This mixin implies that the user must be logged in, so using
+    :class:`~django.contrib.auth.mixins.LoginRequiredMixin` is not necessary
+    when a view inherit from :class:`~django_latch.mixins.LatchOperationRequiredMixin`.
+
+    If every HTTP method handler of the view is asynchronous, the statuses
+    are checked without blocking the event loop.
+    """
+
+    latch_operations = ()
+    """
+    Ids of the operations whose latches must be open.
+    """
+
+    def get_latch_operations(self):
+        """
+        Return the ids of the operations whose latches must be open, by
+        default :attr:`latch_operations`.
+        """
+
+        return tuple(self.latch_operations)
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Check that the latches of the operations are open, forbidding the
+        access if not.
+        """
+
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        get_session_latch_config(request, request.user)
+        if not can_pass_operations(request.user, self.get_latch_operations()):
+            return self.handle_no_permission()
+        return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        """
+        Asynchronous version of :meth:`dispatch`, used when the view is
+        asynchronous.
+        """
+
+        user = await _aget_request_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        await aget_session_latch_config(request, user)
+        if not await acan_pass_operations(user, self.get_latch_operations()):
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
@@ -7,15 +7,132 @@ Models to associate a user to the Latch service.
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .context import amemoize, memoize, remember
+from .membership import amight_be_paired, might_be_paired
+
 UserModel = get_user_model()
 
 
+def _latch_config_key(user):
+    """
+    Return the key of the latch configuration of ``user`` in the
+    :func:`~django_latch.context.request_scope`.
+    """
+
+    return ("latch_config", user.pk)
+
+
+def _get_cached_latch_config(user):
+    """
+    Return a tuple with whether the latch configuration of ``user`` is
+    cached in the instance, and the configuration, which is ``None`` if
+    the user isn't paired.
+    """
+
+    related = UserModel.latch_config.related
+    if related.is_cached(user):
+        return True, related.get_cached_value(user)
+    return False, None
+
+
+def _load_latch_config(user):
+    """
+    Return the latch configuration of ``user`` from the database, or
+    ``None`` if it's not paired, skipping the query if the
+    :class:`~django_latch.membership.PairedUserFilter` knows it's not.
+    """
+
+    if not might_be_paired(user):
+        return None
+    return LatchUserConfig.objects.filter(user=user).first()
+
+
+async def _aload_latch_config(user):
+    """
+    Asynchronous version of :func:`_load_latch_config`.
+    """
+
+    if not await amight_be_paired(user):
+        return None
+    return await LatchUserConfig.objects.filter(user=user).afirst()
+
+
+def set_latch_config(user, config):
+    """
+    Record ``config`` as the latch configuration of ``user``, or that it
+    isn't paired if ``config`` is ``None``, so the next lookups don't query
+    the database.
+
+    It must be called after pairing or unpairing a user.
+    """
+
+    UserModel.latch_config.related.set_cached_value(user, config)
+    remember(_latch_config_key(user), config)
+
+
+def get_latch_config(user):
+    """
+    Return the :class:`LatchUserConfig` of ``user``, or ``None`` if it's not
+    paired.
+
+    The configuration is cached in the ``user`` instance, as when it's
+    loaded with ``select_related("latch_config")``. Inside a
+    :func:`~django_latch.context.request_scope`, it is also shared by every
+    instance of the same user, so it's loaded at most once per request.
+    If :data:`LATCH_PAIRED_USER_FILTER` is set, it isn't loaded for the
+    users known not to be paired.
+    """
+
+    cached, config = _get_cached_latch_config(user)
+    if not cached:
+        config = memoize(_latch_config_key(user), lambda: _load_latch_config(user))
+        UserModel.latch_config.related.set_cached_value(user, config)
+    return config
+
+
+async def aget_latch_config(user):
+    """
+    Asynchronous version of :func:`get_latch_config`.
+    """
+
+    cached, config = _get_cached_latch_config(user)
+    if not cached:
+        config = await amemoize(
+            _latch_config_key(user), lambda: _aload_latch_config(user)
+        )
+        UserModel.latch_config.related.set_cached_value(user, config)
+    return config
+
+
+async def aload_account_id(config):
+    """
+    Load the account id of ``config`` from the database if it was deferred,
+    as it is in the configurations taken from the session, see
+    :func:`~django_latch.sessions.get_session_latch_config`.
+
+    Synchronous code doesn't need it, as deferred fields are loaded when
+    they are read.
+    """
+
+    if "account_id" in config.get_deferred_fields():
+        await config.arefresh_from_db(fields=["account_id"])
+
+
 def is_paired(user):
     """
     Check if a user has configured the Latch service, returning
     ``True`` if so, ``False`` otherwise.
+
+    The configuration is looked up with :func:`get_latch_config`.
+    """
+    return get_latch_config(user) is not None
+
+
+async def ais_paired(user):
+    """
+    Asynchronous version of :func:`is_paired`.
     """
-    return LatchUserConfig.objects.filter(user=user).exists()
+    return await aget_latch_config(user) is not None
 
 
 class LatchUserConfig(models.Model):
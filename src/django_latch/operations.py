@@ -0,0 +1,311 @@
+"""
+Lookup of the latch status of the operations of the Latch accounts.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from .cache import get_status_cache
+from .context import recall, remember
+from .models import aget_latch_config, aload_account_id, get_latch_config
+from .status import (
+    apply_failure_policy,
+    arequest_status,
+    astatus_flights,
+    last_known_statuses,
+    request_status,
+    status_flights,
+)
+from .metrics import metrics
+from .transports import UNAVAILABLE_ERRORS
+
+
+def _make_key(account_id, operation_id):
+    """
+    Return the key of the status of ``operation_id`` of ``account_id`` in
+    the status cache.
+    """
+
+    return f"{account_id}:{operation_id}"
+
+
+def _collect_statuses(status, statuses, parent=True):
+    """
+    Add to ``statuses`` whether every operation in ``status``, and in the
+    operations nested in it, can be passed, which requires that the
+    latches of the operations containing it are open as well.
+    """
+
+    can_pass = parent and status.status
+    statuses[status.operation_id] = can_pass
+    for operation in status.operations or ():
+        _collect_statuses(operation, statuses, can_pass)
+
+
+def fetch_operation_statuses(account_id, operation_ids):
+    """
+    Ask the Latch service for the status of the operations
+    ``operation_ids`` of ``account_id``, returning a dictionary with whether
+    every operation known can be passed.
+
+    The status of the account is asked once, and the operations nested in
+    it are taken from its answer. Only the operations not included are asked
+    one by one, and they can be passed only if the latch of the account is
+    open. Concurrent calls for the same operations in the process share the
+    same requests.
+    """
+
+    def fetch():
+        """
+        Return the statuses of the operations, asking the Latch service.
+        """
+
+        status = request_status(lambda latch_api: latch_api.account_status(account_id))
+        statuses = {}
+        _collect_statuses(status, statuses)
+        for operation_id in operation_ids:
+            if operation_id not in statuses:
+                _collect_statuses(
+                    request_status(
+                        lambda latch_api, operation_id=operation_id: (
+                            latch_api.operation_status(account_id, operation_id)
+                        )
+                    ),
+                    statuses,
+                    status.status,
+                )
+        return statuses
+
+    return status_flights.do(
+        ("operations", account_id, tuple(sorted(operation_ids))), fetch
+    )
+
+
+async def afetch_operation_statuses(account_id, operation_ids):
+    """
+    Asynchronous version of :func:`fetch_operation_statuses`.
+    """
+
+    async def fetch():
+        """
+        Asynchronous version of the ``fetch()`` of
+        :func:`fetch_operation_statuses`.
+        """
+
+        status = await arequest_status(
+            lambda latch_api: latch_api.account_status(account_id)
+        )
+        statuses = {}
+        _collect_statuses(status, statuses)
+        for operation_id in operation_ids:
+            if operation_id not in statuses:
+                _collect_statuses(
+                    await arequest_status(
+                        lambda latch_api, operation_id=operation_id: (
+                            latch_api.operation_status(account_id, operation_id)
+                        )
+                    ),
+                    statuses,
+                    status.status,
+                )
+        return statuses
+
+    return await astatus_flights.do(
+        ("operations", account_id, tuple(sorted(operation_ids))), fetch
+    )
+
+
+def _get_remembered(account_id, operation_ids):
+    """
+    Return a dictionary with the statuses of ``operation_ids`` of
+    ``account_id`` already looked up in the current
+    :func:`~django_latch.context.request_scope`.
+    """
+
+    statuses = {}
+    for operation_id in operation_ids:
+        can_pass = recall(("operation", account_id, operation_id))
+        if can_pass is not None:
+            statuses[operation_id] = can_pass
+    return statuses
+
+
+def _get_fresh(status_cache, entries, missing):
+    """
+    Return a dictionary with the statuses of the operations ``missing``
+    whose cached ``entries``, keyed by the operation, are fresh.
+    """
+
+    return {
+        operation_id: entries[operation_id].can_pass
+        for operation_id in missing
+        if operation_id in entries and status_cache.is_fresh(entries[operation_id])
+    }
+
+
+def _handle_failure(exc, account_id, missing, status_cache, entries):
+    """
+    Return a dictionary with the statuses to use for the operations
+    ``missing`` when the Latch service has failed with ``exc``: the cached
+    ones during :data:`LATCH_STATUS_CACHE_STALE_IF_ERROR`, or those given by
+    :data:`LATCH_FAILURE_POLICY`.
+    """
+
+    statuses = {}
+    for operation_id in missing:
+        entry = entries.get(operation_id)
+        if entry is not None and status_cache.can_serve_on_error(entry):
+            statuses[operation_id] = entry.can_pass
+        else:
+            statuses[operation_id] = apply_failure_policy(
+                exc, _make_key(account_id, operation_id)
+            )
+    return statuses
+
+
+def _store(account_id, fetched):
+    """
+    Remember the ``fetched`` statuses of the operations of ``account_id`` in
+    the current :func:`~django_latch.context.request_scope` and as the last
+    known ones, returning the cache keys and statuses to store in the status
+    cache.
+    """
+
+    cached = {}
+    for operation_id, can_pass in fetched.items():
+        key = _make_key(account_id, operation_id)
+        remember(("operation", account_id, operation_id), can_pass)
+        last_known_statuses.set(key, can_pass)
+        cached[key] = can_pass
+    return cached
+
+
+def get_operation_statuses(account_id, operation_ids):
+    """
+    Return a dictionary with whether every operation of ``operation_ids``
+    of ``account_id`` can be passed, i.e. its latch and the latches of the
+    operations and account containing it are open.
+
+    The statuses are cached per account and operation, in the current
+    :func:`~django_latch.context.request_scope` and, if the
+    :data:`LATCH_STATUS_CACHE` setting is set, in the status cache, which is
+    read in a single lookup. The operations missing from both are fetched
+    together by :func:`fetch_operation_statuses`, and every operation in its
+    answer is cached, so the rest of the checks of the request don't ask the
+    Latch service again. Stale statuses are only used if the Latch service
+    fails.
+    """
+
+    statuses = _get_remembered(account_id, operation_ids)
+    missing = [op for op in operation_ids if op not in statuses]
+    if not missing:
+        return statuses
+
+    status_cache = get_status_cache()
+    entries = {}
+    if status_cache is not None:
+        cached = status_cache.get_many(_make_key(account_id, op) for op in missing)
+        entries = {
+            op: cached[_make_key(account_id, op)]
+            for op in missing
+            if _make_key(account_id, op) in cached
+        }
+        fresh = _get_fresh(status_cache, entries, missing)
+        for operation_id in missing:
+            metrics.count_cache("operation_status", operation_id in fresh)
+        for operation_id, can_pass in fresh.items():
+            remember(("operation", account_id, operation_id), can_pass)
+        statuses.update(fresh)
+        missing = [op for op in missing if op not in fresh]
+        if not missing:
+            return statuses
+
+    try:
+        fetched = fetch_operation_statuses(account_id, missing)
+    except UNAVAILABLE_ERRORS as exc:
+        statuses.update(
+            _handle_failure(exc, account_id, missing, status_cache, entries)
+        )
+        return statuses
+
+    for key, can_pass in _store(account_id, fetched).items():
+        if status_cache is not None:
+            status_cache.set(key, can_pass)
+    statuses.update((op, fetched.get(op, False)) for op in missing)
+    return statuses
+
+
+async def aget_operation_statuses(account_id, operation_ids):
+    """
+    Asynchronous version of :func:`get_operation_statuses`.
+    """
+
+    statuses = _get_remembered(account_id, operation_ids)
+    missing = [op for op in operation_ids if op not in statuses]
+    if not missing:
+        return statuses
+
+    status_cache = get_status_cache()
+    entries = {}
+    if status_cache is not None:
+        cached = await status_cache.aget_many(
+            _make_key(account_id, op) for op in missing
+        )
+        entries = {
+            op: cached[_make_key(account_id, op)]
+            for op in missing
+            if _make_key(account_id, op) in cached
+        }
+        fresh = _get_fresh(status_cache, entries, missing)
+        for operation_id in missing:
+            metrics.count_cache("operation_status", operation_id in fresh)
+        for operation_id, can_pass in fresh.items():
+            remember(("operation", account_id, operation_id), can_pass)
+        statuses.update(fresh)
+        missing = [op for op in missing if op not in fresh]
+        if not missing:
+            return statuses
+
+    try:
+        fetched = await afetch_operation_statuses(account_id, missing)
+    except UNAVAILABLE_ERRORS as exc:
+        statuses.update(
+            _handle_failure(exc, account_id, missing, status_cache, entries)
+        )
+        return statuses
+
+    for key, can_pass in _store(account_id, fetched).items():
+        if status_cache is not None:
+            await status_cache.aset(key, can_pass)
+    statuses.update((op, fetched.get(op, False)) for op in missing)
+    return statuses
+
+
+def can_pass_operations(user, operation_ids):
+    """
+    Check the latches of the operations ``operation_ids`` of ``user``.
+    Return ``True`` if all of them are open, ``False`` otherwise.
+
+    Users who haven't configured the Latch service have no latches, so
+    ``True`` is returned for them without asking the Latch service. Unlike
+    :func:`~django_latch.backends.can_pass_latch`, no decoy is run: the
+    operations are only checked for authenticated users, who already know
+    whether their account is paired.
+    """
+
+    config = get_latch_config(user)
+    if config is None:
+        return True
+    return all(get_operation_statuses(config.account_id, operation_ids).values())
+
+
+async def acan_pass_operations(user, operation_ids):
+    """
+    Asynchronous version of :func:`can_pass_operations`.
+    """
+
+    config = await aget_latch_config(user)
+    if config is None:
+        return True
+    await aload_account_id(config)
+    statuses = await aget_operation_statuses(config.account_id, operation_ids)
+    return all(statuses.values())
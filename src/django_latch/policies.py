@@ -0,0 +1,156 @@
+"""
+Policies of the latch enforcement per URL.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+EXEMPT = "exempt"
+CACHED = "cached"
+ALWAYS = "always"
+OPERATION = "operation"
+
+POLICIES = (EXEMPT, CACHED, ALWAYS, OPERATION)
+
+URLPolicy = namedtuple("URLPolicy", ["policy", "operations"], defaults=[()])
+URLPolicy.__doc__ = """
+How the latch is enforced on a URL, where ``policy`` is one of
+:data:`POLICIES` and ``operations`` are the ids of the operations checked by
+the ``'operation'`` policy.
+"""
+
+DEFAULT_POLICY = URLPolicy(CACHED)
+
+
+def validate_url_policies(policies):
+    """
+    Return a list of ``(message, error_code)`` with the errors found in the
+    ``policies`` of the :data:`LATCH_URL_POLICIES` setting.
+    """
+
+    if not isinstance(policies, (list, tuple)):
+        return [("'LATCH_URL_POLICIES' must be a list or a tuple.", 108)]
+
+    errors = []
+    for index, entry in enumerate(policies):
+        name = f"LATCH_URL_POLICIES[{index}]"
+        if not isinstance(entry, dict) or ("prefix" in entry) == ("url_name" in entry):
+            errors.append(
+                (f"'{name}' must be a dictionary with a 'prefix' or a 'url_name'.", 108)
+            )
+            continue
+        if "prefix" in entry and not str(entry["prefix"]).startswith("/"):
+            errors.append((f"The 'prefix' of '{name}' must start with '/'.", 108))
+        policy = entry.get("policy")
+        if policy not in POLICIES:
+            errors.append(
+                (
+                    f"The 'policy' of '{name}' cannot be {policy!r}, the only valid "
+                    "values are 'exempt', 'cached', 'always' or 'operation'.",
+                    109,
+                )
+            )
+        elif policy == OPERATION and not entry.get("operations"):
+            errors.append(
+                (f"'{name}' must have the 'operations' checked by its policy.", 110)
+            )
+    return errors
+
+
+class URLPolicyTable:
+    """
+    Table with the :class:`URLPolicy` of every URL, compiled from the
+    :data:`LATCH_URL_POLICIES` setting.
+
+    The policies of the URL names are kept in a dictionary and those of the
+    path prefixes in a trie of the characters of the prefixes, so finding
+    the policy of a request takes a time proportional to the length of its
+    path, whatever the number of policies.
+    """
+
+    def __init__(self, policies=()):
+        errors = validate_url_policies(policies)
+        if errors:
+            raise ImproperlyConfigured(errors[0][0])
+
+        self.by_name = {}
+        self.trie = {}
+        for entry in policies:
+            policy = URLPolicy(entry["policy"], tuple(entry.get("operations", ())))
+            if "url_name" in entry:
+                self.by_name.setdefault(entry["url_name"], policy)
+            else:
+                node = self.trie
+                for char in entry["prefix"]:
+                    node = node.setdefault(char, {})
+                # The policy of a node is stored under None, which isn't
+                # a character.
+                node.setdefault(None, policy)
+
+    def match_prefix(self, path):
+        """
+        Return the policy of the longest prefix of ``path``, or ``None`` if
+        none of them has a policy.
+        """
+
+        node = self.trie
+        policy = node.get(None)
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            policy = node.get(None, policy)
+        return policy
+
+    def get_policy(self, path, view_name=None):
+        """
+        Return the :class:`URLPolicy` of the request of ``path``, resolved
+        to the URL pattern named ``view_name``.
+
+        The policy of the URL name is used first, then the one of the
+        longest prefix of ``path``, and finally the ``'cached'`` policy.
+        """
+
+        policy = self.by_name.get(view_name) if view_name is not None else None
+        if policy is None:
+            policy = self.match_prefix(path)
+        return DEFAULT_POLICY if policy is None else policy
+
+
+_table = None  # pylint: disable=invalid-name
+_table_lock = threading.Lock()
+
+
+def get_url_policies():
+    """
+    Return the :class:`URLPolicyTable` of the process, compiled from the
+    :data:`LATCH_URL_POLICIES` setting the first time it's needed.
+    """
+
+    global _table  # pylint: disable=global-statement
+
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = URLPolicyTable(getattr(settings, "LATCH_URL_POLICIES", ()))
+    return _table
+
+
+@receiver(setting_changed)
+def reset_url_policies(*, setting, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard the compiled table when its setting changes.
+    """
+
+    global _table  # pylint: disable=global-statement
+
+    if setting == "LATCH_URL_POLICIES":
+        with _table_lock:
+            _table = None
@@ -0,0 +1,136 @@
+"""
+Retries of the idempotent reads from the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import secrets
+import time
+
+from django.conf import settings
+
+from .budget import TokenBucket
+from .context import get_remaining_time
+from .transports import CONNECTION_ERRORS
+
+#: Default seconds of the first wait before retrying.
+DEFAULT_RETRY_BASE_DELAY = 0.05
+
+#: Default maximum seconds to wait before retrying.
+DEFAULT_RETRY_MAX_DELAY = 1
+
+#: Default ratio of calls that may be retried.
+DEFAULT_RETRY_BUDGET = 0.1
+
+_random = secrets.SystemRandom()
+
+
+class Retrier:
+    """
+    Retry the reads that fail to reach the Latch service or to get an
+    answer, up to :data:`LATCH_RETRIES` times.
+
+    The waits between attempts follow an exponential backoff with
+    decorrelated jitter: every wait is drawn between
+    :data:`LATCH_RETRY_BASE_DELAY` and three times the previous one, up to
+    :data:`LATCH_RETRY_MAX_DELAY`. A retry is not made if the wait doesn't
+    fit in the time left until the :func:`~django_latch.context.deadline`,
+    or if the :class:`~django_latch.budget.TokenBucket` of the retries,
+    shared by the whole process, is exhausted, so retries cannot multiply
+    the load on the Latch service during an outage.
+
+    Only idempotent reads, such as the status checks, may be retried.
+    """
+
+    def __init__(self):
+        self.budget = TokenBucket()
+
+    def _start_call(self):
+        """
+        Count a new call in the budget and return the maximum number of
+        retries and the base and maximum waits.
+        """
+
+        self.budget.deposit(
+            getattr(settings, "LATCH_RETRY_BUDGET", DEFAULT_RETRY_BUDGET)
+        )
+        return (
+            getattr(settings, "LATCH_RETRIES", 0),
+            getattr(settings, "LATCH_RETRY_BASE_DELAY", DEFAULT_RETRY_BASE_DELAY),
+            getattr(settings, "LATCH_RETRY_MAX_DELAY", DEFAULT_RETRY_MAX_DELAY),
+        )
+
+    def _get_delay(self, attempt, limits, previous):
+        """
+        Return the seconds to wait before retrying the failed ``attempt``,
+        or ``None`` if it must not be retried.
+        """
+
+        retries, base, max_delay = limits
+        if attempt >= retries:
+            return None
+        delay = min(max_delay, _random.uniform(base, previous * 3))
+        remaining = get_remaining_time()
+        if remaining is not None and remaining <= delay:
+            return None
+        if not self.budget.withdraw():
+            return None
+        return delay
+
+    def call(self, func):
+        """
+        Return the result of ``func()``, which reads from the Latch service,
+        retrying it if it fails.
+        """
+
+        limits = self._start_call()
+        delay = limits[1]
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except CONNECTION_ERRORS:
+                delay = self._get_delay(attempt, limits, delay)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, afunc):
+        """
+        Asynchronous version of :meth:`call`, where ``afunc`` is a coroutine
+        function.
+        """
+
+        limits = self._start_call()
+        delay = limits[1]
+        attempt = 0
+        while True:
+            try:
+                return await afunc()
+            except CONNECTION_ERRORS:
+                delay = self._get_delay(attempt, limits, delay)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+retrier = Retrier()
+
+
+def retry(func):
+    """
+    Return the result of ``func()`` through the :class:`Retrier`.
+    """
+
+    return retrier.call(func)
+
+
+async def aretry(afunc):
+    """
+    Asynchronous version of :func:`retry`.
+    """
+
+    return await retrier.acall(afunc)
@@ -0,0 +1,234 @@
+"""
+Pairing state of the users stored in their sessions, so gated pages don't
+query the latch configuration on every request.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import get_random_string
+
+from .models import (
+    LatchUserConfig,
+    _get_cached_latch_config,
+    aget_latch_config,
+    get_latch_config,
+    set_latch_config,
+)
+
+#: Key of the pairing state in the session.
+SESSION_KEY = "_latch_pairing"
+
+#: Prefix of the cache keys of the pairing versions of the users.
+VERSION_KEY_PREFIX = "django_latch:pairing_version:"
+
+
+def _get_cache():
+    """
+    Return the cache of the pairing versions, or ``None`` if the pairing
+    isn't stored in the sessions.
+    """
+
+    alias = getattr(settings, "LATCH_SESSION_PAIRING", None)
+    return None if alias is None else caches[alias]
+
+
+def _get_session(request, user):
+    """
+    Return the session of ``request``, or ``None`` if the pairing isn't
+    stored in the sessions, the request doesn't have a session or the
+    latch configuration is already cached in ``user``.
+    """
+
+    if _get_cache() is None or _get_cached_latch_config(user)[0]:
+        return None
+    return getattr(request, "session", None)
+
+
+def _make_version_key(user_pk):
+    """
+    Return the cache key of the pairing version of the user ``user_pk``.
+    """
+
+    return f"{VERSION_KEY_PREFIX}{user_pk}"
+
+
+def _get_version(cache, user_pk):
+    """
+    Return the pairing version of the user ``user_pk``, setting a new one if
+    it doesn't have any.
+
+    A version missing from the cache, for instance because it was evicted,
+    is replaced by a new one, so the pairing stored in the sessions is
+    looked up again instead of being trusted.
+    """
+
+    key = _make_version_key(user_pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, get_random_string(12), None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(cache, user_pk):
+    """
+    Asynchronous version of :func:`_get_version`.
+    """
+
+    key = _make_version_key(user_pk)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, get_random_string(12), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _build_entry(user, version, config):
+    """
+    Return the session entry recording ``config`` as the latch configuration
+    of ``user`` at its pairing ``version``.
+    """
+
+    if config is None:
+        stored = None
+    elif getattr(settings, "LATCH_SESSION_ACCOUNT_ID", False):
+        stored = [config.pk, config.account_id]
+    else:
+        stored = [config.pk, None]
+    return {"user": str(user.pk), "version": version, "config": stored}
+
+
+def _load_entry(user, entry, version):
+    """
+    Return a tuple with whether the session ``entry`` is valid for ``user``
+    at its pairing ``version``, and the latch configuration it records.
+
+    Without the account id, the configuration is built with it deferred, so
+    it's loaded from the database only if it's read.
+    """
+
+    if (
+        not isinstance(entry, dict)
+        or entry.get("user") != str(user.pk)
+        or entry.get("version") != version
+    ):
+        return False, None
+    if entry["config"] is None:
+        return True, None
+
+    config_id, account_id = entry["config"]
+    values = {"id": config_id, "user_id": user.pk}
+    if account_id is not None:
+        values["account_id"] = account_id
+    field_names = [
+        field.attname
+        for field in LatchUserConfig._meta.concrete_fields  # pylint: disable=protected-access
+        if field.attname in values
+    ]
+    config = LatchUserConfig.from_db(
+        router.db_for_read(LatchUserConfig, instance=user),
+        field_names,
+        [values[name] for name in field_names],
+    )
+    return True, config
+
+
+def get_session_latch_config(request, user):
+    """
+    Return the :class:`~django_latch.models.LatchUserConfig` of ``user``, the
+    user of ``request``, or ``None`` if it's not paired.
+
+    If :data:`LATCH_SESSION_PAIRING` is set, the configuration is kept in
+    the session, and only looked up with
+    :func:`~django_latch.models.get_latch_config` if it changed since. The
+    account id is only kept if :data:`LATCH_SESSION_ACCOUNT_ID` is enabled.
+    """
+
+    session = _get_session(request, user)
+    if session is None:
+        return get_latch_config(user)
+
+    version = _get_version(_get_cache(), user.pk)
+    valid, config = _load_entry(user, session.get(SESSION_KEY), version)
+    if valid:
+        set_latch_config(user, config)
+        return config
+    config = get_latch_config(user)
+    session[SESSION_KEY] = _build_entry(user, version, config)
+    return config
+
+
+async def aget_session_latch_config(request, user):
+    """
+    Asynchronous version of :func:`get_session_latch_config`.
+    """
+
+    session = _get_session(request, user)
+    if session is None:
+        return await aget_latch_config(user)
+
+    version = await _aget_version(_get_cache(), user.pk)
+    entry = await sync_to_async(session.get)(SESSION_KEY)
+    valid, config = _load_entry(user, entry, version)
+    if valid:
+        set_latch_config(user, config)
+        return config
+    config = await aget_latch_config(user)
+    await sync_to_async(session.__setitem__)(
+        SESSION_KEY, _build_entry(user, version, config)
+    )
+    return config
+
+
+def update_session_pairing(request, user, config):
+    """
+    Record ``config`` as the latch configuration of ``user``, the user of
+    ``request``, in the session, after pairing or unpairing it.
+    """
+
+    cache = _get_cache()
+    session = getattr(request, "session", None)
+    if cache is not None and session is not None:
+        session[SESSION_KEY] = _build_entry(user, _get_version(cache, user.pk), config)
+
+
+async def aupdate_session_pairing(request, user, config):
+    """
+    Asynchronous version of :func:`update_session_pairing`.
+    """
+
+    cache = _get_cache()
+    session = getattr(request, "session", None)
+    if cache is not None and session is not None:
+        await sync_to_async(session.__setitem__)(
+            SESSION_KEY, _build_entry(user, await _aget_version(cache, user.pk), config)
+        )
+
+
+@receiver(post_save, sender=LatchUserConfig)
+@receiver(post_delete, sender=LatchUserConfig)
+def invalidate_session_pairing(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Change the pairing version of the user of a latch configuration that
+    was saved or deleted, so the pairing stored in its sessions is looked
+    up again.
+
+    The version is changed once the transaction is committed, so a request
+    served in between can't store the previous pairing under the new
+    version.
+    """
+
+    cache = _get_cache()
+    if cache is not None:
+        transaction.on_commit(
+            lambda: cache.set(
+                _make_version_key(instance.user_id), get_random_string(12), None
+            ),
+            using=kwargs.get("using"),
+        )
@@ -0,0 +1,228 @@
+"""
+Signals sent by django-latch.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+import django
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.dispatch import Signal
+
+logger = logging.getLogger("django_latch.signals")
+
+# Signal.send() and Signal.asend() support coroutine receivers since Django
+# 5.0.
+ASYNC_RECEIVERS = django.VERSION >= (5, 0)
+
+#: Threads running the receivers delivered in the background.
+BACKGROUND_WORKERS = 2
+
+#: Receivers that may be queued or running in the threads at the same time.
+#: Further receivers are dropped.
+MAX_PENDING_RECEIVERS = 100
+
+#: Sent by :func:`~django_latch.backends.can_pass_latch`,
+#: :func:`~django_latch.backends.acan_pass_latch` and every check made
+#: through them, with the arguments ``user``, ``can_pass``, whether the
+#: latch is open, ``duration``, the seconds taken by the check, and
+#: ``from_cache``, whether the state was taken from the request scope or
+#: the status cache.
+latch_checked = Signal()
+
+#: Sent when the authentication backends or
+#: :class:`~django_latch.middleware.LatchEnforcementMiddleware` deny the
+#: access of a user because its latch is closed, with the arguments
+#: ``user``, ``request``, which is ``None`` if the backend didn't get one,
+#: and the ``duration`` and ``from_cache`` of the check.
+latch_denied = Signal()
+
+#: Sent by :class:`~django_latch.forms.PairLatchForm` once the account is
+#: paired, with the arguments ``user``, ``config``, the new
+#: :class:`~django_latch.models.LatchUserConfig`, ``duration``, the
+#: seconds taken by the Latch service to pair it, and ``from_cache``,
+#: always ``False``.
+latch_paired = Signal()
+
+#: Sent by :class:`~django_latch.views.UnpairLatchView` and
+#: :class:`~django_latch.views.AsyncUnpairLatchView` once the account is
+#: unpaired, with the arguments ``user``, ``duration``, the seconds taken
+#: by the Latch service to unpair it, and ``from_cache``, always ``False``.
+latch_unpaired = Signal()
+
+_executor = None  # pylint: disable=invalid-name
+_executor_lock = threading.Lock()
+_pending = 0  # pylint: disable=invalid-name
+_tasks = set()
+
+# Set while a signal is sent by synchronous code, whose coroutine receivers
+# run in an event loop that is closed as soon as they return.
+_sending_sync = contextvars.ContextVar("django_latch_sending_sync", default=False)
+
+
+def has_receivers(signal):
+    """
+    Return ``True`` if some receiver is connected to ``signal``.
+
+    It only looks at the list of receivers, so it's cheap enough to be
+    called before building the arguments of every signal.
+    """
+
+    return bool(signal.receivers)
+
+
+def send(signal, user, **kwargs):
+    """
+    Send ``signal`` with the class of ``user`` as sender.
+    """
+
+    token = _sending_sync.set(True)
+    try:
+        signal.send(sender=user.__class__, user=user, **kwargs)
+    finally:
+        _sending_sync.reset(token)
+
+
+async def asend(signal, user, **kwargs):
+    """
+    Asynchronous version of :func:`send`.
+    """
+
+    if hasattr(signal, "asend"):
+        await signal.asend(sender=user.__class__, user=user, **kwargs)
+    else:  # pragma: no cover
+        # Signal.asend() is available since Django 5.0.
+        await sync_to_async(send)(signal, user, **kwargs)
+
+
+def _get_executor():
+    """
+    Return the pool of threads running the receivers in the background,
+    creating it on first use.
+    """
+
+    global _executor  # pylint: disable=global-statement
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=BACKGROUND_WORKERS,
+                thread_name_prefix="django_latch_signals",
+            )
+        return _executor
+
+
+def _log_exception(future):
+    """
+    Log the exception raised by the receiver of ``future``, if any.
+    """
+
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(
+            "Error calling a background receiver of django-latch",
+            exc_info=future.exception(),
+        )
+
+
+def _release(future):
+    """
+    Discount the receiver of ``future``, which has finished, logging its
+    exception.
+    """
+
+    global _pending  # pylint: disable=global-statement
+
+    with _executor_lock:
+        _pending -= 1
+    _log_exception(future)
+
+
+def _submit(func):
+    """
+    Call ``func()`` in the pool of threads, or drop it, logging a warning,
+    if :data:`MAX_PENDING_RECEIVERS` receivers are already pending.
+    """
+
+    global _pending  # pylint: disable=global-statement
+
+    executor = _get_executor()
+    with _executor_lock:
+        full = _pending >= MAX_PENDING_RECEIVERS
+        if not full:
+            _pending += 1
+    if full:
+        logger.warning(
+            "Dropped a background receiver of django-latch, too many are pending"
+        )
+        return
+    executor.submit(func).add_done_callback(_release)
+
+
+def in_background(receiver):
+    """
+    Decorator for the receivers of the signals of ``django-latch`` that
+    must not delay the sender, such as audit logs::
+
+        @receiver(latch_denied)
+        @in_background
+        def audit_denial(sender, user, **kwargs):
+            ...
+
+    The decorated receiver returns at once, and ``receiver`` is called in
+    a small pool of threads. Coroutine functions run as tasks of the event
+    loop of the sender when it's asynchronous, such as
+    :func:`~django_latch.backends.acan_pass_latch`, and in the pool of
+    threads otherwise. The exceptions they raise are logged to the
+    ``django_latch.signals`` logger.
+
+    At most :data:`MAX_PENDING_RECEIVERS` receivers wait for the pool of
+    threads at the same time. Further ones are dropped, logging a warning,
+    so a burst of signals can't pile up in memory.
+    """
+
+    if iscoroutinefunction(receiver) and ASYNC_RECEIVERS:
+
+        @wraps(receiver)
+        async def wrapper(*args, **kwargs):
+            """
+            Run ``receiver`` as a task of the loop of the sender, or in the
+            pool of threads if it's synchronous.
+            """
+
+            if _sending_sync.get():
+                _submit(lambda: asyncio.run(receiver(*args, **kwargs)))
+                return
+            task = asyncio.get_running_loop().create_task(receiver(*args, **kwargs))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+            task.add_done_callback(_log_exception)
+
+    elif iscoroutinefunction(receiver):
+        # Older versions of Django call every receiver synchronously. The
+        # wrapper is synchronous, so the markers of coroutine functions in
+        # the __dict__ of receiver aren't copied.
+        @wraps(receiver, updated=())
+        def wrapper(*args, **kwargs):
+            """
+            Run ``receiver`` in its own event loop in the pool of threads.
+            """
+
+            _submit(lambda: asyncio.run(receiver(*args, **kwargs)))
+
+    else:
+
+        @wraps(receiver, updated=())
+        def wrapper(*args, **kwargs):
+            """
+            Call ``receiver`` in the pool of threads.
+            """
+
+            _submit(lambda: receiver(*args, **kwargs))
+
+    return wrapper
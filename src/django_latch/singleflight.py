@@ -0,0 +1,105 @@
+"""
+Coalescing of concurrent calls that ask for the same thing.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# Result shared by a cancelled call, telling the callers waiting for it to
+# make the call themselves.
+_RETRY = object()
+
+
+class SingleFlight:
+    """
+    Make sure that only one call per key is in flight at the same time.
+
+    The first thread calling :meth:`do` with a key runs the function; the
+    threads that call it with the same key meanwhile wait for that call and
+    get its result, or its exception.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        Return the result of ``func()``, sharing it with the concurrent calls
+        with the same ``key``.
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """
+    Asynchronous version of :class:`SingleFlight`, which coalesces the
+    calls of the coroutines running in the same event loop.
+
+    If the coroutine running the function is cancelled, the cancellation
+    isn't shared: one of the coroutines waiting for it runs the function
+    again and the rest wait for that call.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, afunc):
+        """
+        Return the result of ``await afunc()``, sharing it with the concurrent
+        calls with the same ``key``.
+        """
+
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        future = self._calls.get(call_key)
+        while future is not None:
+            result = await asyncio.shield(future)
+            if result is not _RETRY:
+                return result
+            future = self._calls.get(call_key)
+
+        future = self._calls[call_key] = loop.create_future()
+        try:
+            result = await afunc()
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # The exception is already raised to this caller, so there is
+            # no need to warn about it if nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[call_key]
@@ -0,0 +1,364 @@
+"""
+Lookup of the latch status of the Latch accounts.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import aget_latch_api, get_latch_api
+from .breaker import aguard, guard
+from .cache import get_status_cache
+from .hedging import ahedge, hedge
+from .metrics import metrics
+from .retry import aretry, retry
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .timing import latency_histogram
+from .transports import UNAVAILABLE_ERRORS, get_timeouts
+
+#: Valid values of the LATCH_FAILURE_POLICY setting.
+FAILURE_POLICIES = ("raise", "allow", "deny", "last-known")
+
+#: Threads refreshing stale statuses in the background.
+REFRESH_WORKERS = 4
+
+#: Accounts whose last known status is kept in every process.
+LAST_KNOWN_SIZE = 10000
+
+
+class LastKnownStatuses:
+    """
+    Keep the status last fetched from the Latch service for the most
+    recently fetched accounts of the process.
+
+    :param int max_size: Maximum number of accounts kept.
+    """
+
+    def __init__(self, max_size=LAST_KNOWN_SIZE):
+        self.max_size = max_size
+        self._statuses = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, account_id):
+        """
+        Return the last known status of ``account_id``, or ``None``.
+        """
+
+        with self._lock:
+            return self._statuses.get(account_id)
+
+    def set(self, account_id, can_pass):
+        """
+        Remember the status of ``account_id``, forgetting the least recently
+        fetched account if there are too many.
+        """
+
+        with self._lock:
+            self._statuses[account_id] = can_pass
+            self._statuses.move_to_end(account_id)
+            if len(self._statuses) > self.max_size:
+                self._statuses.popitem(last=False)
+
+    def clear(self):
+        """
+        Forget every status.
+        """
+
+        with self._lock:
+            self._statuses.clear()
+
+
+last_known_statuses = LastKnownStatuses()
+
+
+def apply_failure_policy(exc, account_id=None):
+    """
+    Return the status to use when the Latch service has failed with ``exc``,
+    according to the :data:`LATCH_FAILURE_POLICY` setting.
+
+    ``exc`` is raised if the policy is ``'raise'``, or if it is
+    ``'last-known'`` and the status of ``account_id`` has never been fetched
+    by the process.
+    """
+
+    policy = getattr(settings, "LATCH_FAILURE_POLICY", "raise")
+    if policy == "allow":
+        return True
+    if policy == "deny":
+        return False
+    if policy == "last-known":
+        can_pass = last_known_statuses.get(account_id)
+        if can_pass is not None:
+            return can_pass
+    raise exc
+
+
+status_flights = SingleFlight()
+astatus_flights = AsyncSingleFlight()
+
+
+def request_status(call):
+    """
+    Return the status returned by ``call(latch_api)``, which asks the Latch
+    service for a status through the client returned by
+    :func:`~django_latch.get_latch_api`.
+
+    The request goes through the circuit breaker (see
+    :data:`LATCH_CIRCUIT_BREAKER`) and may be retried (see
+    :data:`LATCH_RETRIES`) and hedged (see :data:`LATCH_HEDGE`).
+    """
+
+    start = time.perf_counter()
+    status = guard(lambda: retry(lambda: hedge(lambda: call(get_latch_api()))))
+    latency_histogram.record(time.perf_counter() - start)
+    return status
+
+
+async def arequest_status(acall):
+    """
+    Asynchronous version of :func:`request_status`, where ``acall`` is a
+    coroutine function that receives the client returned by
+    :func:`~django_latch.aget_latch_api`.
+
+    The request is cancelled after the total of the
+    :func:`~django_latch.transports.get_timeouts`.
+    """
+
+    async def request():
+        """Make the request, cancelling it after the total timeout."""
+        timeouts = get_timeouts()
+        latch_api = await aget_latch_api()
+        return await asyncio.wait_for(acall(latch_api), timeouts.total)
+
+    start = time.perf_counter()
+    status = await aguard(lambda: aretry(lambda: ahedge(request)))
+    latency_histogram.record(time.perf_counter() - start)
+    return status
+
+
+def fetch_account_status(account_id):
+    """
+    Ask the Latch service for the status of ``account_id``, returning
+    ``True`` if the latch is open, ``False`` if it's closed.
+
+    Concurrent calls for the same account in the process share a single
+    request to the Latch service, made by :func:`request_status`.
+    """
+
+    def fetch():
+        """Request the status and remember it as the last known one."""
+        status = request_status(lambda latch_api: latch_api.account_status(account_id))
+        last_known_statuses.set(account_id, status.status)
+        return status.status
+
+    return status_flights.do(account_id, fetch)
+
+
+async def afetch_account_status(account_id):
+    """
+    Asynchronous version of :func:`fetch_account_status`, where concurrent
+    calls in the same event loop share a single request.
+    """
+
+    async def fetch():
+        """Request the status and remember it as the last known one."""
+        status = await arequest_status(
+            lambda latch_api: latch_api.account_status(account_id)
+        )
+        last_known_statuses.set(account_id, status.status)
+        return status.status
+
+    return await astatus_flights.do(account_id, fetch)
+
+
+class StatusRefresher:
+    """
+    Refresh stale statuses in the background, at most once at the same
+    time for every account.
+
+    Synchronous refreshes run in a small pool of threads created on first
+    use; asynchronous ones are tasks in the running event loop.
+    """
+
+    def __init__(self, max_workers=REFRESH_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._tasks = set()
+
+    def _claim(self, account_id):
+        """
+        Mark ``account_id`` as being refreshed, returning ``False`` if it
+        already was.
+        """
+
+        with self._lock:
+            if account_id in self._refreshing:
+                return False
+            self._refreshing.add(account_id)
+            return True
+
+    def _release(self, account_id):
+        """
+        Mark ``account_id`` as not being refreshed.
+        """
+
+        with self._lock:
+            self._refreshing.discard(account_id)
+
+    def refresh(self, account_id):
+        """
+        Fetch and cache the status of ``account_id`` in a background thread.
+        """
+
+        if not self._claim(account_id):
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="django_latch_refresh",
+                )
+        self._executor.submit(self._refresh, account_id)
+
+    def _refresh(self, account_id):
+        """
+        Fetch and cache the status of ``account_id``, ignoring the failures
+        of the Latch service.
+        """
+
+        try:
+            can_pass = fetch_account_status(account_id)
+            status_cache = get_status_cache()
+            if status_cache is not None:
+                status_cache.set(account_id, can_pass)
+        except UNAVAILABLE_ERRORS:
+            pass
+        finally:
+            self._release(account_id)
+
+    def arefresh(self, account_id):
+        """
+        Fetch and cache the status of ``account_id`` in a task of the running
+        event loop.
+        """
+
+        if not self._claim(account_id):
+            return
+        task = asyncio.get_running_loop().create_task(self._arefresh(account_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _arefresh(self, account_id):
+        """
+        Asynchronous version of :meth:`_refresh`.
+        """
+
+        try:
+            can_pass = await afetch_account_status(account_id)
+            status_cache = get_status_cache()
+            if status_cache is not None:
+                await status_cache.aset(account_id, can_pass)
+        except UNAVAILABLE_ERRORS:
+            pass
+        finally:
+            self._release(account_id)
+
+
+status_refresher = StatusRefresher()
+
+
+def lookup_account_status(account_id):
+    """
+    Return a tuple ``(can_pass, from_cache)``, where ``can_pass`` is
+    ``True`` if the latch of ``account_id`` is open and ``False`` if it's
+    closed, and ``from_cache`` tells if it was taken from the status cache
+    instead of asking the Latch service.
+
+    If the :data:`LATCH_STATUS_CACHE` setting is set, a fresh cached status
+    is returned without asking the Latch service. A stale one is returned
+    and refreshed in the background during
+    :data:`LATCH_STATUS_CACHE_STALE_WHILE_REVALIDATE`, or returned if the
+    Latch service fails during :data:`LATCH_STATUS_CACHE_STALE_IF_ERROR`.
+
+    If the Latch service fails and there isn't any usable cached status,
+    :data:`LATCH_FAILURE_POLICY` is applied.
+    """
+
+    status_cache = get_status_cache()
+    entry = None if status_cache is None else status_cache.get(account_id)
+    if entry is not None:
+        if status_cache.is_fresh(entry):
+            metrics.count_cache("account_status", True)
+            return entry.can_pass, True
+        if status_cache.can_revalidate(entry):
+            metrics.count_cache("account_status", True)
+            status_refresher.refresh(account_id)
+            return entry.can_pass, True
+    if status_cache is not None:
+        metrics.count_cache("account_status", False)
+
+    try:
+        can_pass = fetch_account_status(account_id)
+    except UNAVAILABLE_ERRORS as exc:
+        if entry is not None and status_cache.can_serve_on_error(entry):
+            return entry.can_pass, True
+        return apply_failure_policy(exc, account_id), False
+
+    if status_cache is not None:
+        status_cache.set(account_id, can_pass)
+    return can_pass, False
+
+
+async def alookup_account_status(account_id):
+    """
+    Asynchronous version of :func:`lookup_account_status`.
+    """
+
+    status_cache = get_status_cache()
+    entry = None if status_cache is None else await status_cache.aget(account_id)
+    if entry is not None:
+        if status_cache.is_fresh(entry):
+            metrics.count_cache("account_status", True)
+            return entry.can_pass, True
+        if status_cache.can_revalidate(entry):
+            metrics.count_cache("account_status", True)
+            status_refresher.arefresh(account_id)
+            return entry.can_pass, True
+    if status_cache is not None:
+        metrics.count_cache("account_status", False)
+
+    try:
+        can_pass = await afetch_account_status(account_id)
+    except UNAVAILABLE_ERRORS as exc:
+        if entry is not None and status_cache.can_serve_on_error(entry):
+            return entry.can_pass, True
+        return apply_failure_policy(exc, account_id), False
+
+    if status_cache is not None:
+        await status_cache.aset(account_id, can_pass)
+    return can_pass, False
+
+
+def get_account_status(account_id):
+    """
+    Return ``True`` if the latch of ``account_id`` is open, ``False`` if
+    it's closed, as looked up by :func:`lookup_account_status`.
+    """
+
+    return lookup_account_status(account_id)[0]
+
+
+async def aget_account_status(account_id):
+    """
+    Asynchronous version of :func:`get_account_status`.
+    """
+
+    return (await alookup_account_status(account_id))[0]
@@ -0,0 +1,381 @@
+"""
+Equalization of the time taken to check the latch of paired and unpaired
+users.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import collections
+import math
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.utils.crypto import get_random_string
+from django.utils.module_loading import import_string
+
+from . import aget_latch_api, get_latch_api
+from .breaker import aguard, guard
+from .cache import get_status_cache
+from .metrics import metrics
+from .transports import UNAVAILABLE_ERRORS, get_timeouts
+
+#: Default decoy used for unpaired users.
+DEFAULT_DECOY = "django_latch.timing.RealRequestDecoy"
+
+#: Threads sending decoy requests in the background.
+DECOY_WORKERS = 4
+
+#: Decoy requests that may be queued or in flight in the background at the
+#: same time. Further decoys are dropped.
+MAX_PENDING_DECOYS = 16
+
+#: Prefix of the keys, in the status cache, of the decoys run for every
+#: unpaired user.
+DECOY_KEY_PREFIX = "decoy:"
+
+_random = secrets.SystemRandom()
+
+
+class LatencyHistogram:
+    """
+    Rolling window with the latencies of the latest requests to the
+    Latch service.
+
+    :param int size: Number of latencies kept.
+    """
+
+    def __init__(self, size=1000):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of recorded latencies."""
+        return len(self._samples)
+
+    def record(self, seconds):
+        """
+        Add the latency of a request.
+        """
+
+        with self._lock:
+            self._samples.append(seconds)
+
+    def sample(self):
+        """
+        Return a latency drawn from the recorded ones, or ``None`` if there
+        isn't any.
+        """
+
+        with self._lock:
+            if not self._samples:
+                return None
+            return _random.choice(self._samples)
+
+    def percentile(self, percent):
+        """
+        Return the ``percent`` percentile of the recorded latencies, or
+        ``None`` if there isn't any.
+        """
+
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = math.ceil(percent / 100 * len(samples))
+        return samples[min(max(rank, 1), len(samples)) - 1]
+
+    def clear(self):
+        """
+        Remove every recorded latency.
+        """
+
+        with self._lock:
+            self._samples.clear()
+
+
+#: Latencies of the status requests made to the Latch service.
+latency_histogram = LatencyHistogram()
+
+
+class BaseDecoy:
+    """
+    Base class of the strategies that make the latch check of an unpaired
+    user take about the same time as the check of a paired one.
+
+    .. automethod:: run
+
+    .. automethod:: arun
+    """
+
+    def run(self):
+        """
+        Spend the time a status request would take.
+        """
+
+        raise NotImplementedError("Subclasses of BaseDecoy must implement run().")
+
+    async def arun(self):
+        """
+        Asynchronous version of :meth:`run`.
+        """
+
+        raise NotImplementedError("Subclasses of BaseDecoy must implement arun().")
+
+
+class RealRequestDecoy(BaseDecoy):
+    """
+    Ask the Latch service for the status of a random account, discarding
+    the answer.
+
+    It takes the same time as a real check, but it spends a request of the
+    Latch quota for every unpaired user. The request goes through the
+    circuit breaker, as a real check does, and its failures are ignored.
+    It isn't recorded in the latency and errors of ``account_status`` in
+    :data:`~django_latch.metrics.metrics`, which count the real checks.
+    """
+
+    def run(self):
+        """
+        Make the request for the status of a random account.
+        """
+
+        start = time.perf_counter()
+        try:
+            guard(lambda: get_latch_api().client.account_status(get_random_string(64)))
+        except UNAVAILABLE_ERRORS:
+            pass
+        latency_histogram.record(time.perf_counter() - start)
+
+    async def arun(self):
+        """
+        Asynchronous version of :meth:`run`.
+        """
+
+        async def request():
+            """Make the decoy request, cancelling it after the total timeout."""
+            timeouts = get_timeouts()
+            latch_api = await aget_latch_api()
+            return await asyncio.wait_for(
+                latch_api.client.account_status(get_random_string(64)),
+                timeouts.total,
+            )
+
+        start = time.perf_counter()
+        try:
+            await aguard(request)
+        except UNAVAILABLE_ERRORS:
+            pass
+        latency_histogram.record(time.perf_counter() - start)
+
+
+class SampledLatencyDecoy(BaseDecoy):
+    """
+    Wait for a time drawn from the latencies of the latest real status
+    requests, without making any request.
+
+    Until :attr:`min_samples` latencies have been recorded, the decoy falls
+    back to :class:`RealRequestDecoy`, so the waits follow the real
+    distribution from the start.
+
+    .. attribute:: min_samples
+
+        Number of recorded latencies needed to stop making real requests.
+    """
+
+    min_samples = 20
+
+    def run(self):
+        """
+        Sleep for a sampled latency.
+        """
+
+        if len(latency_histogram) < self.min_samples:
+            RealRequestDecoy().run()
+        else:
+            time.sleep(latency_histogram.sample())
+
+    async def arun(self):
+        """
+        Asynchronous version of :meth:`run`.
+        """
+
+        if len(latency_histogram) < self.min_samples:
+            await RealRequestDecoy().arun()
+        else:
+            await asyncio.sleep(latency_histogram.sample())
+
+
+class DecoyDispatcher:
+    """
+    Send real decoy requests in the background, without the caller waiting
+    for them.
+
+    Synchronous decoys run in a small pool of threads created on first use;
+    asynchronous ones are tasks in the running event loop. At most
+    ``max_pending`` decoys are queued or in flight at the same time, and
+    those exceeding it are dropped, so a flood of checks of unpaired users
+    cannot exhaust the outbound capacity to the Latch service.
+    """
+
+    def __init__(self, max_workers=DECOY_WORKERS, max_pending=MAX_PENDING_DECOYS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._tasks = set()
+
+    def _claim(self):
+        """
+        Count a new pending decoy, returning ``False`` if there are already
+        too many.
+        """
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, future):
+        """
+        Discount the decoy of ``future``, which has finished, discarding its
+        exception.
+        """
+
+        with self._lock:
+            self._pending -= 1
+        if not future.cancelled():
+            future.exception()
+
+    def submit(self):
+        """
+        Send a decoy request in a background thread, returning its
+        :class:`~concurrent.futures.Future`, or ``None`` if it was dropped.
+        """
+
+        if not self._claim():
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="django_latch_decoy",
+                )
+        future = self._executor.submit(RealRequestDecoy().run)
+        future.add_done_callback(self._release)
+        return future
+
+    def asubmit(self):
+        """
+        Send a decoy request in a task of the running event loop, returning
+        the task, or ``None`` if it was dropped.
+        """
+
+        if not self._claim():
+            return None
+        task = asyncio.get_running_loop().create_task(RealRequestDecoy().arun())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(self._release)
+        return task
+
+
+decoy_dispatcher = DecoyDispatcher()
+
+
+class BackgroundRequestDecoy(BaseDecoy):
+    """
+    Send a real decoy request in the background, through
+    :data:`decoy_dispatcher`, and wait for a time drawn from the latencies
+    of the latest real status requests.
+
+    The Latch service sees the same requests as with
+    :class:`RealRequestDecoy`, but the caller doesn't wait for the decoy
+    itself. Decoys are dropped when too many of them are pending, while the
+    wait is kept. Until some latency has been recorded, the caller waits for
+    the decoy request to finish.
+    """
+
+    def run(self):
+        """
+        Send the decoy request and sleep for a sampled latency.
+        """
+
+        latency = latency_histogram.sample()
+        future = decoy_dispatcher.submit()
+        if latency is not None:
+            time.sleep(latency)
+        elif future is not None:
+            wait([future])
+
+    async def arun(self):
+        """
+        Asynchronous version of :meth:`run`.
+        """
+
+        latency = latency_histogram.sample()
+        task = decoy_dispatcher.asubmit()
+        if latency is not None:
+            await asyncio.sleep(latency)
+        elif task is not None:
+            await asyncio.wait([task])
+
+
+def get_decoy():
+    """
+    Return an instance of the decoy set in the :data:`LATCH_DECOY` setting.
+    """
+
+    return import_string(getattr(settings, "LATCH_DECOY", DEFAULT_DECOY))()
+
+
+def run_decoy(user_pk=None):
+    """
+    Run the decoy set in the :data:`LATCH_DECOY` setting for the unpaired
+    user ``user_pk``, counting it in :data:`~django_latch.metrics.metrics`.
+
+    If :data:`LATCH_STATUS_CACHE` is set, the decoy of every user is cached
+    as an open status would be, so unpaired users are answered at the speed
+    of the cache as often as paired ones: the decoy is skipped while it's
+    fresh, and sent in the background through :data:`decoy_dispatcher`
+    while it may be revalidated.
+    """
+
+    status_cache = None if user_pk is None else get_status_cache()
+    if status_cache is not None:
+        key = f"{DECOY_KEY_PREFIX}{user_pk}"
+        entry = status_cache.get(key)
+        if entry is not None and status_cache.is_fresh(entry):
+            return
+        status_cache.set(key, True)
+        if entry is not None and status_cache.can_revalidate(entry):
+            metrics.count_decoy()
+            decoy_dispatcher.submit()
+            return
+    metrics.count_decoy()
+    get_decoy().run()
+
+
+async def arun_decoy(user_pk=None):
+    """
+    Asynchronous version of :func:`run_decoy`.
+    """
+
+    status_cache = None if user_pk is None else get_status_cache()
+    if status_cache is not None:
+        key = f"{DECOY_KEY_PREFIX}{user_pk}"
+        entry = await status_cache.aget(key)
+        if entry is not None and status_cache.is_fresh(entry):
+            return
+        await status_cache.aset(key, True)
+        if entry is not None and status_cache.can_revalidate(entry):
+            metrics.count_decoy()
+            decoy_dispatcher.asubmit()
+            return
+    metrics.count_decoy()
+    await get_decoy().arun()
@@ -0,0 +1,307 @@
+"""
+HTTP transports used to reach the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import collections
+import json
+import threading
+import time
+from http.client import BadStatusLine, HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from latch_sdk.exceptions import LatchError
+from latch_sdk.models import Response
+from latch_sdk.syncio.pure import Latch as PureLatch
+
+from .context import get_remaining_time
+from .exceptions import CircuitOpenError, InvalidResponseError
+
+#: Default seconds to wait for the connection to the Latch service.
+DEFAULT_CONNECT_TIMEOUT = 3
+
+#: Default seconds to wait for every response of the Latch service.
+DEFAULT_TIMEOUT = 5
+
+#: Default number of idle connections kept alive per host.
+DEFAULT_POOL_SIZE = 10
+
+#: Default seconds after which an idle connection is not reused.
+DEFAULT_POOL_IDLE_TIMEOUT = 15
+
+# Errors raised when the server closed a kept-alive connection.
+STALE_CONNECTION_ERRORS = (BadStatusLine, ConnectionError)
+
+
+def _get_connection_errors():
+    """
+    Return the exception classes meaning that the Latch service couldn't
+    be reached or didn't answer, including those of the installed HTTP
+    packages.
+    """
+
+    errors = [OSError, HTTPException, asyncio.TimeoutError]
+    for path in ("httpx.HTTPError", "aiohttp.ClientError"):
+        try:
+            errors.append(import_string(path))
+        except ImportError:
+            pass
+    return tuple(errors)
+
+
+#: Exceptions raised when the Latch service cannot be reached.
+CONNECTION_ERRORS = _get_connection_errors()
+
+#: Exceptions raised when the Latch service is not available.
+UNAVAILABLE_ERRORS = (LatchError, CircuitOpenError, *CONNECTION_ERRORS)
+
+Timeouts = collections.namedtuple("Timeouts", ["connect", "read", "total"])
+Timeouts.__doc__ = """
+Seconds to wait for the connection to the Latch service, for its response
+and for the whole request.
+"""
+
+
+def get_timeouts():
+    """
+    Return the :class:`Timeouts` of the next request to the Latch service.
+
+    They are given by the :data:`LATCH_CONNECT_TIMEOUT` and
+    :data:`LATCH_TIMEOUT` settings, shortened to the time left until the
+    current :func:`~django_latch.context.deadline`. If it has already
+    expired, :exc:`TimeoutError` is raised.
+    """
+
+    connect = getattr(settings, "LATCH_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+    read = getattr(settings, "LATCH_TIMEOUT", DEFAULT_TIMEOUT)
+    total = connect + read
+    remaining = get_remaining_time()
+    if remaining is not None:
+        if remaining <= 0:
+            raise TimeoutError("The deadline of the Latch request has expired.")
+        connect, read, total = (min(t, remaining) for t in (connect, read, total))
+    return Timeouts(connect, read, total)
+
+
+def parse_response(status, body):
+    """
+    Return the :class:`~latch_sdk.models.Response` of the Latch service
+    with the HTTP ``status`` and the bytes ``body``.
+
+    :exc:`~django_latch.exceptions.InvalidResponseError` is raised if the
+    status is a server error or the body isn't JSON.
+    """
+
+    if status >= 500:
+        raise InvalidResponseError(
+            f"The Latch service answered with the HTTP status {status}.", status
+        )
+    try:
+        data = json.loads(body)
+    except ValueError as exc:
+        raise InvalidResponseError(
+            "The Latch service answered with a body that isn't JSON.", status
+        ) from exc
+    return Response.build_from_dict(data)
+
+
+def build_url(core, path):
+    """
+    Return the URL of ``path`` in the Latch service reached by ``core``.
+    """
+
+    scheme = "https" if core.is_https else "http"
+    return f"{scheme}://{core.host}:{core.port}{path}"
+
+
+def build_proxy_url(core):
+    """
+    Return the URL of the proxy configured in ``core``, or ``None``.
+    """
+
+    if not core.proxy_host:
+        return None
+    return f"http://{core.proxy_host}:{core.proxy_port}"
+
+
+class ConnectionPool:
+    """
+    Bounded pool of keep-alive connections to a single host.
+
+    At most ``max_size`` idle connections are kept. Extra connections are
+    still created when all the idle ones are in use, but they are closed
+    after being released instead of being kept.
+
+    :param callable factory: Callable without arguments that returns a
+        new :class:`http.client.HTTPConnection`.
+    :param int max_size: Maximum number of idle connections kept.
+    :param float idle_timeout: Seconds an idle connection may be kept
+        before it is closed instead of reused.
+    """
+
+    def __init__(self, factory, max_size, idle_timeout):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Return a tuple with a connection and whether it was kept alive from
+        a previous request.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released_at = self._idle.pop()
+                if now - released_at < self.idle_timeout:
+                    return conn, True
+                conn.close()
+        return self.factory(), False
+
+    def release(self, conn, reusable=True):
+        """
+        Give ``conn`` back to the pool, closing it if it cannot be reused or
+        the pool is full.
+        """
+
+        if reusable:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        conn.close()
+
+    def clear(self):
+        """
+        Close every idle connection.
+        """
+
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+
+class PooledLatch(PureLatch):
+    """
+    Variant of :class:`latch_sdk.syncio.pure.Latch` that keeps the connections
+    to the Latch service alive between requests.
+
+    Connections are taken from a :class:`ConnectionPool` per host. If the
+    server closed a kept-alive connection, the request is sent again
+    through a new one. The connection and every response are bounded by
+    the :func:`get_timeouts`.
+
+    :param int pool_size: Idle connections kept per host. Defaults to
+        :data:`LATCH_HTTP_POOL_SIZE`. ``0`` disables pooling, so every
+        request opens its own connection.
+    :param float idle_timeout: Seconds an idle connection may be reused.
+        Defaults to :data:`LATCH_HTTP_POOL_IDLE_TIMEOUT`.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, *args, pool_size=None, idle_timeout=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if pool_size is None:
+            pool_size = getattr(settings, "LATCH_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE)
+        if idle_timeout is None:
+            idle_timeout = getattr(
+                settings, "LATCH_HTTP_POOL_IDLE_TIMEOUT", DEFAULT_POOL_IDLE_TIMEOUT
+            )
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def _new_connection(self):
+        """
+        Open a new connection to the Latch service, through the proxy if
+        there is one configured.
+        """
+
+        conn_class = HTTPSConnection if self.is_https else HTTPConnection
+        if self.proxy_host:
+            conn = conn_class(self.proxy_host, self.proxy_port)
+            conn.set_tunnel(self.host, self.port)
+        else:
+            conn = conn_class(self.host, self.port)
+        return conn
+
+    def _get_pool(self):
+        """
+        Return the pool of connections for the current host.
+        """
+
+        key = (self.is_https, self.host, self.port, self.proxy_host, self.proxy_port)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._pools_lock:
+                pool = self._pools.setdefault(
+                    key,
+                    ConnectionPool(
+                        self._new_connection, self.pool_size, self.idle_timeout
+                    ),
+                )
+        return pool
+
+    @staticmethod
+    def _send(conn, timeouts, request):
+        """
+        Send ``request``, a tuple with its method, path, body and headers,
+        through ``conn`` and return its response.
+        """
+
+        conn.timeout = timeouts.connect
+        if conn.sock is None:
+            conn.connect()
+        conn.sock.settimeout(timeouts.read)
+        conn.request(*request)
+        return conn.getresponse()
+
+    def _http(self, method, path, headers, params=None):
+        """
+        Send the request through a pooled connection.
+        """
+
+        timeouts = get_timeouts()
+        all_headers = dict(headers)
+        body = None if params is None else urlencode(params)
+        if method in ("POST", "PUT"):
+            all_headers["Content-type"] = "application/x-www-form-urlencoded"
+
+        request = (method, path, body, all_headers)
+        pool = self._get_pool()
+        conn, reused = pool.acquire()
+        try:
+            try:
+                response = self._send(conn, timeouts, request)
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                conn.close()
+                conn = self._new_connection()
+                response = self._send(conn, timeouts, request)
+            data = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        pool.release(conn, reusable=not response.will_close)
+
+        return parse_response(response.status, data)
+
+    def close(self):
+        """
+        Close every idle connection kept by this client.
+        """
+
+        with self._pools_lock:
+            for pool in self._pools.values():
+                pool.clear()
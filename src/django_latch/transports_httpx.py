@@ -0,0 +1,49 @@
+"""
+HTTP transport that reaches the Latch service through httpx.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import httpx
+
+from latch_sdk.syncio.httpx import Latch
+
+from .transports import build_proxy_url, build_url, get_timeouts, parse_response
+
+
+class HttpxLatch(Latch):
+    """
+    Variant of :class:`latch_sdk.syncio.httpx.Latch` whose requests are
+    bounded by the :func:`~django_latch.transports.get_timeouts`.
+
+    A single :class:`httpx.Client` is kept, so the connections to the Latch
+    service are reused between requests.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = httpx.Client(proxy=build_proxy_url(self))
+
+    def _http(self, method, path, headers, params=None):
+        """
+        Send the request through the client with the current timeouts.
+        """
+
+        timeouts = get_timeouts()
+        response = self._client.request(
+            method,
+            build_url(self, path),
+            headers=headers,
+            data=params,
+            timeout=httpx.Timeout(timeouts.read, connect=timeouts.connect),
+        )
+        return parse_response(response.status_code, response.content)
+
+    def close(self):
+        """
+        Close the connections kept by the client.
+        """
+
+        self._client.close()
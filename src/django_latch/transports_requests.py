@@ -0,0 +1,54 @@
+"""
+HTTP transport that reaches the Latch service through requests.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import requests
+
+from latch_sdk.syncio.requests import Latch
+
+from .transports import build_proxy_url, build_url, get_timeouts, parse_response
+
+
+class RequestsLatch(Latch):
+    """
+    Variant of :class:`latch_sdk.syncio.requests.Latch` whose requests are
+    bounded by the :func:`~django_latch.transports.get_timeouts`.
+
+    A :class:`requests.Session` is kept, so the connections to the Latch
+    service are reused between requests. As sessions are not thread-safe,
+    the client is built once per thread (see
+    :data:`django_latch.THREAD_SAFE_HTTP_BACKENDS`).
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = requests.Session()
+        proxy_url = build_proxy_url(self)
+        if proxy_url is not None:
+            self._session.proxies = {"http": proxy_url, "https": proxy_url}
+
+    def _http(self, method, path, headers, params=None):
+        """
+        Send the request through the session with the current timeouts.
+        """
+
+        timeouts = get_timeouts()
+        response = self._session.request(
+            method,
+            build_url(self, path),
+            headers=headers,
+            data=params,
+            timeout=(timeouts.connect, timeouts.read),
+        )
+        return parse_response(response.status_code, response.content)
+
+    def close(self):
+        """
+        Close the connections kept by the session.
+        """
+
+        self._session.close()
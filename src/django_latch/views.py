@@ -1,22 +1,36 @@
 """
-Views for pairing and unpairing a user.
+Views for pairing and unpairing a user, and for exporting the metrics.
 """
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import asyncio
+import time
+
+from django.views import View
 from django.views.generic.edit import FormView
 from django.views.generic.base import TemplateView
 from django.urls import reverse_lazy
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
 from django.utils.translation import gettext_lazy as _
 
 from latch_sdk.exceptions import LatchError
 
-from . import get_latch_api
+from . import aget_latch_api, get_latch_api
 from .forms import PairLatchForm
-from .models import LatchUserConfig, is_paired
+from .metrics import PROMETHEUS_CONTENT_TYPE, metrics
+from .models import (
+    aget_latch_config,
+    aload_account_id,
+    get_latch_config,
+    is_paired,
+    set_latch_config,
+)
 from .exceptions import UnpairingLatchError
 from .mixins import UnpairedUserRequiredMixin, PairedUserRequiredMixin
+from .sessions import aupdate_session_pairing, update_session_pairing
+from .signals import asend, has_receivers, latch_unpaired, send
+from .transports import CONNECTION_ERRORS, get_timeouts
 
 
 class PairLatchView(UnpairedUserRequiredMixin, FormView):
@@ -46,7 +60,8 @@ class PairLatchView(UnpairedUserRequiredMixin, FormView):
         :param django_latch.forms.PairLatchForm form: The token form to use.
         """
 
-        form.pair_account(self.request.user)
+        config = form.pair_account(self.request.user)
+        update_session_pairing(self.request, self.request.user, config)
         return super().form_valid(form)
 
 
@@ -61,10 +76,13 @@ class UnpairLatchView(PairedUserRequiredMixin, TemplateView):
 
     .. automethod:: post
 
+    .. automethod:: render_unpair_error
+
     .. automethod:: check_user
     """
 
     NOT_PAIRED_MESSAGE = _("Your account is not paired with Latch.")
+    TIMEOUT_MESSAGE = _("The Latch service took too long to answer.")
 
     template_name = "django_latch/unpair_account.html"
     success_url = reverse_lazy("django_latch_unpair_complete")
@@ -77,37 +95,54 @@ class UnpairLatchView(PairedUserRequiredMixin, TemplateView):
         the view and include information about the error in the template context.
         """
 
-        extra_context = {}
-
         try:
             self.unpair_account()
         except UnpairingLatchError as exc:
-            extra_context["unpair_error"] = {
-                "message": exc.message,
-                "code": exc.code,
-                "params": exc.params,
-            }
-        else:
-            return HttpResponseRedirect(self.success_url)
+            return self.render_unpair_error(exc)
+        return HttpResponseRedirect(self.success_url)
+
+    def render_unpair_error(self, exc):
+        """
+        Re-render the view including the information about the
+        :class:`django_latch:execptions.UnpairingLatchError` ``exc`` in the
+        template context.
+        """
 
         context_data = self.get_context_data()
-        context_data.update(extra_context)
+        context_data["unpair_error"] = {
+            "message": exc.message,
+            "code": exc.code,
+            "params": exc.params,
+        }
         return self.render_to_response(context_data)
 
     def unpair_account(self):
         """
-        Unpair the user account from the Latch service.
+        Unpair the user account from the Latch service, sending the
+        :data:`~django_latch.signals.latch_unpaired` signal afterwards.
+
+        If the Latch service can't be reached or doesn't answer in time, an
+        :class:`~django_latch.exceptions.UnpairingLatchError` with the
+        ``'timeout'`` code is raised.
         """
 
         self.check_user()
-        config = LatchUserConfig.objects.get(user=self.request.user)
+        config = get_latch_config(self.request.user)
+        start = time.perf_counter()
         try:
             latch_api = get_latch_api()
             latch_api.account_unpair(config.account_id)
         except LatchError as exc:
             raise UnpairingLatchError(exc.message, exc.code) from exc
+        except CONNECTION_ERRORS as exc:
+            raise UnpairingLatchError(self.TIMEOUT_MESSAGE, "timeout") from exc
+        duration = time.perf_counter() - start
 
         config.delete()
+        set_latch_config(self.request.user, None)
+        update_session_pairing(self.request, self.request.user, None)
+        if has_receivers(latch_unpaired):
+            send(latch_unpaired, self.request.user, duration=duration, from_cache=False)
 
     def check_user(self):
         """
@@ -117,3 +152,140 @@ class UnpairLatchView(PairedUserRequiredMixin, TemplateView):
 
         if not is_paired(self.request.user):
             raise UnpairingLatchError(self.NOT_PAIRED_MESSAGE, "not_paired")
+
+
+class AsyncPairLatchView(PairLatchView):
+    """
+    Asynchronous version of :class:`PairLatchView`.
+
+    The token is validated with the asynchronous Latch client and the
+    database is accessed without blocking the event loop, so pairing
+    doesn't tie up a worker thread under ASGI.
+
+    .. automethod:: aform_valid
+    """
+
+    # Django requires every HTTP handler of a view to be a coroutine
+    # function, or none of them, so the handlers are overridden as such.
+    # pylint: disable=invalid-overridden-method
+
+    async def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        """
+        Render the pairing form.
+        """
+
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        """
+        Validate the token and pair the user account if it is valid,
+        re-rendering the form otherwise.
+        """
+
+        form = self.get_form()
+        if await form.ais_valid():
+            return await self.aform_valid(form)
+        return self.form_invalid(form)
+
+    async def put(self, *args, **kwargs):
+        """
+        Handle ``PUT`` as ``POST``, like :class:`~django.views.generic.edit.FormView`.
+        """
+
+        return await self.post(*args, **kwargs)
+
+    async def aform_valid(self, form):
+        """
+        Asynchronous version of :meth:`PairLatchView.form_valid`.
+        """
+
+        config = await form.apair_account(self.request.user)
+        await aupdate_session_pairing(self.request, self.request.user, config)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class AsyncUnpairLatchView(UnpairLatchView):
+    """
+    Asynchronous version of :class:`UnpairLatchView`.
+
+    The account is unpaired with the asynchronous Latch client and the
+    database is accessed without blocking the event loop, so unpairing
+    doesn't tie up a worker thread under ASGI.
+
+    .. automethod:: aunpair_account
+    """
+
+    # See AsyncPairLatchView.
+    # pylint: disable=invalid-overridden-method
+
+    async def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        """
+        Render the unpairing confirmation.
+        """
+
+        return self.render_to_response(self.get_context_data(**kwargs))
+
+    async def post(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        """
+        Asynchronous version of :meth:`UnpairLatchView.post`.
+        """
+
+        try:
+            await self.aunpair_account()
+        except UnpairingLatchError as exc:
+            return self.render_unpair_error(exc)
+        return HttpResponseRedirect(self.success_url)
+
+    async def aunpair_account(self):
+        """
+        Asynchronous version of :meth:`UnpairLatchView.unpair_account`.
+
+        The request is cancelled after the total of the
+        :func:`~django_latch.transports.get_timeouts`, raising an
+        :class:`~django_latch.exceptions.UnpairingLatchError` with the
+        ``'timeout'`` code.
+        """
+
+        config = await aget_latch_config(self.request.user)
+        if config is None:
+            raise UnpairingLatchError(self.NOT_PAIRED_MESSAGE, "not_paired")
+        await aload_account_id(config)
+        start = time.perf_counter()
+        try:
+            timeouts = get_timeouts()
+            latch_api = await aget_latch_api()
+            await asyncio.wait_for(
+                latch_api.account_unpair(config.account_id), timeouts.total
+            )
+        except LatchError as exc:
+            raise UnpairingLatchError(exc.message, exc.code) from exc
+        except CONNECTION_ERRORS as exc:
+            raise UnpairingLatchError(self.TIMEOUT_MESSAGE, "timeout") from exc
+        duration = time.perf_counter() - start
+
+        await config.adelete()
+        set_latch_config(self.request.user, None)
+        await aupdate_session_pairing(self.request, self.request.user, None)
+        if has_receivers(latch_unpaired):
+            await asend(
+                latch_unpaired, self.request.user, duration=duration, from_cache=False
+            )
+
+
+class LatchMetricsView(View):
+    """
+    Export the metrics of the requests to the Latch service made by the
+    process, recorded in :data:`django_latch.metrics.metrics`, in the
+    Prometheus text format.
+
+    It isn't included in ``django_latch.urls``. Add it to your URLconf if
+    you want Prometheus to scrape it, protecting it as the rest of your
+    internal endpoints.
+    """
+
+    def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        """
+        Return the metrics.
+        """
+
+        return HttpResponse(metrics.export(), content_type=PROMETHEUS_CONTENT_TYPE)
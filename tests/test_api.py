@@ -4,6 +4,8 @@ Tests for the Latch API configuration.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import threading
+
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.test.utils import override_settings
@@ -19,43 +21,50 @@ class HTTPBackendTestCases(TestCase):
     def test_core_http(self):
         """
         When LATCH_HTTP_BACKEND is `'http'`, then core class must be
+        `django_latch.transports.PooledLatch`, a subclass of
         `latch_sdk.syncio.pure.Latch`.
         """
 
         from django_latch import get_latch_api
+        from django_latch.transports import PooledLatch
 
         latch_api = get_latch_api()
         from latch_sdk.syncio.pure import Latch
 
-        self.assertEqual(type(latch_api.core), Latch)
+        self.assertEqual(type(latch_api.core), PooledLatch)
+        self.assertIsInstance(latch_api.core, Latch)
 
     @override_settings(LATCH_HTTP_BACKEND="requests")
     def test_core_requests(self):
         """
         When LATCH_HTTP_BACKEND is `'requests'`, then core class must be
-        `latch_sdk.syncio.requests.Latch`.
+        a `latch_sdk.syncio.requests.Latch`.
         """
 
         from django_latch import get_latch_api
+        from django_latch.transports_requests import RequestsLatch
 
         latch_api = get_latch_api()
         from latch_sdk.syncio.requests import Latch
 
-        self.assertEqual(type(latch_api.core), Latch)
+        self.assertEqual(type(latch_api.core), RequestsLatch)
+        self.assertIsInstance(latch_api.core, Latch)
 
-    @override_settings(LATCH_HTTP_BACKEND="requests")
+    @override_settings(LATCH_HTTP_BACKEND="httpx")
     def test_core_httpx(self):
         """
         When LATCH_HTTP_BACKEND is `'httpx'`, then core class must be
-        `latch_sdk.syncio.httpx.Latch`.
+        a `latch_sdk.syncio.httpx.Latch`.
         """
 
         from django_latch import get_latch_api
+        from django_latch.transports_httpx import HttpxLatch
 
         latch_api = get_latch_api()
-        from latch_sdk.syncio.requests import Latch
+        from latch_sdk.syncio.httpx import Latch
 
-        self.assertEqual(type(latch_api.core), Latch)
+        self.assertEqual(type(latch_api.core), HttpxLatch)
+        self.assertIsInstance(latch_api.core, Latch)
 
     @override_settings(LATCH_HTTP_BACKEND="invalid_backend")
     def test_core_invalid_backend(self):
@@ -72,3 +81,144 @@ class HTTPBackendTestCases(TestCase):
             from django_latch import get_latch_api
 
             get_latch_api()
+
+
+class LatchClientRegistryTestCases(TestCase):
+    """
+    Tests for the reuse of the Latch SDK clients.
+    """
+
+    def setUp(self):
+        """
+        Every test starts without any client built.
+        """
+
+        from django_latch import latch_api_registry
+
+        latch_api_registry.reset()
+
+    def test_client_is_reused(self):
+        """
+        Consecutive calls to ``get_latch_api`` return the same client.
+        """
+
+        from django_latch import get_latch_api
+
+        self.assertIs(get_latch_api(), get_latch_api())
+
+    def test_reset(self):
+        """
+        After resetting the registry a new client is built.
+        """
+
+        from django_latch import get_latch_api, latch_api_registry
+
+        latch_api = get_latch_api()
+        latch_api_registry.reset()
+        self.assertIsNot(latch_api, get_latch_api())
+
+    def test_rebuilt_on_setting_changed(self):
+        """
+        Changing the application id builds a new client with the new value.
+        """
+
+        from django_latch import get_latch_api
+
+        latch_api = get_latch_api()
+        with override_settings(LATCH_APP_ID="c" * 20):
+            new_latch_api = get_latch_api()
+            self.assertIsNot(latch_api, new_latch_api)
+            self.assertIs(new_latch_api, get_latch_api())
+        self.assertIsNot(new_latch_api, get_latch_api())
+
+    def test_shared_between_threads(self):
+        """
+        Clients of thread-safe backends are shared between threads.
+        """
+
+        from django_latch import get_latch_api
+
+        latch_api = get_latch_api()
+        clients = []
+        thread = threading.Thread(target=lambda: clients.append(get_latch_api()))
+        thread.start()
+        thread.join()
+        self.assertIs(latch_api, clients[0])
+
+    @override_settings(LATCH_HTTP_BACKEND="requests")
+    def test_one_client_per_thread(self):
+        """
+        Clients of backends that are not thread-safe are built per thread.
+        """
+
+        from django_latch import get_latch_api
+
+        latch_api = get_latch_api()
+        clients = []
+        thread = threading.Thread(target=lambda: clients.append(get_latch_api()))
+        thread.start()
+        thread.join()
+        self.assertIs(latch_api, get_latch_api())
+        self.assertIsNot(latch_api, clients[0])
+
+
+class AsyncHTTPBackendTestCases(TestCase):
+    """
+    Tests that check the asynchronous HTTP backend that the Latch API is using.
+    """
+
+    async def test_core_aiohttp(self):
+        """
+        When LATCH_ASYNC_HTTP_BACKEND is not set, then core class must be
+        `latch_sdk.asyncio.aiohttp.Latch`.
+        """
+
+        from django_latch import aget_latch_api
+
+        latch_api = await aget_latch_api()
+        from latch_sdk.asyncio.aiohttp import Latch
+
+        self.assertEqual(type(latch_api.core), Latch)
+
+    @override_settings(LATCH_ASYNC_HTTP_BACKEND="httpx")
+    async def test_core_httpx(self):
+        """
+        When LATCH_ASYNC_HTTP_BACKEND is `'httpx'`, then core class must be
+        `latch_sdk.asyncio.httpx.Latch`.
+        """
+
+        from django_latch import aget_latch_api
+
+        latch_api = await aget_latch_api()
+        from latch_sdk.asyncio.httpx import Latch
+
+        self.assertEqual(type(latch_api.core), Latch)
+
+    @override_settings(LATCH_ASYNC_HTTP_BACKEND="invalid_backend")
+    async def test_core_invalid_backend(self):
+        """
+        When LATCH_ASYNC_HTTP_BACKEND is is not a valid one, a
+        :class:`~django.core.exceptions.ImproperlyConfigured` is raised.
+        """
+
+        message = (
+            "The LATCH_ASYNC_HTTP_BACKEND setting cannot be invalid_backend, "
+            "the only valid values are 'aiohttp' or 'httpx'."
+        )
+        with self.assertRaisesMessage(ImproperlyConfigured, message):
+            from django_latch import aget_latch_api
+
+            await aget_latch_api()
+
+    async def test_client_is_reused_in_loop(self):
+        """
+        Consecutive calls in the same event loop return the same client,
+        until it is closed.
+        """
+
+        from django_latch import aget_latch_api, async_latch_api_registry
+
+        latch_api = await aget_latch_api()
+        self.assertIs(latch_api, await aget_latch_api())
+        await async_latch_api_registry.aclose()
+        self.assertIsNot(latch_api, await aget_latch_api())
@@ -4,12 +4,27 @@ Tests for the behaviour of the backends that use the Latch service.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
-from unittest.mock import patch, Mock
-from django.test import TestCase
+import time
+from unittest import skipIf
+from unittest.mock import patch, AsyncMock, Mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.core.exceptions import PermissionDenied
 from django.utils.crypto import get_random_string
+from django.utils.version import get_complete_version as django_version
+
+from latch_sdk.exceptions import LatchError
 
-from django_latch.backends import can_pass_latch, LatchDefaultModelBackend
+from django_latch.backends import (
+    acan_pass_latch,
+    can_pass_latch,
+    LatchDefaultModelBackend,
+)
+from django_latch.cache import get_status_cache
+from django_latch.models import ais_paired, is_paired
 
 from .base import CreateLatchConfigMixin, mock_status_true, mock_status_false
 
@@ -73,3 +88,272 @@ class LatchBackendTestCase(CreateLatchConfigMixin, TestCase):
         """
 
         self.assertTrue(LatchDefaultModelBackend().user_can_authenticate(self.user))
+
+    def test_get_user_fetches_latch_config(self):
+        """
+        The user of a session is fetched along with its latch configuration
+        in a single query.
+        """
+
+        with self.assertNumQueries(1):
+            user = LatchDefaultModelBackend().get_user(self.user.pk)
+            self.assertTrue(is_paired(user))
+            self.assertEqual(user.latch_config, self.latch_config)
+
+    def test_get_user_unpaired(self):
+        """
+        Users without the Latch configured are known to be unpaired after
+        fetching them.
+        """
+
+        unpaired = get_user_model().objects.create_user(username="bob")
+        with self.assertNumQueries(1):
+            user = LatchDefaultModelBackend().get_user(unpaired.pk)
+            self.assertFalse(is_paired(user))
+
+
+class AsyncLatchBackendTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for the asynchronous methods of the backends.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_status",
+        new=AsyncMock(return_value=mock_status_true),
+    )
+    async def test_can_pass_latch_when_on(self):
+        """
+        A user whose account_id returns an on status can authenticate.
+        """
+
+        self.assertTrue(await acan_pass_latch(self.user))
+
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_status",
+        new=AsyncMock(return_value=mock_status_false),
+    )
+    async def test_can_pass_latch_when_off(self):
+        """
+        A user whose account_id returns an off status cannot authenticate.
+        """
+
+        self.assertFalse(await acan_pass_latch(self.user))
+
+    @skipIf(django_version() < (5, 2), "Backends are async since Django 5.2")
+    @patch("latch_sdk.syncio.LatchSDK.account_status")
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_status",
+        new=AsyncMock(return_value=mock_status_false),
+    )
+    async def test_cannot_aauthenticate(self, sync_account_status):
+        """
+        If the latch is set, then ``aauthenticate`` must raise a
+        ``PermissionDenied`` exception without using the synchronous client.
+        """
+
+        with self.assertRaises(PermissionDenied):
+            await LatchDefaultModelBackend().aauthenticate(
+                None,
+                username=self.user.username,
+                password=self.valid_data()["raw_password"],
+            )
+        sync_account_status.assert_not_called()
+
+    @skipIf(django_version() < (5, 2), "Backends are async since Django 5.2")
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_status",
+        new=AsyncMock(return_value=mock_status_true),
+    )
+    async def test_can_aauthenticate(self):
+        """
+        If the latch is not set, then the user can authenticate asynchronously.
+        """
+
+        user = await LatchDefaultModelBackend().aauthenticate(
+            None,
+            username=self.user.username,
+            password=self.valid_data()["raw_password"],
+        )
+        self.assertEqual(user, self.user)
+
+    @patch("latch_sdk.asyncio.LatchSDK.account_status")
+    async def test_aget_user(self, account_status):
+        """
+        Getting the user of an existing session doesn't check the latch.
+        """
+
+        user = await LatchDefaultModelBackend().aget_user(self.user.pk)
+        self.assertEqual(user, self.user)
+        account_status.assert_not_called()
+        with patch("django_latch.models.LatchUserConfig.objects") as objects:
+            self.assertTrue(await ais_paired(user))
+        objects.filter.assert_not_called()
+
+
+@override_settings(
+    LATCH_STATUS_CACHE="default",
+    LATCH_STATUS_CACHE_OPEN_TTL=5,
+    LATCH_STATUS_CACHE_CLOSED_TTL=0,
+)
+class StatusCacheTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for the cache of the latch status.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """
+        Every test starts with an empty cache.
+        """
+
+        super().setUp()
+        cache.clear()
+
+    def test_open_status_is_cached(self):
+        """
+        An open status is taken from the cache once fetched.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            self.assertTrue(can_pass_latch(self.user))
+            self.assertTrue(can_pass_latch(self.user))
+        account_status.assert_called_once()
+
+    def test_closed_status_is_not_cached(self):
+        """
+        A closed status whose time to live is 0 is always fetched.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_false
+        ) as account_status:
+            self.assertFalse(can_pass_latch(self.user))
+            self.assertFalse(can_pass_latch(self.user))
+        self.assertEqual(account_status.call_count, 2)
+
+    @override_settings(LATCH_STATUS_CACHE=None)
+    def test_disabled(self):
+        """
+        Without the ``LATCH_STATUS_CACHE`` setting the status is always fetched.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            can_pass_latch(self.user)
+            can_pass_latch(self.user)
+        self.assertEqual(account_status.call_count, 2)
+
+    async def test_async_open_status_is_cached(self):
+        """
+        The asynchronous check shares the cache with the synchronous one.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ):
+            await sync_to_async(can_pass_latch)(self.user)
+        with patch("latch_sdk.asyncio.LatchSDK.account_status") as account_status:
+            self.assertTrue(await acan_pass_latch(self.user))
+        account_status.assert_not_called()
+
+
+@override_settings(
+    LATCH_STATUS_CACHE="default",
+    LATCH_STATUS_CACHE_OPEN_TTL=5,
+    LATCH_STATUS_CACHE_STALE_WHILE_REVALIDATE=10,
+    LATCH_STATUS_CACHE_STALE_IF_ERROR=60,
+)
+class StaleStatusTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for stale statuses and failures of the Latch service.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """
+        Every test starts with an empty cache.
+        """
+
+        super().setUp()
+        cache.clear()
+
+    def cache_status(self, can_pass, age):
+        """
+        Cache a status fetched ``age`` seconds ago.
+        """
+
+        with patch("django_latch.cache.time.time", return_value=time.time() - age):
+            get_status_cache().set(self.latch_config.account_id, can_pass)
+
+    @patch("django_latch.status.status_refresher.refresh")
+    def test_stale_while_revalidate(self, refresh):
+        """
+        A stale status is returned at once while it is refreshed.
+        """
+
+        self.cache_status(True, age=8)
+        with patch("latch_sdk.syncio.LatchSDK.account_status") as account_status:
+            self.assertTrue(can_pass_latch(self.user))
+        account_status.assert_not_called()
+        refresh.assert_called_once_with(self.latch_config.account_id)
+
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_status",
+        new=Mock(side_effect=LatchError("", "")),
+    )
+    def test_stale_if_error(self):
+        """
+        A stale status is returned if the Latch service fails.
+        """
+
+        self.cache_status(False, age=30)
+        self.assertFalse(can_pass_latch(self.user))
+
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_status",
+        new=Mock(side_effect=LatchError("", "")),
+    )
+    def test_failure_policy(self):
+        """
+        Without a usable cached status, the failure policy is applied.
+        """
+
+        self.cache_status(True, age=100)
+        for policy, can_pass in [("allow", True), ("deny", False)]:
+            with self.subTest(policy=policy):
+                with self.settings(LATCH_FAILURE_POLICY=policy):
+                    self.assertIs(can_pass_latch(self.user), can_pass)
+
+        with self.assertRaises(LatchError):
+            can_pass_latch(self.user)
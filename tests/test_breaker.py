@@ -0,0 +1,277 @@
+"""
+Tests for the circuit breaker around the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import AsyncMock, Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.crypto import get_random_string
+
+from latch_sdk.exceptions import LatchError
+
+from django_latch.backends import acan_pass_latch, can_pass_latch
+from django_latch.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    get_circuit_breaker,
+)
+from django_latch.exceptions import CircuitOpenError
+from django_latch.status import last_known_statuses
+
+from .base import CreateLatchConfigMixin, mock_status_true
+
+
+def failing():
+    """
+    Fail as if the Latch service couldn't be reached.
+    """
+
+    raise ConnectionRefusedError
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    """
+    Tests for the states of the circuit breaker.
+    """
+
+    def setUp(self):
+        """Use a new circuit breaker in every test."""
+        self.breaker = CircuitBreaker(window=4, min_calls=4, error_rate=0.5)
+
+    def fail_calls(self, breaker, times):
+        """
+        Make ``times`` failing calls through ``breaker``.
+        """
+
+        for _ in range(times):
+            with self.assertRaises(ConnectionRefusedError):
+                breaker.call(failing)
+
+    def test_opens_on_error_rate(self):
+        """
+        The circuit opens once the ratio of failed calls reaches the
+        threshold, and then rejects the calls without making them.
+        """
+
+        self.breaker.call(lambda: True)
+        self.breaker.call(lambda: True)
+        self.fail_calls(self.breaker, 1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail_calls(self.breaker, 1)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        func = Mock()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(func)
+        func.assert_not_called()
+
+    def test_min_calls(self):
+        """
+        The circuit isn't opened before the minimum number of calls.
+        """
+
+        self.fail_calls(self.breaker, 3)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_latch_errors_are_not_failures(self):
+        """
+        The errors answered by the Latch service don't open the circuit.
+        """
+
+        def not_paired():
+            """Fail as an unpaired account."""
+            raise LatchError(201, "Account not paired")
+
+        for _ in range(4):
+            with self.assertRaises(LatchError):
+                self.breaker.call(not_paired)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_slow_calls_are_failures(self):
+        """
+        Calls slower than the threshold count as failures.
+        """
+
+        breaker = CircuitBreaker(window=2, min_calls=2, slow_call=1)
+        with patch("django_latch.breaker.time.perf_counter", side_effect=[0, 2] * 2):
+            breaker.call(lambda: True)
+            breaker.call(lambda: True)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_half_open_probe(self):
+        """
+        After the open time, a single call probes the Latch service and
+        closes the circuit if it succeeds.
+        """
+
+        with patch("django_latch.breaker.time.monotonic", return_value=0):
+            self.fail_calls(self.breaker, 4)
+        with patch("django_latch.breaker.time.monotonic", return_value=31):
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+
+            def probe():
+                """Check that the rest of calls are rejected."""
+                # Other calls are rejected while the probe is in flight.
+                with self.assertRaises(CircuitOpenError):
+                    self.breaker.call(Mock())
+                return True
+
+            self.assertTrue(self.breaker.call(probe))
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_opens(self):
+        """
+        If the probe fails, the circuit opens again.
+        """
+
+        with patch("django_latch.breaker.time.monotonic", return_value=0):
+            self.fail_calls(self.breaker, 4)
+        with patch("django_latch.breaker.time.monotonic", return_value=31):
+            self.fail_calls(self.breaker, 1)
+            self.assertEqual(self.breaker.state, OPEN)
+
+    def test_shared_through_cache(self):
+        """
+        The opening is shared with the breakers of other processes through
+        the cache.
+        """
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        breaker = CircuitBreaker(window=4, min_calls=4, cache_alias="default")
+        other = CircuitBreaker(window=4, min_calls=4, cache_alias="default")
+
+        self.fail_calls(breaker, 4)
+        func = Mock()
+        with self.assertRaises(CircuitOpenError):
+            other.call(func)
+        func.assert_not_called()
+
+    async def test_async_call(self):
+        """
+        Coroutines are also guarded by the circuit breaker.
+        """
+
+        async def afailing():
+            """Fail as :func:`failing`."""
+            failing()
+
+        for _ in range(4):
+            with self.assertRaises(ConnectionRefusedError):
+                await self.breaker.acall(afailing)
+        with self.assertRaises(CircuitOpenError):
+            await self.breaker.acall(AsyncMock())
+
+
+@override_settings(
+    LATCH_CIRCUIT_BREAKER=True,
+    LATCH_CIRCUIT_BREAKER_WINDOW=4,
+    LATCH_CIRCUIT_BREAKER_MIN_CALLS=4,
+)
+class CircuitBreakerPolicyTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for the latch check while the circuit is open.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """Start every test with a closed circuit and no known statuses."""
+        super().setUp()
+        get_circuit_breaker().reset()
+        last_known_statuses.clear()
+        self.addCleanup(last_known_statuses.clear)
+
+    def open_circuit(self):
+        """
+        Open the circuit breaker of the process.
+        """
+
+        breaker = get_circuit_breaker()
+        while breaker.state != OPEN:
+            with self.assertRaises(ConnectionRefusedError):
+                breaker.call(failing)
+
+    def test_shared(self):
+        """
+        The circuit breaker of the process is created once, and returned
+        afterwards without taking the lock.
+        """
+
+        breaker = get_circuit_breaker()
+        with patch("django_latch.breaker._breaker_lock") as lock:
+            self.assertIs(get_circuit_breaker(), breaker)
+        lock.__enter__.assert_not_called()
+
+    def test_disabled_by_default(self):
+        """
+        There isn't any circuit breaker without the setting.
+        """
+
+        with self.settings(LATCH_CIRCUIT_BREAKER=False):
+            self.assertIsNone(get_circuit_breaker())
+
+    @override_settings(LATCH_FAILURE_POLICY="deny")
+    def test_deny_when_open(self):
+        """
+        While the circuit is open, the failure policy is applied without
+        calling the Latch service.
+        """
+
+        self.open_circuit()
+        with patch("latch_sdk.syncio.LatchSDK.account_status") as account_status:
+            self.assertFalse(can_pass_latch(self.user))
+        account_status.assert_not_called()
+
+    @override_settings(LATCH_FAILURE_POLICY="last-known")
+    def test_last_known_when_open(self):
+        """
+        With the 'last-known' policy, the last status fetched is used while
+        the circuit is open.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ):
+            self.assertTrue(can_pass_latch(self.user))
+        self.open_circuit()
+        with patch("latch_sdk.syncio.LatchSDK.account_status") as account_status:
+            self.assertTrue(can_pass_latch(self.user))
+        account_status.assert_not_called()
+
+    @override_settings(LATCH_FAILURE_POLICY="last-known")
+    def test_last_known_without_status(self):
+        """
+        With the 'last-known' policy, the error is raised if the status has
+        never been fetched.
+        """
+
+        self.open_circuit()
+        with self.assertRaises(CircuitOpenError):
+            can_pass_latch(self.user)
+
+    @override_settings(LATCH_FAILURE_POLICY="allow")
+    async def test_async_allow_when_open(self):
+        """
+        The policy is also applied by the asynchronous check.
+        """
+
+        self.open_circuit()
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status", new_callable=AsyncMock
+        ) as account_status:
+            self.assertTrue(await acan_pass_latch(self.user))
+        account_status.assert_not_called()
@@ -40,6 +40,88 @@ class LatchSettingsCheckTest(SimpleTestCase):
         with self.assertRaisesMessage(SystemCheckError, message):
             call_command("check")
 
+    @override_settings(LATCH_FAILURE_POLICY="ignore")
+    def test_invalid_failure_policy(self):
+        """
+        LATCH_FAILURE_POLICY must be one of the valid policies.
+        """
+
+        message = (
+            "(django_latch.E107) 'LATCH_FAILURE_POLICY' cannot be 'ignore', the only "
+            "valid values are 'raise', 'allow', 'deny' or 'last-known'."
+        )
+        with self.assertRaisesMessage(SystemCheckError, message):
+            call_command("check")
+
+
+class URLPoliciesCheckTest(SimpleTestCase):
+    """Tests for the validation of LATCH_URL_POLICIES."""
+
+    @override_settings(LATCH_URL_POLICIES={"prefix": "/static/"})
+    def test_not_a_list(self):
+        """
+        LATCH_URL_POLICIES must be a list.
+        """
+
+        message = "(django_latch.E108) 'LATCH_URL_POLICIES' must be a list or a tuple."
+        with self.assertRaisesMessage(SystemCheckError, message):
+            call_command("check")
+
+    @override_settings(
+        LATCH_URL_POLICIES=[{"prefix": "/static/", "url_name": "static"}]
+    )
+    def test_prefix_and_url_name(self):
+        """
+        Every policy must have either a prefix or a URL name.
+        """
+
+        message = (
+            "(django_latch.E108) 'LATCH_URL_POLICIES[0]' must be a dictionary with "
+            "a 'prefix' or a 'url_name'."
+        )
+        with self.assertRaisesMessage(SystemCheckError, message):
+            call_command("check")
+
+    @override_settings(LATCH_URL_POLICIES=[{"prefix": "static/", "policy": "exempt"}])
+    def test_relative_prefix(self):
+        """
+        The prefixes must start with a slash.
+        """
+
+        message = (
+            "(django_latch.E108) The 'prefix' of 'LATCH_URL_POLICIES[0]' must "
+            "start with '/'."
+        )
+        with self.assertRaisesMessage(SystemCheckError, message):
+            call_command("check")
+
+    @override_settings(LATCH_URL_POLICIES=[{"url_name": "home", "policy": "never"}])
+    def test_invalid_policy(self):
+        """
+        The policy must be one of the valid ones.
+        """
+
+        message = (
+            "(django_latch.E109) The 'policy' of 'LATCH_URL_POLICIES[0]' cannot be "
+            "'never', the only valid values are 'exempt', 'cached', 'always' or "
+            "'operation'."
+        )
+        with self.assertRaisesMessage(SystemCheckError, message):
+            call_command("check")
+
+    @override_settings(LATCH_URL_POLICIES=[{"url_name": "home", "policy": "operation"}])
+    def test_operation_without_operations(self):
+        """
+        The operation policy must have some operations.
+        """
+
+        message = (
+            "(django_latch.E110) 'LATCH_URL_POLICIES[0]' must have the 'operations' "
+            "checked by its policy."
+        )
+        with self.assertRaisesMessage(SystemCheckError, message):
+            call_command("check")
+
 
 class DependenciesCheckTest(SimpleTestCase):
     """Tests for dependecy checks."""
@@ -0,0 +1,177 @@
+"""
+Tests for the hedged requests to the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import itertools
+import threading
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase, override_settings
+
+from django_latch.budget import TokenBucket
+from django_latch.hedging import Hedger, hedge
+from django_latch.timing import latency_histogram
+
+
+@override_settings(LATCH_HEDGE_BUDGET=1)
+class HedgerTestCase(SimpleTestCase):
+    """
+    Tests for the hedging of slow requests.
+    """
+
+    def setUp(self):
+        """Use a new hedger, with its own budget and latencies."""
+        self.hedger = Hedger(min_samples=5)
+
+    def record_latencies(self):
+        """
+        Record enough latencies for the requests to be hedged after 10ms.
+        """
+
+        for _ in range(5):
+            self.hedger.latencies.record(0.01)
+
+    def slow_then_fast(self):
+        """
+        Return a function whose first call blocks until the returned event
+        is set, while the rest answer at once.
+        """
+
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = itertools.count()
+
+        def func():
+            """Block on the first call only."""
+            if next(calls) == 0:
+                release.wait(5)
+                return "first"
+            return "hedge"
+
+        return func, release
+
+    def test_not_hedged_without_latencies(self):
+        """
+        Requests are not hedged until enough latencies are recorded.
+        """
+
+        func = Mock(return_value=True)
+        self.assertTrue(self.hedger.call(func))
+        func.assert_called_once()
+
+    @override_settings(LATCH_HEDGE_BUDGET=0)
+    def test_inline_without_budget(self):
+        """
+        While no hedge can be sent, the request is made in the caller.
+        """
+
+        self.hedger.budget = TokenBucket(initial=0)
+        self.record_latencies()
+        threads = []
+        self.hedger.call(lambda: threads.append(threading.current_thread()))
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_own_latencies(self):
+        """
+        The hedger records the latency of every request it makes, and
+        ignores the latencies recorded for the rest of requests.
+        """
+
+        latency_histogram.clear()
+        self.addCleanup(latency_histogram.clear)
+        for _ in range(5):
+            latency_histogram.record(10)
+        self.assertIsNone(self.hedger.get_delay())
+        for _ in range(5):
+            self.hedger.call(Mock(return_value=True))
+        self.assertEqual(len(self.hedger.latencies), 5)
+        self.assertLess(self.hedger.get_delay(), 10)
+
+    def test_fast_request_not_hedged(self):
+        """
+        A request answered before the delay is not hedged.
+        """
+
+        self.record_latencies()
+        func = Mock(return_value=True)
+        self.assertTrue(self.hedger.call(func))
+        func.assert_called_once()
+
+    def test_slow_request_hedged(self):
+        """
+        A request not answered after the delay is hedged, and the first
+        answer wins.
+        """
+
+        self.record_latencies()
+        func, _ = self.slow_then_fast()
+        self.assertEqual(self.hedger.call(func), "hedge")
+
+    @override_settings(LATCH_HEDGE_BUDGET=0)
+    def test_budget_exhausted(self):
+        """
+        Without budget, the slow request is waited for.
+        """
+
+        self.hedger.budget = TokenBucket(initial=0)
+        self.record_latencies()
+        func, release = self.slow_then_fast()
+        threading.Timer(0.05, release.set).start()
+        self.assertEqual(self.hedger.call(func), "first")
+
+    def test_failed_request(self):
+        """
+        If a request fails, the answer of the other one is used.
+        """
+
+        self.record_latencies()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = itertools.count()
+
+        def func():
+            """Fail on the first call, once the second one has answered."""
+            if next(calls) == 0:
+                release.wait(5)
+                raise ConnectionResetError
+            release.set()
+            return "hedge"
+
+        self.assertEqual(self.hedger.call(func), "hedge")
+
+    async def test_async_slow_request_hedged(self):
+        """
+        A slow asynchronous request is hedged, and the one that loses the
+        race is cancelled.
+        """
+
+        self.record_latencies()
+        calls = itertools.count()
+        first = asyncio.get_running_loop().create_future()
+
+        async def afunc():
+            """Hang on the first call only."""
+            if next(calls) == 0:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    first.set_result("cancelled")
+                    raise
+                return "first"
+            return "hedge"
+
+        self.assertEqual(await self.hedger.acall(afunc), "hedge")
+        self.assertEqual(await first, "cancelled")
+
+    def test_disabled_by_default(self):
+        """
+        Without LATCH_HEDGE, the requests are sent once in the caller.
+        """
+
+        self.record_latencies()
+        func = Mock(return_value=True)
+        self.assertTrue(hedge(func))
+        func.assert_called_once()
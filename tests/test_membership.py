@@ -0,0 +1,290 @@
+"""
+Tests for the in-process filter of the paired users.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.crypto import get_random_string
+
+from django_latch.context import request_scope
+from django_latch.membership import (
+    BITMAP_MAX_ID,
+    Bitmap,
+    BloomFilter,
+    PairedUserFilter,
+    get_paired_user_filter,
+)
+from django_latch.models import LatchUserConfig, ais_paired, is_paired
+
+from .base import CreateLatchConfigMixin
+
+
+class BitmapTestCase(SimpleTestCase):
+    """
+    Tests for the bitmap of integers.
+    """
+
+    def test_membership(self):
+        """
+        Only the added integers are members, and the bitmap grows as
+        needed.
+        """
+
+        bitmap = Bitmap(16)
+        for value in (0, 7, 16, 1000):
+            bitmap.add(value)
+        self.assertEqual([value in bitmap for value in (0, 7, 16, 1000)], [True] * 4)
+        self.assertEqual([value in bitmap for value in (1, 8, 999, 5000)], [False] * 4)
+        self.assertEqual(bitmap.nbytes, 126)
+
+        bitmap.discard(7)
+        bitmap.discard(10**6)
+        self.assertNotIn(7, bitmap)
+        self.assertIn(0, bitmap)
+
+    def test_negative(self):
+        """
+        Negative integers are always reported as members.
+        """
+
+        self.assertIn(-1, Bitmap())
+
+    def test_too_large(self):
+        """
+        Integers larger than BITMAP_MAX_ID are rejected without growing the
+        bitmap.
+        """
+
+        bitmap = Bitmap()
+        with self.assertRaises(ValueError):
+            bitmap.add(2**63)
+        self.assertEqual(bitmap.nbytes, 1)
+
+
+class BloomFilterTestCase(SimpleTestCase):
+    """
+    Tests for the Bloom filter.
+    """
+
+    def test_membership(self):
+        """
+        Added values are always members and the rest rarely are.
+        """
+
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for value in range(1000):
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in range(1000)))
+        false_positives = sum(value in bloom for value in range(1000, 11000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(LATCH_PAIRED_USER_FILTER="default")
+class PairedUserFilterTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for skipping the lookups of the unpaired users.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an unpaired user besides the paired one."""
+        super().setUpTestData()
+        cls.unpaired = get_user_model().objects.create_user(username="bob")
+
+    def setUp(self):
+        """Start every test with an empty cache and a filter to build."""
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.filter = get_paired_user_filter()
+        self.filter.invalidate()
+
+    def fresh(self, user):
+        """
+        Return a new instance of ``user``, without its relations cached.
+        """
+
+        return get_user_model().objects.get(pk=user.pk)
+
+    def pair(self, user):
+        """
+        Pair ``user``, committing the change.
+        """
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return LatchUserConfig.objects.create(
+                user=user, account_id=get_random_string(64)
+            )
+
+    def test_unpaired_not_queried(self):
+        """
+        Once the filter is built, unpaired users aren't looked up.
+        """
+
+        user = self.fresh(self.unpaired)
+        with self.assertNumQueries(2):
+            self.assertFalse(is_paired(user))
+        user = self.fresh(self.unpaired)
+        with self.assertNumQueries(0):
+            self.assertFalse(is_paired(user))
+
+    def test_paired_queried(self):
+        """
+        Paired users are looked up as usual.
+        """
+
+        self.assertFalse(is_paired(self.fresh(self.unpaired)))
+        user = self.fresh(self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_paired(user))
+
+    def test_pairing_applied(self):
+        """
+        A pairing is applied to the filter without building it again.
+        """
+
+        self.assertFalse(is_paired(self.fresh(self.unpaired)))
+        self.pair(self.unpaired)
+        user = self.fresh(self.unpaired)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_paired(user))
+
+    def test_unpairing_applied(self):
+        """
+        An unpairing is applied to the filter without building it again.
+        """
+
+        self.assertFalse(is_paired(self.fresh(self.unpaired)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.latch_config.delete()
+        user = self.fresh(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(is_paired(user))
+
+    def test_changes_of_other_processes(self):
+        """
+        The changes recorded by other processes are applied.
+        """
+
+        self.assertFalse(is_paired(self.fresh(self.unpaired)))
+        other = PairedUserFilter("default")
+        with patch(
+            "django_latch.membership.get_paired_user_filter", return_value=other
+        ):
+            self.pair(self.unpaired)
+        self.assertTrue(self.filter.might_be_paired(self.unpaired.pk))
+
+    def test_missing_changes(self):
+        """
+        If the changes are no longer in the cache, the filter is built
+        again.
+        """
+
+        self.assertFalse(is_paired(self.fresh(self.unpaired)))
+        with patch("django_latch.membership.get_paired_user_filter", return_value=None):
+            self.pair(self.unpaired)
+        self.filter.record_change(self.unpaired.pk, True)
+        cache.delete_many(
+            [f"{self.filter.change_key_prefix}{self.filter.get_generation()}"]
+        )
+        with self.assertNumQueries(2):
+            self.assertTrue(self.filter.might_be_paired(self.unpaired.pk))
+
+    def test_invalidate(self):
+        """
+        After invalidating it, the filter is built again.
+        """
+
+        with patch("django_latch.membership.get_paired_user_filter", return_value=None):
+            self.pair(self.unpaired)
+        self.assertTrue(self.filter.might_be_paired(self.unpaired.pk))
+        with patch("django_latch.membership.get_paired_user_filter", return_value=None):
+            LatchUserConfig.objects.filter(user=self.unpaired).delete()
+        self.filter.invalidate()
+        self.assertFalse(self.filter.might_be_paired(self.unpaired.pk))
+
+    def test_generation_read_once_per_request(self):
+        """
+        Inside a request scope, the generation is read from the cache once.
+        """
+
+        with request_scope():
+            with patch.object(
+                self.filter, "get_generation", wraps=self.filter.get_generation
+            ) as get_generation:
+                self.filter.might_be_paired(self.user.pk)
+                self.filter.might_be_paired(self.unpaired.pk)
+        get_generation.assert_called_once()
+
+    @patch("django_latch.membership.BITMAP_MAX_ID", 0)
+    def test_bloom_filter(self):
+        """
+        Users with larger ids are stored in a Bloom filter.
+        """
+
+        self.assertTrue(self.filter.might_be_paired(self.user.pk))
+        self.assertIsInstance(self.filter._members, BloomFilter)  # pylint: disable=protected-access
+
+    def test_large_id_after_build(self):
+        """
+        Pairing a user whose id doesn't fit in the bitmap makes the filter
+        be built again as a Bloom filter, in this process and in the rest.
+        """
+
+        self.assertFalse(is_paired(self.fresh(self.unpaired)))
+        other = PairedUserFilter("default")
+        self.assertTrue(other.might_be_paired(self.user.pk))
+        large = get_user_model().objects.create_user(
+            pk=BITMAP_MAX_ID + 1, username="carol"
+        )
+        self.pair(large)
+        for paired_user_filter in (self.filter, other):
+            with self.subTest(paired_user_filter=paired_user_filter):
+                self.assertTrue(paired_user_filter.might_be_paired(large.pk))
+                self.assertTrue(paired_user_filter.might_be_paired(self.user.pk))
+                self.assertIsInstance(paired_user_filter._members, BloomFilter)  # pylint: disable=protected-access
+
+    async def test_async(self):
+        """
+        The asynchronous lookups use the filter as well.
+        """
+
+        self.assertFalse(await ais_paired(await self.afresh(self.unpaired)))
+        user = await self.afresh(self.unpaired)
+        with patch("django_latch.models.LatchUserConfig.objects") as objects:
+            self.assertFalse(await ais_paired(user))
+        objects.filter.assert_not_called()
+        self.assertTrue(await ais_paired(await self.afresh(self.user)))
+
+    async def afresh(self, user):
+        """
+        Asynchronous version of :meth:`fresh`.
+        """
+
+        return await get_user_model().objects.aget(pk=user.pk)
+
+    @override_settings(LATCH_PAIRED_USER_FILTER=None)
+    def test_disabled(self):
+        """
+        Without LATCH_PAIRED_USER_FILTER, every user is looked up.
+        """
+
+        self.assertIsNone(get_paired_user_filter())
+        user = self.fresh(self.unpaired)
+        with self.assertNumQueries(1):
+            self.assertFalse(is_paired(user))
@@ -0,0 +1,167 @@
+"""
+Tests for the metrics of the requests to the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import AsyncMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.crypto import get_random_string
+from latch_sdk.exceptions import LatchError
+
+from django_latch import aget_latch_api, get_latch_api
+from django_latch.backends import can_pass_latch
+from django_latch.metrics import Histogram, metrics
+from django_latch.views import LatchMetricsView
+
+from .base import CreateLatchConfigMixin, mock_status_true
+
+
+class HistogramTestCase(SimpleTestCase):
+    """
+    Tests for the latency histograms.
+    """
+
+    def test_cumulative(self):
+        """
+        Every bucket counts the latencies less than or equal to its upper
+        bound.
+        """
+
+        histogram = Histogram((0.1, 1))
+        for seconds in (0.05, 0.1, 0.5, 3):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1, 3), (float("inf"), 4)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+
+class MetricsTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for recording the metrics.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """Start every test without recorded metrics or cached statuses."""
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_latency(self, account_status):  # pylint: disable=unused-argument
+        """
+        The latency of every call to the client is recorded per method.
+        """
+
+        get_latch_api().account_status(self.latch_config.account_id)
+        get_latch_api().account_status(self.latch_config.account_id)
+        latency = metrics.snapshot()["latency"]
+        self.assertEqual(list(latency), ["account_status"])
+        self.assertEqual(latency["account_status"]["count"], 2)
+        self.assertEqual(latency["account_status"]["buckets"][-1][1], 2)
+
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_unpair",
+        side_effect=LatchError(201, "Account not paired"),
+    )
+    def test_errors(self, account_unpair):  # pylint: disable=unused-argument
+        """
+        The errors are counted per method and code.
+        """
+
+        with self.assertRaises(LatchError):
+            get_latch_api().account_unpair(self.latch_config.account_id)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["errors"], {("account_unpair", "201"): 1})
+        self.assertEqual(snapshot["latency"]["account_unpair"]["count"], 1)
+
+    async def test_async_client(self):
+        """
+        The calls to the asynchronous client are recorded as well, including
+        the latency of the failed ones.
+        """
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new_callable=AsyncMock,
+            side_effect=[mock_status_true, TimeoutError()],
+        ):
+            latch_api = await aget_latch_api()
+            await latch_api.account_status(self.latch_config.account_id)
+            with self.assertRaises(TimeoutError):
+                await latch_api.account_status(self.latch_config.account_id)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["latency"]["account_status"]["count"], 2)
+        self.assertEqual(snapshot["errors"], {("account_status", "TimeoutError"): 1})
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_decoys(self, account_status):  # pylint: disable=unused-argument
+        """
+        The decoys run for unpaired users are counted.
+        """
+
+        user = get_user_model().objects.create_user(username="bob")
+        self.assertTrue(can_pass_latch(user))
+        self.assertTrue(can_pass_latch(self.user))
+        self.assertEqual(metrics.snapshot()["decoys"], 1)
+
+    @override_settings(LATCH_STATUS_CACHE="default")
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_cache(self, account_status):  # pylint: disable=unused-argument
+        """
+        The hits and misses of the cached statuses are counted.
+        """
+
+        for _ in range(4):
+            can_pass_latch(self.user)
+        self.assertEqual(
+            metrics.snapshot()["cache"],
+            {"account_status": {"hits": 3, "misses": 1, "hit_ratio": 0.75}},
+        )
+
+    @override_settings(LATCH_STATUS_CACHE="default")
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_view(self, account_status):  # pylint: disable=unused-argument
+        """
+        The view exports the metrics in the Prometheus text format.
+        """
+
+        can_pass_latch(self.user)
+        response = LatchMetricsView.as_view()(RequestFactory().get("/metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        content = response.content.decode()
+        self.assertIn(
+            "# TYPE django_latch_request_duration_seconds histogram\n", content
+        )
+        self.assertIn(
+            'django_latch_request_duration_seconds_bucket{method="account_status",'
+            'le="+Inf"} 1\n',
+            content,
+        )
+        self.assertIn(
+            'django_latch_request_duration_seconds_count{method="account_status"} 1\n',
+            content,
+        )
+        self.assertIn("django_latch_decoys_total 0\n", content)
+        self.assertIn(
+            'django_latch_cache_lookups_total{cache="account_status",result="miss"} 1\n',
+            content,
+        )
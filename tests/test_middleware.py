@@ -0,0 +1,489 @@
+"""
+Tests for the middlewares.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import patch, AsyncMock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils.crypto import get_random_string
+from latch_sdk.exceptions import LatchError
+from latch_sdk.models import Status
+
+from django_latch.backends import acan_pass_latch, can_pass_latch
+from django_latch.context import get_remaining_time
+from django_latch.middleware import (
+    CHECKED_AT_SESSION_KEY,
+    LatchDeadlineMiddleware,
+    LatchEnforcementMiddleware,
+    LatchRequestScopeMiddleware,
+)
+from django_latch.policies import URLPolicy, URLPolicyTable
+
+from .base import CreateLatchConfigMixin, mock_status_false, mock_status_true
+
+
+class LatchRequestScopeMiddlewareTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for the memoization of the Latch lookups during a request.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def fresh_user(self):
+        """
+        Return a new instance of the user, without its relations cached.
+        """
+
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_lookups_done_once(self):
+        """
+        Checking the latch several times during a request fetches the
+        configuration and the status once.
+        """
+
+        users = [self.fresh_user(), self.fresh_user()]
+
+        def view(request):  # pylint: disable=unused-argument
+            """Check every user, with a single query for their configs."""
+            with self.assertNumQueries(1):
+                for user in users:
+                    self.assertTrue(can_pass_latch(user))
+            return HttpResponse()
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            LatchRequestScopeMiddleware(view)(RequestFactory().get("/"))
+        account_status.assert_called_once()
+
+    def test_outside_request(self):
+        """
+        Outside a request every check fetches the status.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            can_pass_latch(self.user)
+            can_pass_latch(self.user)
+        self.assertEqual(account_status.call_count, 2)
+
+    async def test_async_lookups_done_once(self):
+        """
+        In asynchronous mode the status is also fetched once per request.
+        """
+
+        async def view(request):  # pylint: disable=unused-argument
+            """Check the user twice."""
+            self.assertTrue(await acan_pass_latch(self.user))
+            self.assertTrue(await acan_pass_latch(self.user))
+            return HttpResponse()
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(return_value=mock_status_true),
+        ) as account_status:
+            await LatchRequestScopeMiddleware(view)(RequestFactory().get("/"))
+        account_status.assert_awaited_once()
+
+
+class LatchDeadlineMiddlewareTestCase(SimpleTestCase):
+    """
+    Tests for the deadline of the Latch calls of a request.
+    """
+
+    def remaining_time_view(self, request):  # pylint: disable=unused-argument
+        """
+        Return the time left until the deadline in the response.
+        """
+
+        return HttpResponse(repr(get_remaining_time()))
+
+    @override_settings(LATCH_REQUEST_DEADLINE=2)
+    def test_deadline(self):
+        """
+        The Latch calls of a request have the deadline of the setting.
+        """
+
+        response = LatchDeadlineMiddleware(self.remaining_time_view)(
+            RequestFactory().get("/")
+        )
+        self.assertLessEqual(float(response.content), 2)
+        self.assertGreater(float(response.content), 0)
+        self.assertIsNone(get_remaining_time())
+
+    def test_without_deadline(self):
+        """
+        Without the setting there isn't any deadline.
+        """
+
+        response = LatchDeadlineMiddleware(self.remaining_time_view)(
+            RequestFactory().get("/")
+        )
+        self.assertEqual(response.content, b"None")
+
+    @override_settings(LATCH_REQUEST_DEADLINE=2)
+    async def test_async_deadline(self):
+        """
+        The deadline is also set in asynchronous mode.
+        """
+
+        async def view(request):
+            """Return the remaining time, as :meth:`remaining_time_view`."""
+            return self.remaining_time_view(request)
+
+        response = await LatchDeadlineMiddleware(view)(RequestFactory().get("/"))
+        self.assertLessEqual(float(response.content), 2)
+
+
+class LatchEnforcementMiddlewareTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for checking the latch of the logged in users.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """Log the user in, keeping its session."""
+        super().setUp()
+        self.client.force_login(self.user)
+        self.session = self.client.session
+
+    def make_request(self, path="/"):
+        """
+        Return a request of the user sharing the session with the previous
+        ones.
+        """
+
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        request.session = self.session
+        request.user = self.user
+        request.auser = AsyncMock(return_value=self.user)
+        return request
+
+    def view(self, request):
+        """
+        Return whether the user of ``request`` is still authenticated.
+        """
+
+        return HttpResponse(repr(request.user.is_authenticated))
+
+    async def aview(self, request):
+        """
+        Asynchronous version of :meth:`view`.
+        """
+
+        user = await request.auser()
+        return HttpResponse(repr(user.is_authenticated))
+
+    def get(self, path="/"):
+        """
+        Handle a request of ``path`` through the middleware, as Django does.
+        """
+
+        request = self.make_request(path)
+        middleware = LatchEnforcementMiddleware(self.view)
+        middleware.process_view(request, self.view, (), {})
+        return middleware(request)
+
+    async def aget(self, path="/"):
+        """
+        Asynchronous version of :meth:`get`.
+        """
+
+        request = await sync_to_async(self.make_request)(path)
+        middleware = LatchEnforcementMiddleware(self.aview)
+        await middleware.process_view(request, self.aview, (), {})
+        return await middleware(request)
+
+    def test_checked_once_per_interval(self):
+        """
+        The latch is checked on the first request and again once the
+        interval has passed.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            for _ in range(3):
+                self.assertEqual(self.get().content, b"True")
+            account_status.assert_called_once()
+            with patch(
+                "django_latch.middleware.time.time",
+                return_value=self.session[CHECKED_AT_SESSION_KEY] + 60,
+            ):
+                self.get()
+        self.assertEqual(account_status.call_count, 2)
+
+    def test_closed_latch(self):
+        """
+        If the latch has been closed, the user is logged out.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_false
+        ):
+            self.assertEqual(self.get().content, b"False")
+        self.assertNotIn("_auth_user_id", self.session)
+
+    @override_settings(LATCH_ENFORCEMENT_INTERVAL=0)
+    def test_every_request(self):
+        """
+        With an interval of 0, the latch is checked on every request.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            self.get()
+            self.get()
+        self.assertEqual(account_status.call_count, 2)
+
+    def test_unavailable(self):
+        """
+        If the Latch service is unavailable, the error is logged and the
+        user keeps the session, which isn't checked again until the next
+        interval.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            side_effect=LatchError(500, "Internal error"),
+        ) as account_status:
+            with self.assertLogs("django_latch.middleware", "WARNING") as logs:
+                for _ in range(3):
+                    self.assertEqual(self.get().content, b"True")
+        account_status.assert_called_once()
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("_auth_user_id", self.session)
+
+    @override_settings(
+        LATCH_URL_POLICIES=[
+            {"url_name": "home", "policy": "operation", "operations": ["transfer"]}
+        ]
+    )
+    def test_unavailable_operation(self):
+        """
+        If the Latch service is unavailable, the views of the operation
+        policy are forbidden without logging the user out.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            side_effect=LatchError(500, "Internal error"),
+        ):
+            with self.assertLogs("django_latch.middleware", "WARNING"):
+                with self.assertRaises(PermissionDenied):
+                    self.get()
+        self.assertIn("_auth_user_id", self.session)
+
+    @override_settings(LATCH_URL_POLICIES=[{"prefix": "/", "policy": "always"}])
+    def test_unpaired(self):
+        """
+        The latch of unpaired users isn't checked, and no decoy is run for
+        them.
+        """
+
+        self.user = get_user_model().objects.create_user(username="bob")
+        self.client.force_login(self.user)
+        self.session = self.client.session
+        with patch("latch_sdk.syncio.LatchSDK.account_status") as account_status:
+            self.assertEqual(self.get().content, b"True")
+            self.assertEqual(self.get().content, b"True")
+        account_status.assert_not_called()
+
+    def test_anonymous(self):
+        """
+        The latch isn't checked for anonymous users.
+        """
+
+        request = self.make_request()
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+        with patch("latch_sdk.syncio.LatchSDK.account_status") as account_status:
+            LatchEnforcementMiddleware(self.view).process_view(
+                request, self.view, (), {}
+            )
+        account_status.assert_not_called()
+
+    @override_settings(
+        LATCH_URL_POLICIES=[
+            {"prefix": "/pair-latch/", "policy": "exempt"},
+            {"url_name": "django_latch_pair_complete", "policy": "always"},
+            {"prefix": "/require-", "policy": "always"},
+        ]
+    )
+    def test_url_policies(self):
+        """
+        The URL name policies take precedence over the prefix ones, which
+        can skip the check or run it on every request.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            self.get("/require-paired-view-class")
+            self.get("/require-paired-view-class")
+            self.assertEqual(account_status.call_count, 2)
+            self.get("/pair-latch/complete/")
+            self.assertEqual(account_status.call_count, 3)
+            self.get("/pair-latch/")
+            self.assertEqual(account_status.call_count, 3)
+
+    @override_settings(
+        LATCH_URL_POLICIES=[
+            {"url_name": "home", "policy": "operation", "operations": ["transfer"]}
+        ]
+    )
+    def test_operation_policy(self):
+        """
+        The operation policy forbids the access if the latch of an operation
+        is closed, without logging the user out.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            return_value=Status.build_from_dict(
+                {
+                    "operation_id": "application",
+                    "status": "on",
+                    "operations": [{"operation_id": "transfer", "status": "off"}],
+                }
+            ),
+        ):
+            with self.assertRaises(PermissionDenied):
+                self.get()
+        self.assertIn("_auth_user_id", self.session)
+
+    async def test_async(self):
+        """
+        In asynchronous mode the latch is also checked once per interval,
+        and the user is logged out if it's closed.
+        """
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(return_value=mock_status_true),
+        ) as account_status:
+            await self.aget()
+            await self.aget()
+        account_status.assert_awaited_once()
+
+        await sync_to_async(self.session.pop)(CHECKED_AT_SESSION_KEY)
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(return_value=mock_status_false),
+        ):
+            response = await self.aget()
+        self.assertEqual(response.content, b"False")
+
+    async def test_async_unavailable(self):
+        """
+        In asynchronous mode, an unavailable Latch service doesn't log the
+        user out either.
+        """
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(side_effect=LatchError(500, "Internal error")),
+        ) as account_status:
+            with self.assertLogs("django_latch.middleware", "WARNING"):
+                self.assertEqual((await self.aget()).content, b"True")
+                self.assertEqual((await self.aget()).content, b"True")
+        account_status.assert_awaited_once()
+
+    @override_settings(LATCH_URL_POLICIES=[{"prefix": "/", "policy": "always"}])
+    async def test_async_unpaired(self):
+        """
+        In asynchronous mode, no decoy is run for unpaired users either.
+        """
+
+        self.user = await get_user_model().objects.acreate(username="bob")
+        await sync_to_async(self.client.force_login)(self.user)
+        self.session = await sync_to_async(lambda: self.client.session)()
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status", new=AsyncMock()
+        ) as account_status:
+            await self.aget()
+        account_status.assert_not_awaited()
+
+    @override_settings(LATCH_URL_POLICIES=[{"prefix": "/", "policy": "exempt"}])
+    async def test_async_exempt(self):
+        """
+        In asynchronous mode, exempt URLs aren't checked either.
+        """
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status", new=AsyncMock()
+        ) as account_status:
+            await self.aget()
+        account_status.assert_not_awaited()
+
+
+class URLPolicyTableTestCase(SimpleTestCase):
+    """
+    Tests for the table of policies per URL.
+    """
+
+    def test_get_policy(self):
+        """
+        The policy of the URL name is used first, then the one of the
+        longest prefix and finally the default one.
+        """
+
+        table = URLPolicyTable(
+            [
+                {"prefix": "/static/", "policy": "exempt"},
+                {"prefix": "/static/private/", "policy": "always"},
+                {
+                    "url_name": "bank:transfer",
+                    "policy": "operation",
+                    "operations": ["t"],
+                },
+                {"prefix": "/bank/", "policy": "always"},
+            ]
+        )
+        self.assertEqual(table.get_policy("/static/app.css"), URLPolicy("exempt"))
+        self.assertEqual(table.get_policy("/static/private/a"), URLPolicy("always"))
+        self.assertEqual(table.get_policy("/stat"), URLPolicy("cached"))
+        self.assertEqual(
+            table.get_policy("/bank/transfer/", "bank:transfer"),
+            URLPolicy("operation", ("t",)),
+        )
+        self.assertEqual(table.get_policy("/bank/", "bank:home"), URLPolicy("always"))
+        self.assertEqual(table.get_policy("/other/", "other"), URLPolicy("cached"))
+
+    def test_invalid(self):
+        """
+        Invalid policies aren't compiled.
+        """
+
+        with self.assertRaises(ImproperlyConfigured):
+            URLPolicyTable([{"prefix": "static/", "policy": "exempt"}])
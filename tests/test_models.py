@@ -0,0 +1,133 @@
+"""
+Tests for the lookups of the latch configuration.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.utils.crypto import get_random_string
+
+from django_latch.backends import can_pass_latch
+from django_latch.context import request_scope
+from django_latch.models import (
+    aget_latch_config,
+    ais_paired,
+    get_latch_config,
+    is_paired,
+    set_latch_config,
+)
+from django_latch.views import UnpairLatchView
+
+from .base import CreateLatchConfigMixin, mock_status_true
+
+
+class LatchConfigLookupTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for loading the latch configuration at most once per request.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def fresh_user(self):
+        """
+        Return a new instance of the user, without its relations cached.
+        """
+
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_cached_in_instance(self):
+        """
+        The configuration is loaded once for every user instance.
+        """
+
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_latch_config(user), self.latch_config)
+            self.assertTrue(is_paired(user))
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ):
+            with self.assertNumQueries(0):
+                self.assertTrue(can_pass_latch(user))
+
+    def test_select_related(self):
+        """
+        A configuration loaded with ``select_related`` isn't queried again.
+        """
+
+        user = (
+            get_user_model().objects.select_related("latch_config").get(pk=self.user.pk)
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(get_latch_config(user), self.latch_config)
+
+    def test_shared_in_request_scope(self):
+        """
+        Inside a request scope, every instance of the user shares the
+        configuration.
+        """
+
+        users = [self.fresh_user(), self.fresh_user()]
+        with request_scope(), self.assertNumQueries(1):
+            for user in users:
+                self.assertTrue(is_paired(user))
+
+    def test_unpaired_user(self):
+        """
+        A user without configuration is looked up once as well.
+        """
+
+        user = get_user_model().objects.create_user(username="bob")
+        user = get_user_model().objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_latch_config(user))
+            self.assertFalse(is_paired(user))
+
+    def test_set_latch_config(self):
+        """
+        After unpairing, the lookups see the user as unpaired without
+        querying the database.
+        """
+
+        users = [self.fresh_user(), self.fresh_user()]
+        with request_scope():
+            self.assertTrue(is_paired(users[0]))
+            set_latch_config(users[0], None)
+            with self.assertNumQueries(0):
+                self.assertFalse(is_paired(users[0]))
+                self.assertFalse(is_paired(users[1]))
+
+    @patch("latch_sdk.syncio.LatchSDK.account_unpair", new=Mock(return_value=True))
+    def test_unpair_view_queries(self):
+        """
+        Unpairing looks up the configuration once, and then deletes it.
+        """
+
+        request = RequestFactory().post("/")
+        request.user = self.fresh_user()
+        with self.assertNumQueries(2):
+            response = UnpairLatchView.as_view()(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(is_paired(request.user))
+
+    async def test_async_lookup(self):
+        """
+        The asynchronous lookups share the same caches.
+        """
+
+        user = await get_user_model().objects.aget(pk=self.user.pk)
+        self.assertEqual(await aget_latch_config(user), self.latch_config)
+        with patch("django_latch.models.LatchUserConfig.objects") as objects:
+            self.assertTrue(await ais_paired(user))
+        objects.filter.assert_not_called()
@@ -0,0 +1,241 @@
+"""
+Tests for the latches of the operations.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import AsyncMock, patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.crypto import get_random_string
+from django.views import View
+from latch_sdk.exceptions import LatchError
+from latch_sdk.models import Status
+
+from django_latch.context import request_scope
+from django_latch.decorators import latch_operation_required
+from django_latch.mixins import LatchOperationRequiredMixin
+from django_latch.operations import (
+    acan_pass_operations,
+    can_pass_operations,
+    get_operation_statuses,
+)
+
+from .base import CreateLatchConfigMixin
+
+mock_account_status = Status.build_from_dict(
+    {
+        "operation_id": "application",
+        "status": "on",
+        "operations": [
+            {"operation_id": "transfer", "status": "on"},
+            {
+                "operation_id": "settings",
+                "status": "off",
+                "operations": [{"operation_id": "password", "status": "on"}],
+            },
+        ],
+    }
+)
+
+
+class TransferView(LatchOperationRequiredMixin, View):
+    """
+    View protected by the latch of an operation.
+    """
+
+    latch_operations = ("transfer",)
+
+    def get(self, request):  # pylint: disable=unused-argument
+        """Return an empty response."""
+        return HttpResponse()
+
+
+class AsyncSettingsView(LatchOperationRequiredMixin, View):
+    """
+    Asynchronous view protected by the latches of two operations.
+    """
+
+    latch_operations = ("transfer", "password")
+
+    async def get(self, request):  # pylint: disable=unused-argument
+        """Return an empty response."""
+        return HttpResponse()
+
+
+@latch_operation_required("transfer", "settings")
+def settings_view(request):  # pylint: disable=unused-argument
+    """Return an empty response."""
+    return HttpResponse()
+
+
+@patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_account_status)
+class OperationStatusTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for checking the latches of the operations.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """Start every test with an empty cache."""
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def make_request(self, user=None):
+        """
+        Return a request of ``user``, by default the paired one.
+        """
+
+        request = RequestFactory().get("/")
+        request.user = self.user if user is None else user
+        request.auser = AsyncMock(return_value=request.user)
+        return request
+
+    def test_nested_operations(self, account_status):
+        """
+        An operation can be passed only if the latches containing it are
+        open, and all of them are taken from a single lookup.
+        """
+
+        statuses = get_operation_statuses(
+            self.latch_config.account_id, ["transfer", "settings", "password"]
+        )
+        self.assertEqual(
+            statuses, {"transfer": True, "settings": False, "password": False}
+        )
+        account_status.assert_called_once_with(self.latch_config.account_id)
+
+    @patch("latch_sdk.syncio.LatchSDK.operation_status")
+    def test_missing_operation(self, operation_status, account_status):
+        """
+        Operations missing from the status of the account are asked for.
+        """
+
+        operation_status.return_value = Status.build_from_dict(
+            {"operation_id": "export", "status": "on"}
+        )
+        self.assertTrue(can_pass_operations(self.user, ["transfer", "export"]))
+        account_status.assert_called_once()
+        operation_status.assert_called_once_with(self.latch_config.account_id, "export")
+
+    @patch("latch_sdk.syncio.LatchSDK.operation_status")
+    def test_unknown_operation(self, operation_status, account_status):  # pylint: disable=unused-argument
+        """
+        An operation not included in the answer of the Latch service can't
+        be passed.
+        """
+
+        operation_status.return_value = Status.build_from_dict(
+            {"operation_id": "other", "status": "on"}
+        )
+        self.assertEqual(
+            get_operation_statuses(self.latch_config.account_id, ["export"]),
+            {"export": False},
+        )
+
+    def test_request_scope(self, account_status):
+        """
+        Inside a request scope, the operations already known aren't looked
+        up again.
+        """
+
+        with request_scope():
+            self.assertTrue(can_pass_operations(self.user, ["transfer"]))
+            self.assertFalse(can_pass_operations(self.user, ["password"]))
+        account_status.assert_called_once()
+
+    @override_settings(LATCH_STATUS_CACHE="default")
+    def test_status_cache(self, account_status):
+        """
+        The statuses are cached per account and operation.
+        """
+
+        self.assertTrue(can_pass_operations(self.user, ["transfer"]))
+        self.assertFalse(can_pass_operations(self.user, ["transfer", "settings"]))
+        account_status.assert_called_once()
+
+    @override_settings(LATCH_STATUS_CACHE="default", LATCH_FAILURE_POLICY="deny")
+    def test_failure(self, account_status):
+        """
+        If the Latch service fails, the failure policy is applied to the
+        operations that aren't cached.
+        """
+
+        account_status.side_effect = LatchError(500, "Internal error")
+        self.assertFalse(can_pass_operations(self.user, ["transfer"]))
+
+    def test_mixin(self, account_status):
+        """
+        The mixin forbids the access if the latch of an operation is closed.
+        """
+
+        self.assertEqual(TransferView.as_view()(self.make_request()).status_code, 200)
+        with patch.object(TransferView, "latch_operations", ("password",)):
+            with self.assertRaises(PermissionDenied):
+                TransferView.as_view()(self.make_request())
+        self.assertEqual(account_status.call_count, 2)
+
+    def test_decorator(self, account_status):
+        """
+        The decorator forbids the access if the latch of an operation is
+        closed, looking up all of them together.
+        """
+
+        with self.assertRaises(PermissionDenied):
+            settings_view(self.make_request())
+        account_status.assert_called_once()
+
+    def test_anonymous(self, account_status):
+        """
+        Anonymous users are redirected to the login page.
+        """
+
+        self.assertEqual(
+            settings_view(self.make_request(AnonymousUser())).status_code, 302
+        )
+        self.assertEqual(
+            TransferView.as_view()(self.make_request(AnonymousUser())).status_code,
+            302,
+        )
+        account_status.assert_not_called()
+
+    def test_unpaired(self, account_status):
+        """
+        Unpaired users have no latches, and no decoy is run for them.
+        """
+
+        user = get_user_model().objects.create_user(username="bob")
+        self.assertEqual(settings_view(self.make_request(user)).status_code, 200)
+        account_status.assert_not_called()
+
+    async def test_async(self, account_status):
+        """
+        Asynchronous views check the latches of the operations without
+        blocking the event loop.
+        """
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new_callable=AsyncMock,
+            return_value=mock_account_status,
+        ) as aaccount_status:
+            with self.assertRaises(PermissionDenied):
+                await AsyncSettingsView.as_view()(self.make_request())
+            self.assertTrue(await acan_pass_operations(self.user, ["transfer"]))
+        self.assertEqual(aaccount_status.call_count, 2)
+        account_status.assert_not_called()
@@ -0,0 +1,215 @@
+"""
+Tests for the retries of the reads from the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import AsyncMock, Mock, patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.crypto import get_random_string
+
+from latch_sdk.exceptions import LatchError
+
+from django_latch.backends import can_pass_latch
+from django_latch.budget import TokenBucket
+from django_latch.context import deadline
+from django_latch.retry import Retrier
+
+from .base import CreateLatchConfigMixin, mock_status_true
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    """
+    Tests for the budget of extra requests.
+    """
+
+    def test_ratio(self):
+        """
+        An extra request is allowed for every so many calls.
+        """
+
+        budget = TokenBucket(initial=0)
+        budget.deposit(0.5)
+        self.assertFalse(budget.withdraw())
+        budget.deposit(0.5)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_starts_full(self):
+        """
+        The bucket starts with ``max_tokens`` tokens.
+        """
+
+        budget = TokenBucket(max_tokens=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_max_tokens(self):
+        """
+        The unused tokens are accumulated only up to a limit.
+        """
+
+        budget = TokenBucket(max_tokens=2)
+        for _ in range(10):
+            budget.deposit(1)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+
+@override_settings(LATCH_RETRIES=2, LATCH_RETRY_BUDGET=10)
+@patch("django_latch.retry.time.sleep")
+class RetrierTestCase(SimpleTestCase):
+    """
+    Tests for the retries with backoff.
+    """
+
+    def setUp(self):
+        """Use a new retrier, with its own budget, in every test."""
+        self.retrier = Retrier()
+
+    def test_retried(self, sleep):
+        """
+        A call that fails to reach the Latch service is retried.
+        """
+
+        func = Mock(side_effect=[ConnectionResetError, True])
+        self.assertTrue(self.retrier.call(func))
+        self.assertEqual(func.call_count, 2)
+        sleep.assert_called_once()
+
+    def test_max_retries(self, sleep):
+        """
+        The call is retried up to LATCH_RETRIES times.
+        """
+
+        func = Mock(side_effect=ConnectionResetError)
+        with self.assertRaises(ConnectionResetError):
+            self.retrier.call(func)
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @override_settings(LATCH_RETRIES=0)
+    def test_disabled_by_default(self, sleep):
+        """
+        With no retries, the error is raised at once.
+        """
+
+        func = Mock(side_effect=ConnectionResetError)
+        with self.assertRaises(ConnectionResetError):
+            self.retrier.call(func)
+        func.assert_called_once()
+        sleep.assert_not_called()
+
+    def test_latch_errors_not_retried(self, sleep):  # pylint: disable=unused-argument
+        """
+        The errors answered by the Latch service are not retried.
+        """
+
+        func = Mock(side_effect=LatchError(201, "Account not paired"))
+        with self.assertRaises(LatchError):
+            self.retrier.call(func)
+        func.assert_called_once()
+
+    @override_settings(
+        LATCH_RETRIES=10, LATCH_RETRY_BASE_DELAY=0.1, LATCH_RETRY_MAX_DELAY=0.5
+    )
+    def test_decorrelated_jitter(self, sleep):
+        """
+        Every wait is between the base and three times the previous one, up
+        to the maximum.
+        """
+
+        func = Mock(side_effect=[ConnectionResetError] * 10 + [True])
+        self.retrier.call(func)
+        previous = 0.1
+        for call in sleep.call_args_list:
+            delay = call.args[0]
+            self.assertGreaterEqual(delay, 0.1)
+            self.assertLessEqual(delay, min(0.5, previous * 3))
+            previous = delay
+
+    @override_settings(LATCH_RETRY_BUDGET=0.5)
+    def test_budget(self, sleep):  # pylint: disable=unused-argument
+        """
+        Retries are not made once the budget is exhausted.
+        """
+
+        self.retrier.budget = TokenBucket(initial=0)
+        func = Mock(side_effect=ConnectionResetError)
+        with self.assertRaises(ConnectionResetError):
+            self.retrier.call(func)
+        func.assert_called_once()
+
+        with self.assertRaises(ConnectionResetError):
+            self.retrier.call(func)
+        self.assertEqual(func.call_count, 3)
+
+    @override_settings(LATCH_RETRY_BASE_DELAY=1, LATCH_RETRY_MAX_DELAY=1)
+    def test_deadline(self, sleep):
+        """
+        A retry is not made if its wait doesn't fit before the deadline.
+        """
+
+        func = Mock(side_effect=ConnectionResetError)
+        with deadline(0.5), self.assertRaises(ConnectionResetError):
+            self.retrier.call(func)
+        func.assert_called_once()
+        sleep.assert_not_called()
+
+    async def test_async_retried(self, sleep):  # pylint: disable=unused-argument
+        """
+        Coroutines are also retried.
+        """
+
+        afunc = AsyncMock(side_effect=[ConnectionResetError, True])
+        with patch("django_latch.retry.asyncio.sleep", new_callable=AsyncMock):
+            self.assertTrue(await self.retrier.acall(afunc))
+        self.assertEqual(afunc.await_count, 2)
+
+
+@override_settings(LATCH_RETRIES=1, LATCH_RETRY_BASE_DELAY=0)
+class RetriedStatusTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for the retries of the status checks.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def test_status_retried(self):
+        """
+        A status check that fails to reach the Latch service once succeeds.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            side_effect=[ConnectionResetError, mock_status_true],
+        ) as account_status:
+            with patch("django_latch.retry.retrier.budget") as budget:
+                budget.withdraw.return_value = True
+                self.assertTrue(can_pass_latch(self.user))
+        self.assertEqual(account_status.call_count, 2)
+
+    @patch("django_latch.retry.retrier", new_callable=Retrier)
+    def test_retried_at_start(self, retrier):  # pylint: disable=unused-argument
+        """
+        With the default budget, the first failed status check of the
+        process is retried.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            side_effect=[ConnectionResetError, mock_status_true],
+        ) as account_status:
+            self.assertTrue(can_pass_latch(self.user))
+        self.assertEqual(account_status.call_count, 2)
@@ -0,0 +1,242 @@
+"""
+Tests for the pairing state stored in the sessions.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+from unittest.mock import AsyncMock, Mock, patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.crypto import get_random_string
+from django.views import View
+
+from django_latch.backends import acan_pass_latch, can_pass_latch
+from django_latch.decorators import paired_user_required
+from django_latch.mixins import PairedUserRequiredMixin
+from django_latch.models import LatchUserConfig
+from django_latch.sessions import SESSION_KEY
+from django_latch.views import UnpairLatchView
+
+from .base import CreateLatchConfigMixin, mock_status_true
+
+
+class PairedView(PairedUserRequiredMixin, View):
+    """
+    View only for paired users.
+    """
+
+    def get(self, request):  # pylint: disable=unused-argument
+        """Return an empty response."""
+        return HttpResponse()
+
+
+class AsyncPairedView(PairedUserRequiredMixin, View):
+    """
+    Asynchronous view only for paired users.
+    """
+
+    async def get(self, request):  # pylint: disable=unused-argument
+        """Return an empty response."""
+        return HttpResponse()
+
+
+@paired_user_required
+def paired_view(request):  # pylint: disable=unused-argument
+    """Return an empty response."""
+    return HttpResponse()
+
+
+@override_settings(LATCH_SESSION_PAIRING="default")
+class SessionPairingTestCase(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for keeping the pairing state in the session.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    def setUp(self):
+        """Start every test with an empty cache and session."""
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.session = SessionStore()
+
+    def make_request(self, method="get"):
+        """
+        Return a request of a new instance of the user, without its latch
+        configuration cached, sharing the session with the previous ones.
+        """
+
+        request = getattr(RequestFactory(), method)("/")
+        request.session = self.session
+        request.user = get_user_model().objects.get(pk=self.user.pk)
+        request.auser = AsyncMock(return_value=request.user)
+        return request
+
+    def test_mixin(self):
+        """
+        The latch configuration is only queried on the first request.
+        """
+
+        request = self.make_request()
+        with self.assertNumQueries(1):
+            self.assertEqual(PairedView.as_view()(request).status_code, 200)
+        self.assertIn(SESSION_KEY, self.session)
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            self.assertEqual(PairedView.as_view()(request).status_code, 200)
+
+    def test_decorator(self):
+        """
+        The decorators also take the pairing from the session.
+        """
+
+        paired_view(self.make_request())
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            self.assertEqual(paired_view(request).status_code, 200)
+
+    def test_invalidated_on_delete(self):
+        """
+        Deleting the latch configuration invalidates the pairing stored in
+        every session.
+        """
+
+        PairedView.as_view()(self.make_request())
+        with self.captureOnCommitCallbacks(execute=True):
+            LatchUserConfig.objects.filter(pk=self.latch_config.pk).delete()
+        with self.assertRaises(PermissionDenied):
+            PairedView.as_view()(self.make_request())
+
+    def test_invalidated_on_save(self):
+        """
+        Saving a latch configuration invalidates the pairing stored in the
+        sessions of its user.
+        """
+
+        PairedView.as_view()(self.make_request())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.latch_config.save()
+        request = self.make_request()
+        with self.assertNumQueries(1):
+            PairedView.as_view()(request)
+
+    def test_invalidated_on_commit(self):
+        """
+        The pairing stored in the sessions is invalidated once the
+        transaction is committed, so a request served before the commit
+        can't store the previous pairing as the current one.
+        """
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            LatchUserConfig.objects.filter(pk=self.latch_config.pk).delete()
+            # A request that still sees the committed pairing.
+            self.session[SESSION_KEY] = None
+            with patch(
+                "django_latch.sessions.get_latch_config",
+                return_value=self.latch_config,
+            ):
+                PairedView.as_view()(self.make_request())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        with self.assertRaises(PermissionDenied):
+            PairedView.as_view()(self.make_request())
+
+    def test_other_user(self):
+        """
+        The pairing stored for a user isn't used for another one.
+        """
+
+        PairedView.as_view()(self.make_request())
+        request = self.make_request()
+        request.user = get_user_model().objects.create_user(username="bob")
+        with self.assertRaises(PermissionDenied):
+            PairedView.as_view()(request)
+
+    @patch("latch_sdk.syncio.LatchSDK.account_unpair", new=Mock(return_value=True))
+    def test_unpair_view(self):
+        """
+        Unpairing records in the session that the user is unpaired.
+        """
+
+        UnpairLatchView.as_view()(self.make_request("post"))
+        self.assertIsNone(self.session[SESSION_KEY]["config"])
+
+    def test_account_id_not_stored(self):
+        """
+        By default, the account id is loaded only when the latch is
+        checked.
+        """
+
+        PairedView.as_view()(self.make_request())
+        self.assertIsNone(self.session[SESSION_KEY]["config"][1])
+        request = self.make_request()
+        PairedView.as_view()(request)
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            with self.assertNumQueries(1):
+                self.assertTrue(can_pass_latch(request.user))
+        account_status.assert_called_once_with(self.latch_config.account_id)
+
+    @override_settings(LATCH_SESSION_ACCOUNT_ID=True)
+    def test_account_id_stored(self):
+        """
+        With LATCH_SESSION_ACCOUNT_ID, the latch is checked without querying
+        the database.
+        """
+
+        PairedView.as_view()(self.make_request())
+        request = self.make_request()
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true
+        ) as account_status:
+            with self.assertNumQueries(0):
+                PairedView.as_view()(request)
+                self.assertTrue(can_pass_latch(request.user))
+        account_status.assert_called_once_with(self.latch_config.account_id)
+
+    async def test_async_mixin(self):
+        """
+        Asynchronous views take the pairing from the session as well, and
+        load the account id when the latch is checked.
+        """
+
+        request = await sync_to_async(self.make_request)()
+        await AsyncPairedView.as_view()(request)
+        request = await sync_to_async(self.make_request)()
+        with patch("django_latch.models.LatchUserConfig.objects") as objects:
+            response = await AsyncPairedView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        objects.filter.assert_not_called()
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new_callable=AsyncMock,
+            return_value=mock_status_true,
+        ) as account_status:
+            self.assertTrue(await acan_pass_latch(request.user))
+        account_status.assert_called_once_with(self.latch_config.account_id)
+
+    @override_settings(LATCH_SESSION_PAIRING=None)
+    def test_disabled(self):
+        """
+        Without LATCH_SESSION_PAIRING, the session isn't used.
+        """
+
+        PairedView.as_view()(self.make_request())
+        self.assertNotIn(SESSION_KEY, self.session)
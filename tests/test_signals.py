@@ -0,0 +1,361 @@
+"""
+Tests for the signals sent by django-latch.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import threading
+import time
+from unittest import skipIf
+from unittest.mock import AsyncMock, Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.dispatch import Signal
+from django.test import SimpleTestCase, TestCase
+from django.utils.crypto import get_random_string
+from django.utils.version import get_complete_version as django_version
+
+from django_latch.backends import (
+    LatchDefaultModelBackend,
+    acan_pass_latch,
+    can_pass_latch,
+)
+from django_latch.context import request_scope
+from django_latch.models import LatchUserConfig
+from django_latch.signals import (
+    in_background,
+    latch_checked,
+    latch_denied,
+    latch_paired,
+    latch_unpaired,
+    send,
+)
+
+from .base import (
+    CreateLatchConfigMixin,
+    LoggedInTestCase,
+    mock_status_false,
+    mock_status_true,
+    reverse,
+)
+
+
+def connect(test_case, signal, receiver):
+    """
+    Connect ``receiver`` to ``signal`` until the end of ``test_case``.
+    """
+
+    signal.connect(receiver, weak=False)
+    test_case.addCleanup(signal.disconnect, receiver)
+
+
+class LatchCheckSignalsTests(CreateLatchConfigMixin, TestCase):
+    """
+    Tests for the signals sent when checking the latches.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+            "account_id": get_random_string(64),
+        }
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_checked(self, account_status):  # pylint: disable=unused-argument
+        """
+        ``latch_checked`` is sent with the result of the check and its
+        duration.
+        """
+
+        receiver = Mock()
+        connect(self, latch_checked, receiver)
+        self.assertTrue(can_pass_latch(self.user))
+        receiver.assert_called_once()
+        kwargs = receiver.call_args.kwargs
+        self.assertIs(kwargs["sender"], get_user_model())
+        self.assertEqual(kwargs["user"], self.user)
+        self.assertIs(kwargs["can_pass"], True)
+        self.assertIs(kwargs["from_cache"], False)
+        self.assertGreaterEqual(kwargs["duration"], 0)
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_checked_from_cache(self, account_status):
+        """
+        ``latch_checked`` tells whether the state was already known.
+        """
+
+        receiver = Mock()
+        connect(self, latch_checked, receiver)
+        with request_scope():
+            can_pass_latch(self.user)
+            can_pass_latch(self.user)
+        account_status.assert_called_once()
+        self.assertEqual(
+            [call.kwargs["from_cache"] for call in receiver.call_args_list],
+            [False, True],
+        )
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_false)
+    def test_denied(self, account_status):  # pylint: disable=unused-argument
+        """
+        ``latch_denied`` is sent when a user can't authenticate because its
+        latch is closed.
+        """
+
+        receiver = Mock()
+        connect(self, latch_denied, receiver)
+        with self.assertRaises(PermissionDenied):
+            LatchDefaultModelBackend().user_can_authenticate(self.user)
+        receiver.assert_called_once()
+        kwargs = receiver.call_args.kwargs
+        self.assertEqual(kwargs["user"], self.user)
+        self.assertIsNone(kwargs["request"])
+        self.assertIs(kwargs["from_cache"], False)
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_true)
+    def test_not_denied(self, account_status):  # pylint: disable=unused-argument
+        """
+        ``latch_denied`` isn't sent if the latch is open.
+        """
+
+        receiver = Mock()
+        connect(self, latch_denied, receiver)
+        self.assertTrue(LatchDefaultModelBackend().user_can_authenticate(self.user))
+        receiver.assert_not_called()
+
+    @patch("latch_sdk.syncio.LatchSDK.account_status", return_value=mock_status_false)
+    def test_no_receivers(self, account_status):  # pylint: disable=unused-argument
+        """
+        Without receivers, the signals aren't sent at all.
+        """
+
+        with patch.object(Signal, "send") as signal_send:
+            self.assertFalse(can_pass_latch(self.user))
+            with self.assertRaises(PermissionDenied):
+                LatchDefaultModelBackend().user_can_authenticate(self.user)
+        signal_send.assert_not_called()
+
+    async def test_async_checked(self):
+        """
+        ``latch_checked`` is sent by the asynchronous check too.
+        """
+
+        receiver = Mock()
+        connect(self, latch_checked, receiver)
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(return_value=mock_status_false),
+        ):
+            self.assertFalse(await acan_pass_latch(self.user))
+        receiver.assert_called_once()
+        self.assertIs(receiver.call_args.kwargs["can_pass"], False)
+
+    @skipIf(django_version() < (5, 2), "Backends are async since Django 5.2")
+    async def test_async_denied(self):
+        """
+        ``latch_denied`` is sent with the request when ``aauthenticate``
+        denies the access.
+        """
+
+        receiver = Mock()
+        connect(self, latch_denied, receiver)
+        request = Mock()
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(return_value=mock_status_false),
+        ):
+            with self.assertRaises(PermissionDenied):
+                await LatchDefaultModelBackend().aauthenticate(
+                    request,
+                    username=self.user.username,
+                    password=self.valid_data()["raw_password"],
+                )
+        receiver.assert_called_once()
+        self.assertIs(receiver.call_args.kwargs["request"], request)
+
+
+class PairingSignalsTests(LoggedInTestCase):
+    """
+    Tests for the signals sent when pairing and unpairing the accounts.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data."""
+        return {
+            "username": "bob",
+            "email": "bob@example.com",
+            "raw_password": "superpassword",
+        }
+
+    @patch("latch_sdk.syncio.LatchSDK.account_unpair", new=Mock(return_value=True))
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_status",
+        new=Mock(return_value=mock_status_true),
+    )
+    @patch("latch_sdk.syncio.LatchSDK.account_pair", new=Mock(return_value="a" * 64))
+    def test_paired_and_unpaired(self):
+        """
+        ``latch_paired`` and ``latch_unpaired`` are sent with the time
+        taken by the Latch service.
+        """
+
+        paired, unpaired = Mock(), Mock()
+        connect(self, latch_paired, paired)
+        connect(self, latch_unpaired, unpaired)
+
+        self.client.post(reverse("django_latch_pair"), data={"token": "valid token"})
+        paired.assert_called_once()
+        kwargs = paired.call_args.kwargs
+        self.assertEqual(kwargs["user"], self.user)
+        self.assertEqual(kwargs["config"], LatchUserConfig.objects.get(user=self.user))
+        self.assertGreaterEqual(kwargs["duration"], 0)
+        self.assertIs(kwargs["from_cache"], False)
+        unpaired.assert_not_called()
+
+        self.client.post(reverse("django_latch_unpair"))
+        unpaired.assert_called_once()
+        self.assertEqual(unpaired.call_args.kwargs["user"], self.user)
+        self.assertGreaterEqual(unpaired.call_args.kwargs["duration"], 0)
+
+    @skipIf(django_version() < (5, 0), "Asynchronous user access is new in Django 5.0")
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_pair",
+        new=AsyncMock(return_value="b" * 64),
+    )
+    async def test_async_paired_and_unpaired(self):
+        """
+        The asynchronous views send the signals as well.
+        """
+
+        paired, unpaired = Mock(), Mock()
+        connect(self, latch_paired, paired)
+        connect(self, latch_unpaired, unpaired)
+        await self.async_client.aforce_login(self.user)
+
+        await self.async_client.post(reverse("async_pair"), data={"token": "valid"})
+        paired.assert_called_once()
+        self.assertEqual(paired.call_args.kwargs["config"].account_id, "b" * 64)
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_unpair",
+            new=AsyncMock(return_value=True),
+        ):
+            await self.async_client.post(reverse("async_unpair"))
+        unpaired.assert_called_once()
+
+
+class InBackgroundTests(SimpleTestCase):
+    """
+    Tests for the receivers delivered in the background.
+    """
+
+    def test_sync_receiver(self):
+        """
+        Synchronous receivers are called in another thread, without delaying
+        the sender.
+        """
+
+        release, done = threading.Event(), threading.Event()
+        threads = []
+
+        def audit(sender, **kwargs):  # pylint: disable=unused-argument
+            """Record the thread once released."""
+            release.wait(5)
+            threads.append(threading.current_thread().name)
+            done.set()
+
+        connect(self, latch_unpaired, in_background(audit))
+        latch_unpaired.send(sender=None, user=None, duration=0.0, from_cache=False)
+        self.assertFalse(done.is_set())
+        release.set()
+        self.assertTrue(done.wait(5))
+        self.assertTrue(threads[0].startswith("django_latch_signals"))
+
+    def test_async_receiver(self):
+        """
+        Coroutine functions sent by synchronous code are run to completion
+        in the pool of threads.
+        """
+
+        done = threading.Event()
+        threads = []
+
+        async def audit(sender, **kwargs):  # pylint: disable=unused-argument
+            """Record the thread after a short wait."""
+            await asyncio.sleep(0.01)
+            threads.append(threading.current_thread().name)
+            done.set()
+
+        connect(self, latch_unpaired, in_background(audit))
+        send(latch_unpaired, get_user_model()(), duration=0.0, from_cache=False)
+        self.assertTrue(done.wait(5))
+        self.assertTrue(threads[0].startswith("django_latch_signals"))
+
+    @skipIf(django_version() < (5, 0), "Coroutine receivers are new in Django 5.0")
+    async def test_async_receiver_in_loop(self):
+        """
+        Coroutine functions sent by asynchronous code are run as tasks of
+        the event loop of the sender, without delaying it.
+        """
+
+        release, done = asyncio.Event(), asyncio.Event()
+        loops = []
+
+        async def audit(sender, **kwargs):  # pylint: disable=unused-argument
+            """Record the loop once released."""
+            await release.wait()
+            loops.append(asyncio.get_running_loop())
+            done.set()
+
+        connect(self, latch_checked, in_background(audit))
+        await latch_checked.asend(
+            sender=None, user=None, can_pass=True, duration=0.0, from_cache=False
+        )
+        self.assertFalse(done.is_set())
+        release.set()
+        await asyncio.wait_for(done.wait(), 5)
+        self.assertEqual(loops, [asyncio.get_running_loop()])
+
+    def test_exceptions_are_logged(self):
+        """
+        The exceptions raised by the receivers are logged.
+        """
+
+        def audit(sender, **kwargs):  # pylint: disable=unused-argument
+            """Fail."""
+            raise ValueError("Audit log unavailable")
+
+        with self.assertLogs("django_latch.signals", "ERROR") as logs:
+            in_background(audit)(sender=None)
+            deadline = time.monotonic() + 5
+            while not logs.records and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertIsInstance(logs.records[0].exc_info[1], ValueError)
+
+    @patch("django_latch.signals.MAX_PENDING_RECEIVERS", 1)
+    def test_dropped_when_full(self):
+        """
+        Receivers are dropped, logging a warning, while too many of them
+        are pending.
+        """
+
+        release = threading.Event()
+        self.addCleanup(release.set)
+        audit = Mock(side_effect=lambda sender, **kwargs: release.wait(5))
+        wrapper = in_background(audit)
+        with self.assertLogs("django_latch.signals", "WARNING") as logs:
+            wrapper(sender=None)
+            wrapper(sender=None)
+        self.assertEqual(len(logs.records), 1)
+        release.set()
+        deadline = time.monotonic() + 5
+        while audit.call_count < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        audit.assert_called_once()
@@ -0,0 +1,155 @@
+"""
+Tests for the coalescing of concurrent calls.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase
+
+from django_latch.singleflight import AsyncSingleFlight, SingleFlight
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    """
+    Tests for the coalescing of calls from several threads.
+    """
+
+    def run_concurrently(self, flight, func, callers=5):
+        """
+        Call ``func`` through ``flight`` from several threads while the first
+        call is in flight, returning the results or exceptions.
+        """
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_func():
+            """Call ``func`` once released."""
+            started.set()
+            release.wait(5)
+            return func()
+
+        results = []
+
+        def call():
+            """Record the result or the exception of the shared call."""
+            try:
+                results.append(flight.do("key", blocking_func))
+            except ValueError as exc:
+                results.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Give the followers time to join the call in flight.
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_single_call(self):
+        """
+        Concurrent calls with the same key run the function once and get
+        its result.
+        """
+
+        func = Mock(return_value=42)
+        results = self.run_concurrently(SingleFlight(), func)
+        self.assertEqual(results, [42] * 5)
+        func.assert_called_once()
+
+    def test_exception_shared(self):
+        """
+        The exception of the call in flight is raised to every caller.
+        """
+
+        results = self.run_concurrently(
+            SingleFlight(), Mock(side_effect=ValueError("boom"))
+        )
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_sequential_calls(self):
+        """
+        Calls that don't overlap run the function every time.
+        """
+
+        flight = SingleFlight()
+        func = Mock(return_value=42)
+        flight.do("key", func)
+        flight.do("key", func)
+        self.assertEqual(func.call_count, 2)
+
+
+class AsyncSingleFlightTestCase(SimpleTestCase):
+    """
+    Tests for the coalescing of calls from several coroutines.
+    """
+
+    async def test_single_call(self):
+        """
+        Concurrent calls with the same key await the function once and get
+        its result.
+        """
+
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def afunc():
+            """Record the call and return after a short wait."""
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return 42
+
+        results = await asyncio.gather(*(flight.do("key", afunc) for _ in range(5)))
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(len(calls), 1)
+
+    async def test_exception_shared(self):
+        """
+        The exception of the call in flight is raised to every caller.
+        """
+
+        flight = AsyncSingleFlight()
+
+        async def afunc():
+            """Fail after a short wait."""
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *(flight.do("key", afunc) for _ in range(3)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_leader_cancelled(self):
+        """
+        If the caller running the function is cancelled, the callers waiting
+        for it aren't, and one of them runs the function again.
+        """
+
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def afunc():
+            """Record the call and return after a wait."""
+            calls.append(None)
+            await asyncio.sleep(0.05)
+            return 42
+
+        leader = asyncio.ensure_future(flight.do("key", afunc))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.do("key", afunc)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        self.assertEqual(await asyncio.gather(*followers), [42] * 3)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(len(calls), 2)
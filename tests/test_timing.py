@@ -0,0 +1,400 @@
+"""
+Tests for the equalization of the latch check time of unpaired users.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from latch_sdk.exceptions import LatchError
+
+from django_latch.backends import acan_pass_latch, can_pass_latch
+from django_latch.cache import DEFAULT_OPEN_TTL, get_status_cache
+from django_latch.metrics import metrics
+from django_latch.timing import (
+    DECOY_KEY_PREFIX,
+    BackgroundRequestDecoy,
+    DecoyDispatcher,
+    LatencyHistogram,
+    RealRequestDecoy,
+    SampledLatencyDecoy,
+    get_decoy,
+    latency_histogram,
+)
+
+from .base import CreateUserMixin, mock_status_true
+
+
+class LatencyHistogramTestCase(SimpleTestCase):
+    """
+    Tests for the rolling window of latencies.
+    """
+
+    def test_empty(self):
+        """
+        An empty histogram has neither samples nor percentiles.
+        """
+
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.sample())
+        self.assertIsNone(histogram.percentile(95))
+
+    def test_sample_from_recorded(self):
+        """
+        The samples are taken from the recorded latencies.
+        """
+
+        histogram = LatencyHistogram()
+        for seconds in (0.1, 0.2, 0.3):
+            histogram.record(seconds)
+        for _ in range(20):
+            self.assertIn(histogram.sample(), (0.1, 0.2, 0.3))
+
+    def test_window(self):
+        """
+        Only the latest latencies are kept.
+        """
+
+        histogram = LatencyHistogram(size=3)
+        for seconds in (1, 2, 3, 4):
+            histogram.record(seconds)
+        self.assertEqual(len(histogram), 3)
+        self.assertEqual(histogram.percentile(0), 2)
+
+    def test_percentile(self):
+        """
+        The percentiles follow the nearest-rank method.
+        """
+
+        histogram = LatencyHistogram()
+        for seconds in range(1, 101):
+            histogram.record(seconds)
+        self.assertEqual(histogram.percentile(50), 50)
+        self.assertEqual(histogram.percentile(95), 95)
+        self.assertEqual(histogram.percentile(100), 100)
+
+
+class DecoyTestCase(SimpleTestCase):
+    """
+    Tests for the decoys used when checking unpaired users.
+    """
+
+    def setUp(self):
+        """Start every test without recorded latencies."""
+        latency_histogram.clear()
+        self.addCleanup(latency_histogram.clear)
+
+    def test_default_decoy(self):
+        """
+        The decoy makes a real request by default.
+        """
+
+        self.assertIsInstance(get_decoy(), RealRequestDecoy)
+
+    @override_settings(LATCH_DECOY="django_latch.timing.SampledLatencyDecoy")
+    def test_decoy_setting(self):
+        """
+        The decoy can be changed with LATCH_DECOY.
+        """
+
+        self.assertIsInstance(get_decoy(), SampledLatencyDecoy)
+
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_status",
+        new=Mock(side_effect=LatchError(201, "Account not paired")),
+    )
+    def test_real_request_records_latency(self):
+        """
+        The real decoy ignores the error of the Latch service and records
+        the time it took.
+        """
+
+        RealRequestDecoy().run()
+        self.assertEqual(len(latency_histogram), 1)
+
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_status",
+        new=Mock(side_effect=LatchError(201, "Account not paired")),
+    )
+    def test_real_request_not_in_metrics(self):
+        """
+        The requests of the real decoy aren't counted as status requests.
+        """
+
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        RealRequestDecoy().run()
+        snapshot = metrics.snapshot()
+        self.assertNotIn("account_status", snapshot["latency"])
+        self.assertEqual(snapshot["errors"], {})
+
+    async def test_async_real_request_not_in_metrics(self):
+        """
+        Neither are the asynchronous ones.
+        """
+
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(side_effect=LatchError(201, "Account not paired")),
+        ) as account_status:
+            await RealRequestDecoy().arun()
+        account_status.assert_called_once()
+        snapshot = metrics.snapshot()
+        self.assertNotIn("account_status", snapshot["latency"])
+        self.assertEqual(snapshot["errors"], {})
+
+    @patch("django_latch.timing.time.sleep")
+    def test_sampled_falls_back_to_real_request(self, sleep):
+        """
+        Without enough recorded latencies, the sampled decoy makes a real
+        request.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            return_value=mock_status_true,
+        ) as account_status:
+            SampledLatencyDecoy().run()
+
+        account_status.assert_called_once()
+        sleep.assert_not_called()
+
+    @patch("django_latch.timing.time.sleep")
+    def test_sampled_sleeps(self, sleep):
+        """
+        With enough recorded latencies, the sampled decoy sleeps for one of
+        them without calling the Latch service.
+        """
+
+        for _ in range(SampledLatencyDecoy.min_samples):
+            latency_histogram.record(0.05)
+
+        with patch("latch_sdk.syncio.LatchSDK.account_status") as account_status:
+            SampledLatencyDecoy().run()
+
+        account_status.assert_not_called()
+        sleep.assert_called_once_with(0.05)
+
+    async def test_sampled_sleeps_async(self):
+        """
+        The asynchronous sampled decoy sleeps without calling the Latch
+        service.
+        """
+
+        for _ in range(SampledLatencyDecoy.min_samples):
+            latency_histogram.record(0.01)
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status", new_callable=AsyncMock
+        ) as account_status:
+            await SampledLatencyDecoy().arun()
+
+        account_status.assert_not_called()
+
+
+@override_settings(
+    LATCH_STATUS_CACHE="default", LATCH_STATUS_CACHE_STALE_WHILE_REVALIDATE=60
+)
+class CachedDecoyTestCase(CreateUserMixin, TestCase):
+    """
+    Tests for the decoys of unpaired users with the status cache.
+    """
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data."""
+        return {
+            "username": "andrew",
+            "email": "andrew@example.com",
+            "raw_password": "superpassword",
+        }
+
+    def setUp(self):
+        """Start every test with an empty cache."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def make_stale(self):
+        """
+        Make the cached decoy of the user stale.
+        """
+
+        status_cache = get_status_cache()
+        status_cache.cache.set(
+            status_cache.make_key(f"{DECOY_KEY_PREFIX}{self.user.pk}"),
+            (True, time.time() - DEFAULT_OPEN_TTL),
+        )
+
+    @patch("django_latch.timing.get_decoy")
+    def test_fresh(self, get_decoy_mock):
+        """
+        The decoy is skipped while it's fresh, as the status of a paired
+        user is taken from the cache.
+        """
+
+        self.assertTrue(can_pass_latch(self.user))
+        self.assertTrue(can_pass_latch(self.user))
+        get_decoy_mock.return_value.run.assert_called_once()
+
+    @patch("django_latch.timing.decoy_dispatcher")
+    @patch("django_latch.timing.get_decoy")
+    def test_stale(self, get_decoy_mock, dispatcher):
+        """
+        A stale decoy is sent in the background, as the status of a paired
+        user is refreshed.
+        """
+
+        self.make_stale()
+        self.assertTrue(can_pass_latch(self.user))
+        get_decoy_mock.assert_not_called()
+        dispatcher.submit.assert_called_once()
+        self.assertTrue(can_pass_latch(self.user))
+        dispatcher.submit.assert_called_once()
+
+    @override_settings(LATCH_STATUS_CACHE=None)
+    @patch("django_latch.timing.get_decoy")
+    def test_without_cache(self, get_decoy_mock):
+        """
+        Without the status cache, the decoy is run on every check.
+        """
+
+        can_pass_latch(self.user)
+        can_pass_latch(self.user)
+        self.assertEqual(get_decoy_mock.return_value.run.call_count, 2)
+
+    async def test_async(self):
+        """
+        The asynchronous decoy is cached as well.
+        """
+
+        with patch("django_latch.timing.get_decoy") as get_decoy_mock:
+            get_decoy_mock.return_value.arun = AsyncMock()
+            self.assertTrue(await acan_pass_latch(self.user))
+            self.assertTrue(await acan_pass_latch(self.user))
+        get_decoy_mock.return_value.arun.assert_awaited_once()
+
+
+class BackgroundDecoyTestCase(SimpleTestCase):
+    """
+    Tests for the decoys sent in the background.
+    """
+
+    def setUp(self):
+        """Start every test without recorded latencies."""
+        latency_histogram.clear()
+        self.addCleanup(latency_histogram.clear)
+
+    def test_drops_under_pressure(self):
+        """
+        Decoys exceeding the limit of pending ones are dropped, and the
+        limit is freed once they finish.
+        """
+
+        release = threading.Event()
+        dispatcher = DecoyDispatcher(max_workers=1, max_pending=2)
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            new=Mock(side_effect=lambda account_id: release.wait(5)),
+        ):
+            futures = [dispatcher.submit() for _ in range(3)]
+            self.assertIsNotNone(futures[0])
+            self.assertIsNotNone(futures[1])
+            self.assertIsNone(futures[2])
+            # The callbacks run in order, so the decoys are discounted once
+            # these events are set.
+            finished = [threading.Event(), threading.Event()]
+            for future, event in zip(futures, finished):
+                future.add_done_callback(lambda future, event=event: event.set())
+            release.set()
+            for event in finished:
+                self.assertTrue(event.wait(5))
+            self.assertIsNotNone(dispatcher.submit())
+
+    def test_errors_are_discarded(self):
+        """
+        The failures of the background decoys are not raised.
+        """
+
+        dispatcher = DecoyDispatcher()
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            new=Mock(side_effect=ValueError),
+        ):
+            future = dispatcher.submit()
+            self.assertIsInstance(future.exception(5), ValueError)
+
+    @patch("django_latch.timing.time.sleep")
+    def test_waits_for_sampled_latency(self, sleep):
+        """
+        The caller waits for a sampled latency instead of the decoy request.
+        """
+
+        latency_histogram.record(0.05)
+        release = threading.Event()
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            new=Mock(side_effect=lambda account_id: release.wait(5)),
+        ):
+            # The decoy is still blocked when run() returns.
+            BackgroundRequestDecoy().run()
+            sleep.assert_called_once_with(0.05)
+            release.set()
+
+    def test_waits_for_decoy_without_latencies(self):
+        """
+        Until some latency is recorded, the caller waits for the decoy
+        request.
+        """
+
+        with patch(
+            "latch_sdk.syncio.LatchSDK.account_status",
+            new=Mock(side_effect=LatchError(201, "Account not paired")),
+        ) as account_status:
+            BackgroundRequestDecoy().run()
+
+        account_status.assert_called_once()
+        self.assertEqual(len(latency_histogram), 1)
+
+    async def test_async_drops_under_pressure(self):
+        """
+        Asynchronous decoys are tasks, dropped when too many are pending.
+        """
+
+        release = asyncio.Event()
+
+        async def account_status(account_id):  # pylint: disable=unused-argument
+            """Answer once released."""
+            await release.wait()
+
+        dispatcher = DecoyDispatcher(max_pending=1)
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_status",
+            new=AsyncMock(side_effect=account_status),
+        ):
+            task = dispatcher.asubmit()
+            self.assertIsNotNone(task)
+            self.assertIsNone(dispatcher.asubmit())
+            release.set()
+            await task
+        self.assertEqual(dispatcher._pending, 0)  # pylint: disable=protected-access
+
+    @patch("django_latch.timing.asyncio.sleep", new_callable=AsyncMock)
+    async def test_async_waits_for_sampled_latency(self, sleep):
+        """
+        The asynchronous caller waits for a sampled latency while the decoy
+        runs as a task.
+        """
+
+        latency_histogram.record(0.05)
+        with patch("latch_sdk.asyncio.LatchSDK.account_status", new_callable=AsyncMock):
+            await BackgroundRequestDecoy().arun()
+        sleep.assert_awaited_once_with(0.05)
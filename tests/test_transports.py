@@ -0,0 +1,268 @@
+"""
+Tests for the HTTP transports used to reach the Latch service.
+"""
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from django_latch.context import deadline
+from django_latch.exceptions import InvalidResponseError
+from django_latch.transports import (
+    CONNECTION_ERRORS,
+    ConnectionPool,
+    PooledLatch,
+    Timeouts,
+    get_timeouts,
+)
+from django_latch.transports_httpx import HttpxLatch
+from django_latch.transports_requests import RequestsLatch
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """
+    Tests for the pool of keep-alive connections.
+    """
+
+    def setUp(self):
+        """
+        Every pool creates mock connections.
+        """
+
+        self.pool = ConnectionPool(Mock, max_size=2, idle_timeout=10)
+
+    def test_new_connection(self):
+        """
+        If there isn't any idle connection, a new one is created.
+        """
+
+        conn, reused = self.pool.acquire()
+        self.assertIsInstance(conn, Mock)
+        self.assertFalse(reused)
+
+    def test_connection_is_reused(self):
+        """
+        A released connection is given back on the next acquisition.
+        """
+
+        conn, _ = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertEqual(self.pool.acquire(), (conn, True))
+        conn.close.assert_not_called()
+
+    def test_not_reusable_connection_is_closed(self):
+        """
+        Connections that cannot be reused are closed instead of kept.
+        """
+
+        conn, _ = self.pool.acquire()
+        self.pool.release(conn, reusable=False)
+        conn.close.assert_called_once()
+        self.assertIsNot(self.pool.acquire()[0], conn)
+
+    def test_max_size(self):
+        """
+        Connections released when the pool is full are closed.
+        """
+
+        conns = [self.pool.acquire()[0] for _ in range(3)]
+        for conn in conns:
+            self.pool.release(conn)
+        conns[0].close.assert_not_called()
+        conns[1].close.assert_not_called()
+        conns[2].close.assert_called_once()
+
+    def test_idle_timeout(self):
+        """
+        Connections idle for longer than the timeout are closed, not reused.
+        """
+
+        conn, _ = self.pool.acquire()
+        with patch("django_latch.transports.time.monotonic", return_value=0):
+            self.pool.release(conn)
+        with patch("django_latch.transports.time.monotonic", return_value=11):
+            new_conn, reused = self.pool.acquire()
+        self.assertIsNot(new_conn, conn)
+        self.assertFalse(reused)
+        conn.close.assert_called_once()
+
+
+class TimeoutsTestCase(SimpleTestCase):
+    """
+    Tests for the timeouts of the requests to the Latch service.
+    """
+
+    # The transports are tested through their private _http() method.
+    # pylint: disable=protected-access
+
+    def test_default_timeouts(self):
+        """
+        The defaults are used when the settings are not supplied.
+        """
+
+        self.assertEqual(get_timeouts(), Timeouts(3, 5, 8))
+
+    @override_settings(LATCH_CONNECT_TIMEOUT=1, LATCH_TIMEOUT=2)
+    def test_timeout_settings(self):
+        """
+        The timeouts are taken from the settings.
+        """
+
+        self.assertEqual(get_timeouts(), Timeouts(1, 2, 3))
+
+    @override_settings(LATCH_CONNECT_TIMEOUT=1, LATCH_TIMEOUT=2)
+    def test_deadline_shortens_timeouts(self):
+        """
+        Inside a deadline, no timeout exceeds the time left.
+        """
+
+        with patch("django_latch.context.time.monotonic", return_value=100):
+            with deadline(1.5):
+                self.assertEqual(get_timeouts(), Timeouts(1, 1.5, 1.5))
+
+    def test_expired_deadline(self):
+        """
+        If the deadline has expired, no request can be sent.
+        """
+
+        with patch("django_latch.context.time.monotonic", return_value=100):
+            with deadline(1):
+                with patch("django_latch.context.time.monotonic", return_value=102):
+                    with self.assertRaises(TimeoutError):
+                        get_timeouts()
+
+    def test_inner_deadline_cannot_extend(self):
+        """
+        A nested deadline doesn't extend an outer one that expires earlier.
+        """
+
+        with patch("django_latch.context.time.monotonic", return_value=100):
+            with deadline(1), deadline(10):
+                self.assertEqual(get_timeouts().total, 1)
+
+    @override_settings(LATCH_CONNECT_TIMEOUT=1, LATCH_TIMEOUT=2)
+    def test_pooled_latch_timeouts(self):
+        """
+        The pooled transport connects and reads with the timeouts.
+        """
+
+        conn = Mock(sock=None)
+        conn.connect.side_effect = lambda: setattr(conn, "sock", Mock())
+        conn.getresponse.return_value.will_close = False
+        conn.getresponse.return_value.status = 200
+        conn.getresponse.return_value.read.return_value = json.dumps(
+            {"data": {}}
+        ).encode()
+
+        core = PooledLatch("app_id", "secret")
+        with patch.object(core, "_new_connection", return_value=conn):
+            core._http("GET", "/api/status", {})
+
+        self.assertEqual(conn.timeout, 1)
+        conn.connect.assert_called_once()
+        conn.sock.settimeout.assert_called_once_with(2)
+
+    @override_settings(LATCH_CONNECT_TIMEOUT=1, LATCH_TIMEOUT=2)
+    def test_httpx_latch_timeouts(self):
+        """
+        The httpx transport sends the requests with the timeouts.
+        """
+
+        core = HttpxLatch("app_id", "secret")
+        with patch.object(core._client, "request") as request:
+            request.return_value = Mock(status_code=200, content=b'{"data": {}}')
+            core._http("GET", "/api/status", {})
+
+        timeout = request.call_args.kwargs["timeout"]
+        self.assertEqual(timeout.connect, 1)
+        self.assertEqual(timeout.read, 2)
+
+    @override_settings(LATCH_CONNECT_TIMEOUT=1, LATCH_TIMEOUT=2)
+    def test_requests_latch_timeouts(self):
+        """
+        The requests transport sends the requests with the timeouts.
+        """
+
+        core = RequestsLatch("app_id", "secret")
+        with patch.object(core._session, "request") as request:
+            request.return_value = Mock(status_code=200, content=b'{"data": {}}')
+            core._http("GET", "/api/status", {})
+
+        self.assertEqual(request.call_args.kwargs["timeout"], (1, 2))
+
+
+class InvalidResponseTestCase(SimpleTestCase):
+    """
+    Tests for the error pages returned instead of the answer of the Latch
+    service, for instance by a proxy.
+    """
+
+    # See TimeoutsTestCase.
+    # pylint: disable=protected-access
+
+    error_page = b"<html><body>502 Bad Gateway</body></html>"
+
+    def test_connection_error(self):
+        """
+        The invalid responses are handled as failures to reach the Latch
+        service, so they are retried and counted by the circuit breaker.
+        """
+
+        self.assertTrue(issubclass(InvalidResponseError, CONNECTION_ERRORS))
+
+    def test_pooled_latch(self):
+        """
+        The pooled transport raises InvalidResponseError for server errors.
+        """
+
+        conn = Mock(sock=Mock())
+        conn.getresponse.return_value = Mock(
+            status=502, will_close=True, read=Mock(return_value=self.error_page)
+        )
+        core = PooledLatch("app_id", "secret")
+        with patch.object(core, "_new_connection", return_value=conn):
+            with self.assertRaises(InvalidResponseError) as cm:
+                core._http("GET", "/api/status", {})
+        self.assertEqual(cm.exception.code, 502)
+
+    def test_pooled_latch_invalid_body(self):
+        """
+        The pooled transport raises InvalidResponseError for bodies that
+        aren't JSON.
+        """
+
+        conn = Mock(sock=Mock())
+        conn.getresponse.return_value = Mock(
+            status=200, will_close=False, read=Mock(return_value=self.error_page)
+        )
+        core = PooledLatch("app_id", "secret")
+        with patch.object(core, "_new_connection", return_value=conn):
+            with self.assertRaises(InvalidResponseError):
+                core._http("GET", "/api/status", {})
+
+    def test_httpx_latch(self):
+        """
+        The httpx transport raises InvalidResponseError for server errors.
+        """
+
+        core = HttpxLatch("app_id", "secret")
+        with patch.object(core._client, "request") as request:
+            request.return_value = Mock(status_code=503, content=self.error_page)
+            with self.assertRaises(InvalidResponseError) as cm:
+                core._http("GET", "/api/status", {})
+        self.assertEqual(cm.exception.code, 503)
+
+    def test_requests_latch(self):
+        """
+        The requests transport raises InvalidResponseError for server errors.
+        """
+
+        core = RequestsLatch("app_id", "secret")
+        with patch.object(core._session, "request") as request:
+            request.return_value = Mock(status_code=502, content=self.error_page)
+            with self.assertRaises(InvalidResponseError) as cm:
+                core._http("GET", "/api/status", {})
+        self.assertEqual(cm.exception.code, 502)
@@ -4,13 +4,16 @@ Tests for the pairing and unpairing operations as a whole.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import asyncio
 from http import HTTPStatus
-from unittest.mock import patch, Mock
+from unittest import skipIf
+from unittest.mock import patch, AsyncMock, Mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.crypto import get_random_string
+from django.utils.version import get_complete_version as django_version
 
 from latch_sdk.exceptions import TokenNotFound, ApplicationAlreadyPaired, LatchError
 
@@ -20,6 +23,7 @@ from django_latch.models import LatchUserConfig
 from .base import (
     LoggedInTestCase,
     CreateLatchConfigMixin,
+    CreateUserMixin,
     mock_status_true,
     mock_status_false,
     reverse,
@@ -155,6 +159,30 @@ class UnpairedUserTests(LoggedInTestCase):
             errors=PairLatchForm.ALREADY_PAIRED_MESSAGE,
         )
 
+    def test_latch_service_unreachable(self):
+        """
+        The pairing fails with the ``'unavailable'`` error if the Latch
+        service can't be reached or doesn't answer in time.
+        """
+
+        for error in (TimeoutError(), ConnectionRefusedError()):
+            with (
+                self.subTest(error=error),
+                patch(
+                    "latch_sdk.syncio.LatchSDK.account_pair",
+                    new=Mock(side_effect=error),
+                ),
+            ):
+                resp = self.client.post(
+                    reverse("django_latch_pair"), data={"token": "valid token"}
+                )
+                self.assertEqual(resp.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    resp.context["form"].errors.as_data()["token"][0].code,
+                    "unavailable",
+                )
+        self.assertFalse(LatchUserConfig.objects.filter(user=self.user).exists())
+
     @patch("latch_sdk.syncio.LatchSDK.account_pair", new=Mock(return_value=ACCOUNT_ID1))
     def test_no_pairing_on_get(self):
         """Pairing only occurs on HTTP ``POST``, not ``GET``."""
@@ -351,6 +379,25 @@ class PairedUserTests(CreateLatchConfigMixin, LoggedInTestCase):
         self.assertIn("message", resp.context["unpair_error"])
         self.assertIn("code", resp.context["unpair_error"])
 
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_unpair",
+        new=Mock(side_effect=TimeoutError()),
+    )
+    @patch(
+        "latch_sdk.syncio.LatchSDK.account_status",
+        new=Mock(return_value=mock_status_true),
+    )
+    def test_unpairing_timeout(self):
+        """
+        The unpairing fails with the ``'timeout'`` error, keeping the
+        pairing, if the Latch service doesn't answer in time.
+        """
+
+        resp = self.client.post(reverse("django_latch_unpair"))
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertEqual(resp.context["unpair_error"]["code"], "timeout")
+        self.assertTrue(LatchUserConfig.objects.filter(user=self.user).exists())
+
     @patch(
         "latch_sdk.syncio.LatchSDK.account_status",
         new=Mock(return_value=mock_status_false),
@@ -366,3 +413,173 @@ class PairedUserTests(CreateLatchConfigMixin, LoggedInTestCase):
             password=self.valid_data()["raw_password"],
         )
         self.assertFalse(logged)
+
+
+ACCOUNT_ID3 = get_random_string(64)
+
+
+@skipIf(django_version() < (5, 0), "Asynchronous user access is new in Django 5.0")
+class AsyncViewsTests(CreateUserMixin, TestCase):
+    """Tests for the asynchronous pairing and unpairing views."""
+
+    @classmethod
+    def valid_data(cls):
+        """Return a set of valid user data and an account id."""
+        return {
+            "username": "carol",
+            "email": "carol@example.com",
+            "raw_password": "superpassword",
+        }
+
+    def setUp(self):
+        """
+        The asynchronous client is logged with the ``CreateUserMixin`` user.
+        """
+
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    async def test_anonymous_user(self):
+        """
+        The user must be logged in to pair or unpair its account.
+        """
+
+        await self.async_client.alogout()
+        for viewname in ["async_pair", "async_unpair"]:
+            with self.subTest(viewname=viewname):
+                resp = await self.async_client.get(reverse(viewname))
+                self.assertRedirects(
+                    resp,
+                    f"{settings.LOGIN_URL}?next={reverse(viewname)}",
+                    fetch_redirect_response=False,
+                )
+
+    async def test_pairing_get(self):
+        """
+        The HTTP ``GET`` method to the pairing view populates the pairing form
+        into the context.
+        """
+
+        resp = await self.async_client.get(reverse("async_pair"))
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertIsInstance(resp.context["form"], PairLatchForm)
+
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_pair",
+        new=AsyncMock(side_effect=TokenNotFound("", "")),
+    )
+    async def test_token_not_found(self):
+        """Pair with an invalid token."""
+        resp = await self.async_client.post(
+            reverse("async_pair"), data={"token": "invalid token"}
+        )
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            form=resp.context["form"],
+            field="token",
+            errors=PairLatchForm.NOT_FOUND_TOKEN_MESSAGE,
+        )
+
+    @patch("latch_sdk.syncio.LatchSDK.account_pair")
+    @patch(
+        "latch_sdk.asyncio.LatchSDK.account_pair",
+        new=AsyncMock(return_value=ACCOUNT_ID3),
+    )
+    async def test_pairing_and_unpairing(self, sync_account_pair):
+        """
+        A valid pairing sets the user as paired without using the synchronous
+        client, and then the user can unpair its account.
+        """
+
+        resp = await self.async_client.post(
+            reverse("async_pair"), data={"token": "valid token"}
+        )
+        self.assertRedirects(
+            resp, reverse("django_latch_pair_complete"), fetch_redirect_response=False
+        )
+        sync_account_pair.assert_not_called()
+        latch_config = await LatchUserConfig.objects.aget(user=self.user)
+        self.assertEqual(latch_config.account_id, ACCOUNT_ID3)
+
+        resp = await self.async_client.get(reverse("async_pair"))
+        self.assertEqual(resp.status_code, HTTPStatus.FORBIDDEN)
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_unpair",
+            new=AsyncMock(return_value=True),
+        ):
+            resp = await self.async_client.post(reverse("async_unpair"))
+        self.assertRedirects(
+            resp,
+            reverse("django_latch_unpair_complete"),
+            fetch_redirect_response=False,
+        )
+        self.assertFalse(await LatchUserConfig.objects.filter(user=self.user).aexists())
+
+    async def test_unpairing_unpaired_user(self):
+        """
+        An unpaired user should not be able to access the unpair view.
+        """
+
+        resp = await self.async_client.get(reverse("async_unpair"))
+        self.assertEqual(resp.status_code, HTTPStatus.FORBIDDEN)
+
+    @override_settings(LATCH_CONNECT_TIMEOUT=0.05, LATCH_TIMEOUT=0.05)
+    async def test_stalled_latch_service(self):
+        """
+        The pairing and the unpairing fail instead of hanging if the Latch
+        service doesn't answer in time.
+        """
+
+        async def stall(*args):  # pylint: disable=unused-argument
+            """Wait longer than the timeouts."""
+            await asyncio.sleep(10)
+
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_pair", new=AsyncMock(side_effect=stall)
+        ):
+            resp = await self.async_client.post(
+                reverse("async_pair"), data={"token": "valid token"}
+            )
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            form=resp.context["form"],
+            field="token",
+            errors=PairLatchForm.UNAVAILABLE_MESSAGE,
+        )
+
+        await LatchUserConfig.objects.acreate(user=self.user, account_id=ACCOUNT_ID3)
+        with patch(
+            "latch_sdk.asyncio.LatchSDK.account_unpair",
+            new=AsyncMock(side_effect=stall),
+        ):
+            resp = await self.async_client.post(reverse("async_unpair"))
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertEqual(resp.context["unpair_error"]["code"], "timeout")
+        self.assertTrue(await LatchUserConfig.objects.filter(user=self.user).aexists())
+
+    @skipIf(django_version() < (5, 1), "Asynchronous decorators need Django 5.1")
+    @patch("django_latch.decorators.is_paired")
+    async def test_async_decorators(self, sync_is_paired):
+        """
+        The decorators check the pairing of asynchronous views without the
+        synchronous query.
+        """
+
+        for viewname, status_code in [
+            ("require_paired_async_view", HTTPStatus.FORBIDDEN),
+            ("require_unpaired_async_view", HTTPStatus.OK),
+        ]:
+            with self.subTest(viewname=viewname):
+                resp = await self.async_client.get(reverse(viewname))
+                self.assertEqual(resp.status_code, status_code)
+
+        await LatchUserConfig.objects.acreate(user=self.user, account_id=ACCOUNT_ID3)
+        for viewname, status_code in [
+            ("require_paired_async_view", HTTPStatus.OK),
+            ("require_unpaired_async_view", HTTPStatus.FORBIDDEN),
+        ]:
+            with self.subTest(viewname=viewname):
+                resp = await self.async_client.get(reverse(viewname))
+                self.assertEqual(resp.status_code, status_code)
+        sync_is_paired.assert_not_called()
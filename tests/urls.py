@@ -9,11 +9,14 @@ from django.contrib.auth.views import LoginView
 from django.views.generic import TemplateView
 
 from django_latch.urls import urlpatterns as latch_urls
+from django_latch.views import AsyncPairLatchView, AsyncUnpairLatchView
 from django_latch.decorators import paired_user_required, unpaired_user_required
 
 from .views import (
     RequirePairedUserWithClassDecoratorView,
     RequireUnPairedUserWithMethodDecoratorView,
+    require_paired_async_view,
+    require_unpaired_async_view,
 )
 
 urlpatterns = [
@@ -45,6 +48,18 @@ urlpatterns = [
         RequireUnPairedUserWithMethodDecoratorView.as_view(),
         name="require_unpaired_view_class",
     ),
+    path(
+        "require-paired-async-view",
+        require_paired_async_view,
+        name="require_paired_async_view",
+    ),
+    path(
+        "require-unpaired-async-view",
+        require_unpaired_async_view,
+        name="require_unpaired_async_view",
+    ),
+    path("async-pair-latch/", AsyncPairLatchView.as_view(), name="async_pair"),
+    path("async-unpair-latch/", AsyncUnpairLatchView.as_view(), name="async_unpair"),
 ]
 
 urlpatterns += latch_urls
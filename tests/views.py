@@ -4,6 +4,7 @@ View classes to test the funtions decorators.
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 
@@ -28,3 +29,21 @@ class RequireUnPairedUserWithMethodDecoratorView(TemplateView):
     """
 
     template_name = "django_latch/require_unpaired_user.html"
+
+
+@paired_user_required
+async def require_paired_async_view(request):  # pylint: disable=unused-argument
+    """
+    Asynchronous view for testing the ``paired_user_required`` decorator.
+    """
+
+    return HttpResponse("paired")
+
+
+@unpaired_user_required
+async def require_unpaired_async_view(request):  # pylint: disable=unused-argument
+    """
+    Asynchronous view for testing the ``unpaired_user_required`` decorator.
+    """
+
+    return HttpResponse("unpaired")